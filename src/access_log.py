@@ -0,0 +1,181 @@
+"""
+Block Page Access Log
+Request records buffered in memory and written in batches by one thread
+
+Serving threads only append a small tuple to a bounded buffer: no
+formatting, no file I/O and no lock on the way. A background writer
+wakes when a batch has built up (or every flush interval), formats the
+waiting records in the Common Log Format plus the Host header, and writes
+them with one call. When the buffer is full, records are dropped and
+counted instead of making requests wait for the disk; the count has a lock
+of its own, never the one the writer holds while writing.
+
+The file is rotated by size like logging's RotatingFileHandler:
+access.log becomes access.log.1, and so on up to the backup count.
+"""
+
+import collections
+import os
+import threading
+import time
+
+# Records held in memory before new ones are dropped
+BUFFER_SIZE = 65536
+
+# Records that wake the writer early, and the most it waits otherwise
+BATCH_SIZE = 512
+FLUSH_INTERVAL = 0.5
+
+# Rotate after this many bytes, keeping this many old files
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+
+def format_record(record, time_label):
+    """Return one log line for a (time, client, request line, status, size, host) record"""
+    _, client, request_line, status, size, host = record
+    return (
+        f'{client} - - [{time_label}] "{_escape(request_line)}" {status} {size} '
+        f'"{_escape(host or "-")}"\n'
+    )
+
+
+def _escape(value):
+    """Escape quotes and backslashes so a field can't break out of its quotes"""
+    if "\\" in value or '"' in value:
+        return value.replace("\\", "\\\\").replace('"', '\\"')
+    return value
+
+
+class AccessLog:
+    """Asynchronous, batched, size-rotated access log for the block page servers"""
+
+    def __init__(
+        self,
+        path,
+        buffer_size=BUFFER_SIZE,
+        batch_size=BATCH_SIZE,
+        flush_interval=FLUSH_INTERVAL,
+        max_bytes=MAX_BYTES,
+        backup_count=BACKUP_COUNT,
+    ):
+        self.path = str(path)
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        # deque append and popleft are atomic, so producers and the writer
+        # share it without a lock
+        self._buffer: collections.deque[tuple] = collections.deque()
+        # Held by the writer across file I/O; producers never take it
+        self._lock = threading.Lock()
+        # Guards only the dropped count, so a full buffer never waits on the disk
+        self._drop_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = False
+        self._time_second = None
+        self._time_label = ""
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+        self._thread.start()
+
+    def log(self, client, request_line, status, size, host=None):
+        """Queue one request record; dropped and counted if the buffer is full"""
+        buffer = self._buffer
+        pending = len(buffer)
+        if pending >= self.buffer_size:
+            with self._drop_lock:
+                self.dropped += 1
+            return
+        buffer.append((time.time(), client, request_line, status, size, host))
+        if pending + 1 == self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write every queued record now (for tests and shutdown)"""
+        with self._lock:
+            self._write_pending()
+
+    def close(self, timeout=None):
+        """Write what is queued, stop the writer and close the file"""
+        if self._closing:
+            return
+        self._closing = True
+        self._wake.set()
+        self._thread.join(timeout)
+        with self._lock:
+            self._write_pending()
+            self._file.close()
+
+    def stats(self):
+        """Return written, dropped, pending and rotation counts"""
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": len(self._buffer),
+            "rotations": self.rotations,
+        }
+
+    def _run(self):
+        """Writer loop: write a batch whenever one is ready or the interval passes"""
+        while not self._closing:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                self._write_pending()
+
+    def _write_pending(self):
+        """Format and write queued records in batches; call with the lock held"""
+        if self._file.closed:
+            return
+        buffer = self._buffer
+        while buffer:
+            lines = []
+            for _ in range(min(len(buffer), self.batch_size)):
+                record = buffer.popleft()
+                lines.append(format_record(record, self._label(record[0])))
+            data = "".join(lines).encode("utf-8", "backslashreplace")
+            try:
+                if self._size and self._size + len(data) > self.max_bytes:
+                    self._rotate()
+                self._file.write(data)
+                self._file.flush()
+            except OSError as e:
+                print(f"Access log error: {e}")
+                with self._drop_lock:
+                    self.dropped += len(lines)
+                continue
+            self._size += len(data)
+            self.written += len(lines)
+
+    def _label(self, timestamp):
+        """Return the log time label, formatted once per second"""
+        second = int(timestamp)
+        if second != self._time_second:
+            self._time_second = second
+            self._time_label = time.strftime("%d/%b/%Y:%H:%M:%S %z", time.localtime(second))
+        return self._time_label
+
+    def _rotate(self):
+        """Shift access.log.N up by one and start a new file"""
+        self._file.close()
+        append = False
+        try:
+            if self.backup_count > 0:
+                for index in range(self.backup_count - 1, 0, -1):
+                    source = f"{self.path}.{index}"
+                    if os.path.exists(source):
+                        os.replace(source, f"{self.path}.{index + 1}")
+                os.replace(self.path, f"{self.path}.1")
+            self.rotations += 1
+        except OSError as e:
+            # Keep appending to the current file; try again after max_bytes more
+            print(f"Access log rotation failed: {e}")
+            append = True
+        self._file = open(self.path, "ab" if append else "wb")
+        self._size = 0
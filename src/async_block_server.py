@@ -0,0 +1,385 @@
+"""
+Asyncio Block Page Server
+Serves the block page from one event loop instead of a thread per connection
+
+Idle and slow sockets cost a coroutine rather than an OS thread, so bursts
+of browser connections across many blocked tabs keep memory flat. The
+listen backlog and the number of concurrently served connections are both
+configurable; connections over the limit are accepted but wait for a slot.
+HTTP/1.1 clients keep their connection for further requests until it idles
+out or reaches the per-connection request cap.
+
+The listening socket is bound in the constructor (or handed in as `sock`),
+so bind errors surface there and connections queue in the backlog before
+serve_forever() starts. drain() lets in-flight requests finish with
+"Connection: close" and closes idle keep-alive connections.
+"""
+
+import asyncio
+import concurrent.futures
+import socket
+import threading
+import time
+
+from block_metrics import STATS_PATH, is_loopback, stats_response
+from block_response import HAVE_SENDFILE, parse_headers
+
+LISTEN_BACKLOG = 1024
+MAX_CONNECTIONS = 10000
+
+# A client gets this long to send its request before it is dropped
+REQUEST_TIMEOUT = 10.0
+
+# TLS handshakes run on the loop without blocking other connections, but
+# must finish within this many seconds
+HANDSHAKE_TIMEOUT = 5.0
+
+# Keep-alive connections close after this long without a new request, and
+# the reply to the last allowed request carries "Connection: close"
+IDLE_TIMEOUT = 5.0
+MAX_REQUESTS_PER_CONNECTION = 100
+
+# Largest request head and POST body read before answering
+MAX_HEAD = 64 * 1024
+MAX_BODY = 1 << 20
+
+
+NOT_IMPLEMENTED = (
+    b"HTTP/1.1 501 Not Implemented\r\n"
+    b"Content-Length: 0\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+)
+
+
+class AsyncBlockServer:
+    """Block page server on an asyncio loop, with a socketserver-like API"""
+
+    def __init__(
+        self,
+        block_response,
+        host="",
+        port=80,
+        ssl_context=None,
+        backlog=LISTEN_BACKLOG,
+        max_connections=MAX_CONNECTIONS,
+        request_timeout=REQUEST_TIMEOUT,
+        idle_timeout=IDLE_TIMEOUT,
+        max_requests=MAX_REQUESTS_PER_CONNECTION,
+        reuse_port=False,
+        metrics=None,
+        access_log=None,
+        sock=None,
+    ):
+        self.block_response = block_response
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.backlog = backlog
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.reuse_port = reuse_port
+        self.metrics = metrics
+        self.access_log = access_log
+        if sock is None:
+            family = socket.AF_INET6 if ":" in host else socket.AF_INET
+            sock = socket.create_server(
+                (host, port), family=family, backlog=backlog, reuse_port=reuse_port
+            )
+        self.socket = sock
+        self.server_address = sock.getsockname()[:2]
+        self.draining = False
+        # Open connections: writer -> its reader while idle between requests
+        self._connections = {}
+        self._serve_task = None
+        self._server = None
+        self.active = 0
+        self.served = 0
+        self.handshakes = 0
+        self.resumed_handshakes = 0
+        self._loop = None
+        self._stop = None
+        self._shutdown_requested = False
+        self.ready = threading.Event()
+        self._stopped = threading.Event()
+
+    def serve_forever(self):
+        """Run the event loop in the calling thread until shutdown()"""
+        self._stopped.clear()
+        try:
+            asyncio.run(self._serve())
+        finally:
+            self.ready.set()
+            self._stopped.set()
+
+    async def _serve(self):
+        """Listen and wait for the stop signal"""
+        self._stop = asyncio.Event()
+        self._limit = asyncio.Semaphore(self.max_connections)
+        self._serve_task = asyncio.current_task()
+        self._loop = asyncio.get_running_loop()
+        if self._shutdown_requested:
+            return
+        self._server = await asyncio.start_server(
+            self._handle,
+            sock=self.socket,
+            ssl=self.ssl_context,
+            ssl_handshake_timeout=HANDSHAKE_TIMEOUT if self.ssl_context else None,
+            backlog=self.backlog,
+            limit=MAX_HEAD,
+        )
+        self.ready.set()
+        async with self._server:
+            await self._stop.wait()
+
+    def shutdown(self):
+        """Stop serve_forever() and wait for it to return"""
+        self._shutdown_requested = True
+        loop, stop = self._loop, self._stop
+        if loop is None or stop is None:
+            # Not serving yet; _serve() sees the flag and returns at once
+            return
+        try:
+            loop.call_soon_threadsafe(stop.set)
+        except RuntimeError:
+            # Loop already closed
+            pass
+        self._stopped.wait()
+
+    def stats(self):
+        """Return connection, request and (with TLS) handshake counts"""
+        stats = {"active": self.active, "requests": self.served}
+        if self.ssl_context is not None:
+            stats["handshakes"] = self.handshakes
+            stats["full_handshakes"] = self.handshakes - self.resumed_handshakes
+            stats["resumed_handshakes"] = self.resumed_handshakes
+        return stats
+
+    def server_close(self):
+        """Close the listening socket"""
+        self.socket.close()
+
+    def stop_accepting(self):
+        """Close the listening socket; open connections carry on"""
+        if not self._run_on_loop(self._stop_accepting()):
+            # Not serving: make a later serve_forever() return at once
+            self._shutdown_requested = True
+            self.socket.close()
+
+    async def _stop_accepting(self):
+        """Stop the asyncio server listening"""
+        self.draining = True
+        if self._server is not None:
+            # Stop accept() first and let connections it already took attach
+            # to the server; closing it under them would abandon them
+            try:
+                asyncio.get_running_loop().remove_reader(self.socket.fileno())
+            except NotImplementedError:
+                # Proactor loop (Windows): no readers to remove
+                pass
+            await asyncio.sleep(0)
+            self._server.close()
+        return True
+
+    def drain(self, timeout=None):
+        """Wait for open connections to finish; False if `timeout` ran out first
+
+        Replies carry "Connection: close" from stop_accepting() on, and
+        idle keep-alive connections are closed at once. Connections still open
+        at the deadline are aborted.
+        """
+        drained = self._run_on_loop(self._drain(timeout))
+        return True if drained is None else drained
+
+    async def _drain(self, timeout):
+        """Close idle connections and wait for the rest"""
+        self.draining = True
+        for writer, reader in list(self._connections.items()):
+            if reader is not None:
+                self._close_idle(writer, reader)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        # A connection runs on tasks of its own from accept() on, before
+        # _handle() sees it, so wait for every task but the server's
+        while True:
+            tasks = asyncio.all_tasks() - {asyncio.current_task(), self._serve_task}
+            if not tasks:
+                return True
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            await asyncio.wait(tasks, timeout=remaining)
+        for writer in list(self._connections):
+            writer.transport.abort()
+        return False
+
+    def _close_idle(self, writer, reader):
+        """End an idle connection: its next read sees EOF once queued bytes are used"""
+        if isinstance(asyncio.get_running_loop(), asyncio.SelectorEventLoop):
+            # As in the threaded servers, a request already sent is still
+            # read and answered, so a fresh connection loses nothing
+            try:
+                writer.get_extra_info("socket").shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+            return
+        # Proactor loop (Windows): stop reading and end the stream here
+        writer.transport.pause_reading()
+        reader.feed_eof()
+
+    def _run_on_loop(self, coro):
+        """Run `coro` on the serving loop and return its result (None if not serving)"""
+        loop = self._loop
+        if loop is None or self._stopped.is_set():
+            coro.close()
+            return None
+        try:
+            future = asyncio.run_coroutine_threadsafe(coro, loop)
+        except RuntimeError:
+            # Loop already closed
+            coro.close()
+            return None
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            # The loop stopped first
+            return None
+
+    def _count_handshake(self, writer):
+        """Count a TLS connection's handshake, which the loop finished before _handle()"""
+        ssl_object = writer.get_extra_info("ssl_object")
+        if ssl_object is not None:
+            self.handshakes += 1
+            if ssl_object.session_reused:
+                self.resumed_handshakes += 1
+
+    async def _handle(self, reader, writer):
+        """Serve one connection within the connection limit"""
+        self._count_handshake(writer)
+        # Idle until its first request arrives, like between keep-alive
+        # requests, so a pre-connect that never sends one can't hold drain()
+        self._connections[writer] = reader
+        if self.draining:
+            self._close_idle(writer, reader)
+        try:
+            async with self._limit:
+                self.active += 1
+                try:
+                    timeout = self.request_timeout
+                    for count in range(1, self.max_requests + 1):
+                        keep_alive = await asyncio.wait_for(
+                            self._respond(reader, writer, count == self.max_requests),
+                            timeout,
+                        )
+                        if not keep_alive:
+                            break
+                        timeout = self.idle_timeout
+                        if self.draining:
+                            break
+                        # Idle until the next request arrives; drain() ends it
+                        self._connections[writer] = reader
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError):
+                    pass
+                except (asyncio.LimitOverrunError, ValueError):
+                    # Oversized or malformed request head
+                    pass
+                finally:
+                    self.active -= 1
+        finally:
+            del self._connections[writer]
+            writer.close()
+
+    async def _respond(self, reader, writer, last):
+        """Answer one request; returns True to keep the connection open"""
+        head = await reader.readuntil(b"\r\n\r\n")
+        self._connections[writer] = None
+        started = time.perf_counter()
+        request_line, _, header_block = head.partition(b"\r\n")
+        parts = request_line.decode("latin-1").split()
+        method = parts[0] if parts else ""
+        path = parts[1] if len(parts) > 1 else "/"
+        version = parts[2] if len(parts) > 2 else "HTTP/0.9"
+        headers = parse_headers(header_block)
+
+        if method == "GET" and path.startswith(STATS_PATH) and await self._serve_stats(writer, path):
+            return False
+
+        keep_alive = (
+            not last
+            and version == "HTTP/1.1"
+            and "close" not in headers.get("connection", "").lower()
+        )
+
+        if method == "POST" and not await self._skip_body(reader, headers):
+            keep_alive = False
+
+        if self.draining:
+            keep_alive = False
+
+        if method in ("GET", "POST", "HEAD"):
+            data, body = self.block_response.resolve(method, headers, close=not keep_alive)
+            writer.write(data)
+            if body is not None:
+                await self._send_body(writer, body)
+        else:
+            writer.write(NOT_IMPLEMENTED)
+            keep_alive = False
+        await writer.drain()
+        self.served += 1
+        if method in ("GET", "POST", "HEAD"):
+            self._record(writer, method, request_line, headers, data, body, started)
+        return keep_alive
+
+    async def _serve_stats(self, writer, path):
+        """Answer a loopback client's stats request; False if not one"""
+        if self.metrics is None or not is_loopback(writer.get_extra_info("peername")):
+            return False
+        response = stats_response(self.metrics, path)
+        if response is None:
+            return False
+        writer.write(response)
+        await writer.drain()
+        return True
+
+    async def _skip_body(self, reader, headers):
+        """Read past a POST body so the next request can be parsed; False if we can't"""
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if "transfer-encoding" in headers or not 0 <= length <= MAX_BODY:
+            return False
+        if length > 0:
+            await reader.readexactly(length)
+        return True
+
+    def _record(self, writer, method, request_line, headers, data, body, started):
+        """Count a block page response in the metrics and the access log"""
+        if self.metrics is not None:
+            self.metrics.record(
+                headers.get("host"),
+                method,
+                self.server_address[1],
+                time.perf_counter() - started,
+            )
+        if self.access_log is not None:
+            peer = writer.get_extra_info("peername")
+            self.access_log.log(
+                peer[0] if peer else "-",
+                request_line.decode("latin-1"),
+                int(data[9:12]),
+                len(data) + (len(body.view) if body is not None else 0),
+                headers.get("host"),
+            )
+
+    async def _send_body(self, writer, body):
+        """Send a file-backed body, with sendfile() when the socket allows"""
+        if self.ssl_context is not None or not HAVE_SENDFILE:
+            # TLS encrypts in userspace, so there is no kernel copy to use;
+            # the loop's own fallback would seek the file other tasks share
+            writer.write(body.view)
+            return
+        await writer.drain()
+        await asyncio.get_running_loop().sendfile(writer.transport, body.file, 0, len(body.view))
@@ -0,0 +1,245 @@
+"""
+Block Page Metrics
+Per-thread hit counters and latency histograms, merged when read
+
+Each serving thread records into its own shard, so recording takes no
+lock: one dict increment keyed by the raw (Host header, method, port) and
+one histogram bucket increment. Host headers are normalized only when a
+snapshot is taken. Shards of threads that have exited are folded into a
+retired total, so thread-per-connection mode doesn't grow the shard list;
+the retired total is held to the same series limit as a live shard.
+
+Snapshots are served as JSON and in Prometheus text format on the
+reserved /__stats path of the block page servers (loopback clients only).
+"""
+
+import bisect
+import json
+import threading
+import time
+
+from block_page import host_from_header
+
+STATS_PATH = "/__stats"
+PROMETHEUS_PATH = "/__stats/prometheus"
+
+# Upper bounds in seconds, doubling from 50 us to about 1.6 s
+BUCKET_BOUNDS = tuple(0.00005 * 2**i for i in range(16))
+
+# Distinct (Host, method, port) series per shard, and in the retired total;
+# the rest count as "other"
+MAX_SERIES = 10000
+
+# Sweep exited threads' shards once this many are registered
+SWEEP_THRESHOLD = 64
+
+OTHER_HOST = "other"
+UNKNOWN_HOST = "unknown"
+
+
+class _Shard:
+    """One thread's counters"""
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counts = {}
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.seconds = 0.0
+
+    def merge_into(self, counts, buckets, max_series=None):
+        """Add this shard's counters to `counts` and `buckets`; returns seconds
+
+        New series beyond `max_series` in `counts` are added as OTHER_HOST.
+        """
+        # dict() and list() copy atomically under the GIL
+        for key, value in dict(self.counts).items():
+            if max_series is not None and key not in counts and len(counts) >= max_series:
+                key = (OTHER_HOST, key[1], key[2])
+            counts[key] = counts.get(key, 0) + value
+        for index, value in enumerate(list(self.buckets)):
+            buckets[index] += value
+        return self.seconds
+
+
+class MetricsRegistry:
+    """Block page hits per Host, method and port, with a latency histogram"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(None)
+        self._lock = threading.Lock()
+
+    def _new_shard(self):
+        """Create and register the calling thread's shard"""
+        shard = _Shard(threading.current_thread())
+        self._local.shard = shard
+        with self._lock:
+            if len(self._shards) >= SWEEP_THRESHOLD:
+                self._sweep()
+            self._shards.append(shard)
+        return shard
+
+    def _sweep(self):
+        """Fold the shards of exited threads into the retired total"""
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                self._retired.seconds += shard.merge_into(
+                    self._retired.counts, self._retired.buckets, MAX_SERIES
+                )
+        self._shards = alive
+
+    def record(self, host, method, port, seconds):
+        """Count one request: raw Host header, method, local port and latency"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        counts = shard.counts
+        key = (host, method, port)
+        try:
+            counts[key] += 1
+        except KeyError:
+            if len(counts) >= MAX_SERIES:
+                key = (OTHER_HOST, method, port)
+            counts[key] = counts.get(key, 0) + 1
+        shard.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        shard.seconds += seconds
+
+    def _merge(self):
+        """Return (counts by normalized series, buckets, seconds) over all shards"""
+        raw: dict[tuple, int] = {}
+        buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        with self._lock:
+            self._sweep()
+            shards = [self._retired] + self._shards
+            seconds = 0.0
+            for shard in shards:
+                seconds += shard.merge_into(raw, buckets)
+
+        counts: dict[tuple, int] = {}
+        for (host, method, port), value in raw.items():
+            if host != OTHER_HOST:
+                host = host_from_header(host) or UNKNOWN_HOST
+            key = (host, method, port)
+            counts[key] = counts.get(key, 0) + value
+        return counts, buckets, seconds
+
+    def snapshot(self):
+        """Return totals per host, method and port plus the latency histogram"""
+        counts, buckets, seconds = self._merge()
+        hosts: dict[str, int] = {}
+        methods: dict[str, int] = {}
+        ports: dict[str, int] = {}
+        for (host, method, port), value in counts.items():
+            hosts[host] = hosts.get(host, 0) + value
+            methods[method] = methods.get(method, 0) + value
+            ports[str(port)] = ports.get(str(port), 0) + value
+        requests = sum(buckets)
+        return {
+            "requests": requests,
+            "uptime_seconds": self.clock() - self.started,
+            "hosts": hosts,
+            "methods": methods,
+            "ports": ports,
+            "latency": {
+                "count": requests,
+                "sum_seconds": seconds,
+                "p50_ms": _quantile(buckets, 0.5) * 1000,
+                "p99_ms": _quantile(buckets, 0.99) * 1000,
+                "buckets": {
+                    _bound_label(index): value for index, value in enumerate(buckets)
+                },
+            },
+        }
+
+    def to_json(self):
+        """Return the snapshot as JSON bytes"""
+        return json.dumps(self.snapshot(), sort_keys=True).encode("utf-8")
+
+    def to_prometheus(self):
+        """Return the counters in Prometheus text exposition format"""
+        counts, buckets, seconds = self._merge()
+        lines = [
+            "# HELP blocker_requests_total Block page requests served.",
+            "# TYPE blocker_requests_total counter",
+        ]
+        for (host, method, port), value in sorted(counts.items(), key=str):
+            labels = f'host="{_escape(host)}",method="{_escape(method)}",port="{port}"'
+            lines.append(f"blocker_requests_total{{{labels}}} {value}")
+        lines += [
+            "# HELP blocker_request_duration_seconds Time to answer a block page request.",
+            "# TYPE blocker_request_duration_seconds histogram",
+        ]
+        cumulative = 0
+        for index, value in enumerate(buckets):
+            cumulative += value
+            lines.append(
+                f'blocker_request_duration_seconds_bucket{{le="{_bound_label(index)}"}} '
+                f"{cumulative}"
+            )
+        lines.append(f"blocker_request_duration_seconds_sum {seconds!r}")
+        lines.append(f"blocker_request_duration_seconds_count {cumulative}")
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def render(self, path):
+        """Return (content type, body) for a stats path, or None"""
+        if path == STATS_PATH:
+            return "application/json", self.to_json()
+        if path == PROMETHEUS_PATH:
+            return "text/plain; version=0.0.4; charset=utf-8", self.to_prometheus()
+        return None
+
+
+def stats_response(registry, path, close=True):
+    """Return complete HTTP response bytes for a stats path, or None"""
+    rendered = registry.render(path.partition("?")[0])
+    if rendered is None:
+        return None
+    content_type, body = rendered
+    head = (
+        "HTTP/1.1 200 OK\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Cache-Control: no-store\r\n"
+    )
+    if close:
+        head += "Connection: close\r\n"
+    return (head + "\r\n").encode("latin-1") + body
+
+
+def is_loopback(client_address):
+    """True if a client address is on the loopback interface"""
+    host = client_address[0] if client_address else ""
+    return host.startswith("127.") or host in ("::1", "::ffff:127.0.0.1")
+
+
+def _bound_label(index):
+    """Return the upper bound of bucket `index` as a Prometheus `le` value"""
+    if index == len(BUCKET_BOUNDS):
+        return "+Inf"
+    return repr(round(BUCKET_BOUNDS[index], 6))
+
+
+def _quantile(buckets, q):
+    """Return the upper bound of the bucket holding quantile `q`"""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for index, value in enumerate(buckets):
+        seen += value
+        if seen >= rank:
+            return BUCKET_BOUNDS[min(index, len(BUCKET_BOUNDS) - 1)]
+    return BUCKET_BOUNDS[-1]
+
+
+def _escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
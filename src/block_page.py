@@ -0,0 +1,161 @@
+"""
+Templated Block Page
+The block page rendered per blocked host, with an LRU of built responses
+
+The page source may use {{ host }}, {{ until }} and {{ hits }}. It is
+compiled once into literal chunks and field names. Each (host, state)
+combination is rendered with HTML-escaped values and pre-built into a
+BlockResponse the first time it is requested, then served from a bounded
+LRU, so a repeat hit is a dict lookup plus a socket write. A page without
+fields is one shared BlockResponse, as before. Per-host responses keep
+their bodies in memory even past the sendfile threshold: a file and a map
+for each of hundreds of cached hosts would run out of descriptors.
+
+Hit counts show exactly below 10 and then by leading digit ("20+",
+"300+"), so a busy host's page is rebuilt only when its count moves to the
+next step rather than on every request.
+"""
+
+import html
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from block_response import BlockResponse
+
+FIELDS = ("host", "until", "hits")
+RENDER_CACHE_SIZE = 512
+
+# Hosts whose hit counts are remembered
+HIT_COUNTER_SIZE = 4096
+
+# Shown for a missing or malformed Host header, and for a block with no end
+UNKNOWN_HOST = "this site"
+NO_END = "further notice"
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(" + "|".join(FIELDS) + r")\s*\}\}")
+_HOSTNAME = re.compile(r"^[a-z0-9.-]{1,253}$|^\[[0-9a-f:.]{2,45}\]$")
+
+
+def host_from_header(value):
+    """Return the lower-cased host of a Host header without its port, or None"""
+    if not value:
+        return None
+    host = value.strip().lower()
+    if host.startswith("["):
+        host = host.partition("]")[0] + "]"
+    else:
+        host = host.partition(":")[0]
+    host = host.rstrip(".")
+    return host if _HOSTNAME.match(host) else None
+
+
+def hits_label(hits):
+    """Show small counts exactly and larger ones by leading digit"""
+    if hits < 10:
+        return str(hits)
+    scale = 10 ** (len(str(hits)) - 1)
+    return f"{hits // scale * scale}+"
+
+
+def until_label(until, now=None):
+    """Format the end of the block: a time today, else date and time"""
+    if until is None:
+        return NO_END
+    now = now or datetime.now()
+    if until.date() == now.date():
+        return until.strftime("%H:%M")
+    return until.strftime("%b %d, %H:%M")
+
+
+class BlockTemplate:
+    """Block page source compiled into literal chunks and field names"""
+
+    def __init__(self, source):
+        self.source = source
+        parts = _PLACEHOLDER.split(source)
+        self.chunks = parts[0::2]
+        self.fields = parts[1::2]
+
+    def render(self, values):
+        """Fill every field with its HTML-escaped value"""
+        out = [self.chunks[0]]
+        for field, chunk in zip(self.fields, self.chunks[1:]):
+            out.append(html.escape(str(values.get(field, ""))))
+            out.append(chunk)
+        return "".join(out)
+
+
+class BlockPage:
+    """Block page responses for one template, built per host and state"""
+
+    def __init__(self, content, cache_size=RENDER_CACHE_SIZE, **response_options):
+        self.content = content
+        self.template = BlockTemplate(content)
+        self.cache_size = cache_size
+        self.response_options = response_options
+        self._host_options = dict(response_options, sendfile_threshold=None)
+        self.until = None
+        self.renders = 0
+        self._counts_hits = "hits" in self.template.fields
+        self._hits = OrderedDict()
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+        self._static = None
+        if not self.template.fields:
+            self._static = BlockResponse(content, **response_options)
+
+    def set_block_state(self, until):
+        """Set when the current block ends (a datetime), or None for no end"""
+        self.until = until
+
+    def response_for(self, host_header=None):
+        """Return the BlockResponse for a request's Host header"""
+        if self._static is not None:
+            return self._static
+        host = host_from_header(host_header)
+        hits = hits_label(self._count(host)) if self._counts_hits else None
+        key = (host, self.until, hits)
+        with self._lock:
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+                return response
+
+        # Rendered and compressed outside the lock; a duplicate is harmless
+        page = self.template.render(
+            {"host": host or UNKNOWN_HOST, "until": until_label(self.until), "hits": hits}
+        )
+        response = BlockResponse(page, **self._host_options)
+        with self._lock:
+            self.renders += 1
+            response = self._responses.setdefault(key, response)
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+        return response
+
+    def _count(self, host):
+        """Count a hit on `host` and return its total"""
+        with self._lock:
+            hits = self._hits.pop(host, 0) + 1
+            self._hits[host] = hits
+            if len(self._hits) > HIT_COUNTER_SIZE:
+                self._hits.popitem(last=False)
+        return hits
+
+    def resolve(self, method="GET", headers=None, close=True):
+        """Return (bytes to send, FileBody or None) for a request"""
+        headers = headers or {}
+        return self.response_for(headers.get("host")).resolve(method, headers, close)
+
+    def render(self, method="GET", headers=None, close=True):
+        """Return the complete response bytes for a request"""
+        headers = headers or {}
+        return self.response_for(headers.get("host")).render(method, headers, close)
+
+    def stats(self):
+        """Return the number of cached responses and renders so far"""
+        with self._lock:
+            return {"cached": len(self._responses), "renders": self.renders}
@@ -0,0 +1,213 @@
+"""
+Pre-built Block Page Responses
+Status line, headers and body encoded once per variant at load time
+
+Every variant (encoding x GET/HEAD x keep-alive/close, plus the matching
+304s) is a ready-to-send bytes object, so serving a request is one dict
+lookup and one sendall. Bodies are offered identity and gzip encoded, plus
+brotli when the optional `brotli` package is installed. Responses carry a
+strong ETag and "Cache-Control: no-cache", so browsers revalidate on every
+visit but get a bodiless 304 while the page is unchanged.
+
+Bodies of SENDFILE_THRESHOLD bytes or more (large pages with inline
+images) are kept in an unlinked temporary file and memory-mapped instead
+of held as bytes. Plain TCP connections then get the body with sendfile(),
+copied by the kernel straight from the page cache to the socket, where
+the OS has it.
+"""
+
+import collections
+import gzip
+import hashlib
+import mmap
+import os
+import socket
+import ssl
+import tempfile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first when the client accepts several
+ENCODINGS = ("br", "gzip", "identity")
+
+# Bodies at least this large are served from a file with sendfile()
+SENDFILE_THRESHOLD = 64 * 1024
+
+# Without os.sendfile() (Windows), socket.sendfile() reads from the file's
+# shared position instead of the offset given, so the mapped view is sent
+HAVE_SENDFILE = hasattr(os, "sendfile")
+
+# Holds back a partial packet until the body follows (Linux only)
+MSG_MORE = getattr(socket, "MSG_MORE", 0)
+
+# A file-backed body: the open file and a read-only mmap view of it
+FileBody = collections.namedtuple("FileBody", "file view")
+
+
+def parse_headers(header_block):
+    """Parse raw "Name: value" lines into a {lowercase name: str} dict"""
+    headers = {}
+    for line in header_block.split(b"\r\n"):
+        name, sep, value = line.partition(b":")
+        if sep:
+            name = name.strip().lower().decode("latin-1")
+            headers[name] = value.strip().decode("latin-1")
+    return headers
+
+
+def accepted_encodings(accept_encoding):
+    """Return the content-codings an Accept-Encoding header allows"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        quality = params.strip().lower()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding)
+    return accepted
+
+
+class BlockResponse:
+    """All encoded variants of the block page response"""
+
+    def __init__(
+        self,
+        content,
+        protocol_version="HTTP/1.1",
+        server_version="BlockPage",
+        content_type="text/html; charset=utf-8",
+        sendfile_threshold=SENDFILE_THRESHOLD,
+    ):
+        self.content = content
+        body = content.encode("utf-8")
+        self.bodies = {"identity": body}
+        compressed = {"gzip": gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            compressed["br"] = brotli.compress(body)
+        for encoding, data in compressed.items():
+            # Tiny pages can grow when compressed; don't offer those
+            if len(data) < len(body):
+                self.bodies[encoding] = data
+
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        self.etags = {encoding: f'"{digest}-{encoding}"' for encoding in self.bodies}
+        self.etags["identity"] = f'"{digest}"'
+
+        # Keyed by encoding; "get" variants of these hold only the head
+        self.files = {}
+        if sendfile_threshold is not None:
+            for encoding, data in self.bodies.items():
+                if len(data) >= sendfile_threshold:
+                    self.files[encoding] = _spill(data)
+
+        # Keyed by (encoding, "get" | "head" | "304", close)
+        self._variants = {}
+        for encoding, data in self.bodies.items():
+            self._add_variants(encoding, data, protocol_version, server_version, content_type)
+
+        # Drop the in-memory copies of file-backed bodies
+        for encoding, body in self.files.items():
+            self.bodies[encoding] = body.view
+
+    def _add_variants(self, encoding, data, protocol_version, server_version, content_type):
+        """Encode the GET, HEAD and 304 responses for one body encoding"""
+        for close in (False, True):
+            common = [
+                f"Server: {server_version}",
+                f"ETag: {self.etags[encoding]}",
+                "Cache-Control: no-cache",
+                "Vary: Accept-Encoding",
+            ]
+            if close:
+                common.append("Connection: close")
+            headers = [f"Content-Type: {content_type}"]
+            if encoding != "identity":
+                headers.append(f"Content-Encoding: {encoding}")
+            headers.append(f"Content-Length: {len(data)}")
+
+            head = _head(protocol_version, "200 OK", common + headers)
+            if encoding in self.files:
+                self._variants[encoding, "get", close] = head
+            else:
+                self._variants[encoding, "get", close] = head + data
+            self._variants[encoding, "head", close] = head
+            self._variants[encoding, "304", close] = _head(
+                protocol_version, "304 Not Modified", common
+            )
+
+    def choose_encoding(self, accept_encoding):
+        """Pick the best encoding we have that the client accepts"""
+        if not accept_encoding:
+            return "identity"
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ENCODINGS:
+            if encoding in self.bodies and encoding in accepted:
+                return encoding
+        return "identity"
+
+    def is_fresh(self, encoding, if_none_match):
+        """Check an If-None-Match header against the variant's ETag"""
+        if not if_none_match:
+            return False
+        etag = self.etags[encoding]
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            # If-None-Match uses weak comparison
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == "*" or candidate == etag:
+                return True
+        return False
+
+    def resolve(self, method="GET", headers=None, close=True):
+        """Return (bytes to send, FileBody to send after them or None)"""
+        headers = headers or {}
+        encoding = self.choose_encoding(headers.get("accept-encoding", ""))
+        if self.is_fresh(encoding, headers.get("if-none-match")):
+            return self._variants[encoding, "304", close], None
+        if method == "HEAD":
+            return self._variants[encoding, "head", close], None
+        return self._variants[encoding, "get", close], self.files.get(encoding)
+
+    def render(self, method="GET", headers=None, close=True):
+        """Return the complete response bytes for a request"""
+        data, body = self.resolve(method, headers, close)
+        if body is not None:
+            return data + bytes(body.view)
+        return data
+
+
+def send_file_response(sock, head, body):
+    """Send `head` then a FileBody on a blocking socket"""
+    if isinstance(sock, ssl.SSLSocket) or not HAVE_SENDFILE:
+        # TLS encrypts in userspace, so there is no kernel copy to use; nor
+        # is there one without os.sendfile()
+        sock.sendall(head)
+        sock.sendall(body.view)
+    else:
+        sock.sendall(head, MSG_MORE)
+        # sendfile() reads at an explicit offset, so threads can share the file
+        sock.sendfile(body.file, 0, len(body.view))
+
+
+def _spill(data):
+    """Write `data` to an unlinked temporary file and map it read-only"""
+    file = tempfile.TemporaryFile()
+    file.write(data)
+    file.flush()
+    return FileBody(file, memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)))
+
+
+def _head(protocol_version, status, headers):
+    """Encode a status line and header lines"""
+    lines = [f"{protocol_version} {status}"] + headers
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
@@ -0,0 +1,217 @@
+"""
+Headless Website Blocking Engine
+Config, hosts file and timer logic with no GUI dependencies
+
+Imports here (and in hosts_engine / dns_flush) are kept light so scripts and
+services start fast; heavier modules are imported where they are used.
+"""
+
+import os
+import platform
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from dns_flush import DNSFlusher
+from domain_normalizer import normalize_pattern
+from domain_store import DomainStore
+from file_watcher import stat_key
+from hosts_engine import HostsEngine, expand_variations
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_CONFIG_FILE = BASE_DIR / "config" / "blocked_sites.json"
+REDIRECT_IP = "127.0.0.1"
+
+
+def default_hosts_path():
+    """Return the hosts file location for this platform"""
+    if platform.system() == "Windows":
+        return r"C:\Windows\System32\drivers\etc\hosts"
+    return "/etc/hosts"
+
+
+def is_admin():
+    """Check if running with admin privileges"""
+    try:
+        if platform.system() == "Windows":
+            import ctypes
+
+            return bool(ctypes.windll.shell32.IsUserAnAdmin())  # type: ignore
+        return os.geteuid() == 0  # type: ignore
+    except Exception:
+        return False
+
+
+def normalize_website(website):
+    """Reduce user input to a valid hostname or *.wildcard ("" if invalid)"""
+    return normalize_pattern(website) or ""
+
+
+class BlockerEngine:
+    """Blocked-site list, hosts file engine, DNS flushing and block timer"""
+
+    def __init__(
+        self, config_file=None, hosts_path=None, redirect_ip=REDIRECT_IP, dns=None
+    ):
+        self.config_file = Path(config_file) if config_file else DEFAULT_CONFIG_FILE
+        self.hosts_path = hosts_path or default_hosts_path()
+        self.redirect_ip = redirect_ip
+        self.hosts = HostsEngine(self.hosts_path, redirect_ip)
+        self.dns = dns if dns is not None else DNSFlusher()
+        # stat_key() of the config file as this engine last wrote it
+        self.saved_key = None
+        self.blocked_websites = self.load_blocked_sites()
+        self.timer = None
+        self.timer_end = None
+
+    @property
+    def blocked_websites(self):
+        """Listed sites, in the order they were added"""
+        return self._websites
+
+    @blocked_websites.setter
+    def blocked_websites(self, websites):
+        websites = list(websites)
+        self._websites, self.store = websites, DomainStore(websites)
+
+    def load_blocked_sites(self):
+        """Load blocked sites from JSON"""
+        import json
+
+        try:
+            if self.config_file.exists():
+                with open(self.config_file, "r") as f:
+                    return json.load(f)
+        except Exception:
+            pass
+        return []
+
+    def write_blocked_sites(self, websites=None):
+        """Save blocked sites to JSON"""
+        import json
+
+        websites = self.blocked_websites if websites is None else websites
+        self.config_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.config_file, "w") as f:
+            json.dump(websites, f, indent=4)
+        self.saved_key = stat_key(self.config_file)
+
+    def read_blocked_sites(self):
+        """Parse the saved list and build its index, leaving the live list alone
+
+        Raises OSError or ValueError for a missing or half-written file, so
+        a reload keeps the current list instead of emptying it.
+        """
+        import json
+
+        with open(self.config_file, "r") as f:
+            websites = json.load(f)
+        if not isinstance(websites, list):
+            raise ValueError("blocked sites must be a JSON list")
+        return websites, DomainStore(websites)
+
+    def swap_blocked_sites(self, websites, store):
+        """Install a list and index from read_blocked_sites(); returns (added, removed)"""
+        old = set(self._websites)
+        new = set(websites)
+        added = [site for site in websites if site not in old]
+        removed = [site for site in self._websites if site not in new]
+        self._websites, self.store = list(websites), store
+        return added, removed
+
+    def reload_blocked_sites(self):
+        """Re-read the saved list if something else changed it; returns (added, removed)"""
+        if stat_key(self.config_file) == self.saved_key:
+            return [], []
+        return self.swap_blocked_sites(*self.read_blocked_sites())
+
+    def add_websites(self, websites, normalize=True):
+        """Add websites to the list, returning the ones added
+
+        Pass normalize=False for input that is already normalized.
+        """
+        added = []
+        for website in websites:
+            if normalize:
+                website = normalize_website(website)
+            if website and not self.store.has(website):
+                self.store.add(website)
+                added.append(website)
+        self._websites.extend(added)
+        return added
+
+    def remove_websites(self, websites):
+        """Remove websites from the list, returning the ones removed
+
+        Each name matches as given and as normalized, so entries saved
+        before normalization was strict can still be removed.
+        """
+        targets = set(websites)
+        targets.update(normalize_website(website) for website in websites)
+        targets.discard("")
+        removed = [site for site in self._websites if site in targets]
+        if removed:
+            self._websites = [site for site in self._websites if site not in targets]
+            for site in removed:
+                self.store.discard(site)
+        return removed
+
+    def listed_match(self, host):
+        """Return the listed site or *.wildcard covering `host`, or None"""
+        return self.store.match(host)
+
+    def block(self, websites=None):
+        """Block websites (default: the whole list) with one hosts write"""
+        websites = self.blocked_websites if websites is None else websites
+        changed = self.hosts.block(websites)
+        if changed:
+            self.dns.request()
+        return changed
+
+    def unblock(self, websites=None):
+        """Unblock websites (default: the whole list) with one hosts write"""
+        websites = self.blocked_websites if websites is None else websites
+        changed = self.hosts.unblock(websites)
+        if changed:
+            self.dns.request()
+        return changed
+
+    def apply(self):
+        """Make the hosts section block exactly the listed sites (one write)"""
+        hostnames = {
+            host for site in self.blocked_websites for host in expand_variations(site)
+        }
+        changed = self.hosts.apply(hostnames)
+        if changed:
+            self.dns.request()
+        return changed
+
+    def statuses(self, websites=None):
+        """Return {website: blocked?} for the given or listed websites"""
+        websites = self.blocked_websites if websites is None else websites
+        return self.hosts.statuses(websites)
+
+    def start_timer(self, minutes, on_expire=None):
+        """Call on_expire (default: unblock everything) after `minutes`"""
+        self.cancel_timer()
+        self.timer_end = datetime.now() + timedelta(minutes=minutes)
+        self.timer = threading.Timer(minutes * 60, self._expire, args=(on_expire,))
+        self.timer.daemon = True
+        self.timer.start()
+        return self.timer_end
+
+    def cancel_timer(self):
+        """Stop a running block timer"""
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = None
+        self.timer_end = None
+
+    def _expire(self, on_expire):
+        """Timer thread callback"""
+        self.timer = None
+        self.timer_end = None
+        if on_expire is not None:
+            on_expire()
+        else:
+            self.unblock()
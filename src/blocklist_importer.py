@@ -0,0 +1,237 @@
+"""
+Streaming Blocklist Importer
+Reads hosts-format, AdBlock-style and plain domain lists line by line
+"""
+
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from domain_normalizer import normalize_pattern
+
+# Hostnames in hosts-format lists that must never be imported
+RESERVED_HOSTS = frozenset(
+    {
+        "localhost",
+        "localhost.localdomain",
+        "local",
+        "broadcasthost",
+        "ip6-localhost",
+        "ip6-loopback",
+        "ip6-localnet",
+        "ip6-mcastprefix",
+        "ip6-allnodes",
+        "ip6-allrouters",
+        "ip6-allhosts",
+        "0.0.0.0",
+    }
+)
+
+READ_BUFFER = 1 << 20
+PROGRESS_EVERY = 100000
+
+# Target size of one line-aligned chunk handed to a worker process
+CHUNK_BYTES = 8 << 20
+
+
+def parse_line(line):
+    """Return the domains named by one blocklist line (may be empty)
+
+    Supported formats:
+        0.0.0.0 ads.example.com tracker.example.com   (hosts)
+        ||ads.example.com^$third-party                 (AdBlock)
+        ads.example.com                                (plain)
+    """
+    line = line.strip()
+    if not line or line[0] in "#![":
+        return []
+
+    if line.startswith("||"):
+        # Only whole-domain rules; path, wildcard and regex rules can't
+        # be expressed in a hosts file
+        rule = line[2:].split("$", 1)[0]
+        if not rule.endswith("^"):
+            return []
+        domain = rule[:-1]
+        if not domain or "/" in domain or "*" in domain:
+            return []
+        return [domain]
+
+    if line.startswith("@@"):
+        return []
+
+    tokens = line.split("#", 1)[0].split()
+    if len(tokens) > 1 and _looks_like_ip(tokens[0]):
+        return [host for host in tokens[1:] if host.lower() not in RESERVED_HOSTS]
+    # A '#' glued to the domain is a cosmetic filter (example.com##.ad)
+    if len(tokens) == 1 and "." in tokens[0] and line.split(None, 1)[0] == tokens[0]:
+        return tokens
+    return []
+
+
+def _looks_like_ip(token):
+    """Cheap IPv4/IPv6 address check for the first hosts column"""
+    return ":" in token or token.replace(".", "").isdigit()
+
+
+def iter_domains(stream):
+    """Yield raw domains from a text stream, one line at a time"""
+    for line in stream:
+        yield from parse_line(line)
+
+
+def chunk_ranges(path, chunk_bytes=CHUNK_BYTES):
+    """Split a file into (start, end) byte ranges that end on line breaks"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    ranges = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = mm.find(b"\n", min(start + chunk_bytes, size) - 1)
+            end = size if end == -1 else end + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_chunk(path, start, end):
+    """Parse and normalize one chunk: returns (lines, domains, unique hosts)
+
+    Runs in worker processes, so it reopens and maps the file itself rather
+    than receiving the bytes over a pipe.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode("utf-8", errors="replace")
+
+    lines = 0
+    domains = 0
+    hosts: dict[str, None] = {}
+    for line in text.splitlines():
+        lines += 1
+        for domain in parse_line(line):
+            domains += 1
+            # Same rules as engine.add_websites(), so *.wildcards survive
+            host = normalize_pattern(domain)
+            if host is not None:
+                hosts[host] = None
+    return lines, domains, list(hosts)
+
+
+def parse_file(path, workers=None, chunk_bytes=CHUNK_BYTES, progress=None):
+    """Parse a blocklist file into (lines, domains, unique normalized hosts)
+
+    With workers > 1 the file is split into line-aligned chunks that are
+    parsed in a ProcessPoolExecutor; results are merged in file order, so the
+    output is identical to the serial path (workers=1).
+    """
+    ranges = chunk_ranges(path, chunk_bytes)
+    total = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(ranges) < 2:
+        results = (parse_chunk(path, start, end) for start, end in ranges)
+        return _merge_chunks(results, ranges, total, progress)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        starts, ends = zip(*ranges)
+        return _merge_chunks(
+            pool.map(parse_chunk, [path] * len(ranges), starts, ends), ranges, total, progress
+        )
+
+
+def _merge_chunks(results, ranges, total, progress):
+    """Merge per-chunk results in order, deduplicating across chunks"""
+    lines = 0
+    domains = 0
+    hosts = {}
+    for (chunk_lines, chunk_domains, chunk_hosts), (_, end) in zip(results, ranges):
+        lines += chunk_lines
+        domains += chunk_domains
+        hosts.update(dict.fromkeys(chunk_hosts))
+        if progress is not None:
+            progress(lines, end, total)
+    return lines, domains, list(hosts)
+
+
+class ImportResult:
+    """Summary of one import run"""
+
+    def __init__(self, lines=0, domains=0, added=None):
+        self.lines = lines
+        self.domains = domains
+        self.added = added or []
+
+    def __repr__(self):
+        return (
+            f"ImportResult(lines={self.lines}, domains={self.domains}, "
+            f"added={len(self.added)})"
+        )
+
+
+def import_blocklist(source, engine, progress=None, save=True, workers=None):
+    """Merge a blocklist file (path, '-' or text stream) into the engine
+
+    The file is read line by line, so memory grows with the number of new
+    unique domains, not the file size. `progress(lines, bytes_read, total)`
+    is called every PROGRESS_EVERY lines and once at the end. Passing
+    `workers` for a file path parses it in parallel chunks instead.
+    """
+    is_path = isinstance(source, (str, os.PathLike)) and source != "-"
+    if workers is not None and is_path:
+        return _import_parallel(source, engine, progress, save, workers)
+
+    result = ImportResult()
+    stream, owned, total = _open_source(source)
+
+    def counted(lines):
+        """Count lines and domains while streaming, reporting progress"""
+        for line in lines:
+            result.lines += 1
+            if progress is not None and result.lines % PROGRESS_EVERY == 0:
+                progress(result.lines, _tell(stream), total)
+            for domain in parse_line(line):
+                result.domains += 1
+                yield domain
+
+    try:
+        result.added = engine.add_websites(counted(stream))
+    finally:
+        if owned:
+            stream.close()
+
+    if progress is not None:
+        progress(result.lines, total if total is not None else _tell(stream), total)
+    if save and result.added:
+        engine.write_blocked_sites()
+    return result
+
+
+def _open_source(source):
+    """Return (stream, owned, total bytes or None) for a path, '-' or stream"""
+    if hasattr(source, "read"):
+        return source, False, None
+    if source == "-":
+        return sys.stdin, False, None
+    stream = open(source, "r", encoding="utf-8", errors="replace", buffering=READ_BUFFER)
+    return stream, True, os.path.getsize(source)
+
+
+def _import_parallel(path, engine, progress, save, workers):
+    """Import a blocklist file parsed in parallel chunks (see parse_file)"""
+    result = ImportResult()
+    result.lines, result.domains, hosts = parse_file(path, workers=workers, progress=progress)
+    result.added = engine.add_websites(hosts, normalize=False)
+    if save and result.added:
+        engine.write_blocked_sites()
+    return result
+
+
+def _tell(stream):
+    """Best-effort byte position of a stream (None if unknown)"""
+    try:
+        return stream.buffer.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
@@ -0,0 +1,308 @@
+"""
+Certificate Minting
+Per-hostname TLS certificates signed by a local CA, chosen by SNI
+
+A blocked HTTPS site only shows the block page without certificate errors
+if the browser trusts a certificate for that exact hostname. The minter
+creates a local CA once (install its ca.pem in the browser or system trust
+store), then signs a leaf certificate for each blocked hostname the first
+time a client asks for it in the TLS SNI extension. Finished SSLContexts are
+kept in a bounded LRU, and RSA keys are generated ahead of time on a
+background thread so a new hostname only costs a signature during the
+handshake.
+
+Requires the optional `cryptography` package; AVAILABLE is False without it.
+"""
+
+import datetime
+import ipaddress
+import os
+import queue
+import ssl
+import tempfile
+import threading
+from collections import OrderedDict
+
+from domain_normalizer import normalize_domain
+from tls_context import new_server_context
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+    AVAILABLE = True
+except ImportError:
+    AVAILABLE = False
+
+CA_NAME = "Website Blocker Local CA"
+CA_CERT_FILE = "ca.pem"
+CA_KEY_FILE = "ca-key.pem"
+CA_DAYS = 3650
+
+# Browsers reject leaf certificates valid for more than 398 days
+LEAF_DAYS = 397
+KEY_SIZE = 2048
+
+CONTEXT_CACHE_SIZE = 1024
+KEY_POOL_SIZE = 8
+
+# Served to clients that send no SNI
+DEFAULT_HOSTNAME = "localhost"
+
+
+def generate_key():
+    """Generate an RSA private key for a leaf or CA certificate"""
+    return rsa.generate_private_key(public_exponent=65537, key_size=KEY_SIZE)
+
+
+def _key_pem(key):
+    """Serialize a private key as unencrypted PKCS#8 PEM"""
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def _validity(days):
+    """Return (not_before, not_after), backdated a day for skewed clocks"""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return now - datetime.timedelta(days=1), now + datetime.timedelta(days=days)
+
+
+def create_ca():
+    """Create a self-signed CA certificate and its key"""
+    key = generate_key()
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, CA_NAME)])
+    not_before, not_after = _validity(CA_DAYS)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(not_before)
+        .not_valid_after(not_after)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+        .add_extension(
+            x509.KeyUsage(
+                digital_signature=True,
+                content_commitment=False,
+                key_encipherment=False,
+                data_encipherment=False,
+                key_agreement=False,
+                key_cert_sign=True,
+                crl_sign=True,
+                encipher_only=False,
+                decipher_only=False,
+            ),
+            critical=True,
+        )
+        .add_extension(
+            x509.SubjectKeyIdentifier.from_public_key(key.public_key()), critical=False
+        )
+        .sign(key, hashes.SHA256())
+    )
+    return cert, key
+
+
+def load_or_create_ca(directory):
+    """Load the CA from `directory`, creating and saving it on first use"""
+    cert_path = os.path.join(directory, CA_CERT_FILE)
+    key_path = os.path.join(directory, CA_KEY_FILE)
+    if os.path.exists(cert_path) and os.path.exists(key_path):
+        with open(cert_path, "rb") as f:
+            cert = x509.load_pem_x509_certificate(f.read())
+        with open(key_path, "rb") as f:
+            key = serialization.load_pem_private_key(f.read(), password=None)
+        return cert, key
+
+    cert, key = create_ca()
+    os.makedirs(directory, exist_ok=True)
+    fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(_key_pem(key))
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    return cert, key
+
+
+def mint_certificate(hostname, ca_cert, ca_key, key):
+    """Sign a leaf certificate for `hostname` (a DNS name or IP address)"""
+    alt_name: x509.GeneralName
+    try:
+        alt_name = x509.IPAddress(ipaddress.ip_address(hostname))
+    except ValueError:
+        alt_name = x509.DNSName(hostname)
+    not_before, not_after = _validity(LEAF_DAYS)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, hostname[:64])]))
+        .issuer_name(ca_cert.subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(not_before)
+        .not_valid_after(not_after)
+        .add_extension(x509.SubjectAlternativeName([alt_name]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .add_extension(
+            x509.ExtendedKeyUsage([ExtendedKeyUsageOID.SERVER_AUTH]), critical=False
+        )
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_cert.public_key()),
+            critical=False,
+        )
+        .sign(ca_key, hashes.SHA256())
+    )
+
+
+class KeyPool:
+    """Keeps up to `size` fresh private keys generated in the background"""
+
+    def __init__(self, size=KEY_POOL_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._keys: queue.Queue = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        """Generate keys whenever the pool has room"""
+        while not self._stop.is_set():
+            key = generate_key()
+            while not self._stop.is_set():
+                try:
+                    self._keys.put(key, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def get(self):
+        """Return a pre-generated key, or generate one now if none is ready"""
+        try:
+            key = self._keys.get_nowait()
+            self.hits += 1
+            return key
+        except queue.Empty:
+            self.misses += 1
+            return generate_key()
+
+    def ready(self):
+        """Return the number of keys waiting in the pool"""
+        return self._keys.qsize()
+
+    def close(self):
+        """Stop the background generator"""
+        self._stop.set()
+
+
+class CertificateMinter:
+    """Mints and caches an SSLContext per SNI hostname
+
+    With a `blocked` DomainStore, only names it covers (subdomains included)
+    get a minted certificate during the handshake; others get the default one.
+    """
+
+    def __init__(self, ca_dir, cache_size=CONTEXT_CACHE_SIZE, key_pool=None, blocked=None):
+        if not AVAILABLE:
+            raise RuntimeError("Certificate minting requires the 'cryptography' package")
+        self.ca_dir = str(ca_dir)
+        self.ca_cert, self.ca_key = load_or_create_ca(self.ca_dir)
+        self.ca_cert_path = os.path.join(self.ca_dir, CA_CERT_FILE)
+        self.cache_size = cache_size
+        self.key_pool = key_pool if key_pool is not None else KeyPool()
+        self.blocked = blocked
+        self.minted = 0
+        self.cache_hits = 0
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def context_for(self, hostname):
+        """Return the SSLContext for `hostname`, minting it on first use"""
+        hostname = hostname.rstrip(".").lower()
+        with self._lock:
+            context = self._contexts.get(hostname)
+            if context is not None:
+                self._contexts.move_to_end(hostname)
+                self.cache_hits += 1
+                return context
+
+        # Minted outside the lock so one new host doesn't stall the others
+        context = self._build_context(hostname)
+        with self._lock:
+            context = self._contexts.setdefault(hostname, context)
+            self._contexts.move_to_end(hostname)
+            while len(self._contexts) > self.cache_size:
+                self._contexts.popitem(last=False)
+        return context
+
+    def _build_context(self, hostname):
+        """Create a server SSLContext holding a fresh leaf for `hostname`"""
+        key = self.key_pool.get()
+        cert = mint_certificate(hostname, self.ca_cert, self.ca_key, key)
+        context = new_server_context()
+        # load_cert_chain only reads files; the key never outlives this call
+        fd, path = tempfile.mkstemp(suffix=".pem")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(cert.public_bytes(serialization.Encoding.PEM))
+                f.write(self.ca_cert.public_bytes(serialization.Encoding.PEM))
+                f.write(_key_pem(key))
+            context.load_cert_chain(path)
+        finally:
+            os.unlink(path)
+        self.minted += 1
+        return context
+
+    def _should_mint(self, server_name):
+        """Check `server_name` is a valid hostname the block list covers"""
+        host = normalize_domain(server_name)
+        if host is None:
+            return False
+        return self.blocked is None or self.blocked.match(host, subdomains=True) is not None
+
+    def sni_callback(self, ssl_socket, server_name, initial_context):
+        """Switch the handshake to the context minted for `server_name`
+
+        Other names keep the default certificate, so clients can't make the
+        server generate keys for (and evict cached contexts with) any name.
+        """
+        if not server_name or not self._should_mint(server_name):
+            return None
+        try:
+            ssl_socket.context = self.context_for(server_name)
+        except (ValueError, ssl.SSLError) as e:
+            print(f"Certificate minting failed for {server_name}: {e}")
+            return ssl.ALERT_DESCRIPTION_INTERNAL_ERROR
+        return None
+
+    def server_context(self, default_hostname=DEFAULT_HOSTNAME):
+        """Return the listening context: a default leaf plus the SNI callback
+
+        Sessions are cached and tickets issued by this context even after the
+        callback switches to a minted one, so build it once and keep it.
+        """
+        context = self._build_context(default_hostname)
+        context.sni_callback = self.sni_callback
+        return context
+
+    def stats(self):
+        """Return cache and key pool counters"""
+        with self._lock:
+            cached = len(self._contexts)
+        return {
+            "cached": cached,
+            "cache_hits": self.cache_hits,
+            "minted": self.minted,
+            "keys_ready": self.key_pool.ready(),
+            "key_pool_hits": self.key_pool.hits,
+            "key_pool_misses": self.key_pool.misses,
+        }
+
+    def close(self):
+        """Stop background key generation"""
+        self.key_pool.close()
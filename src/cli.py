@@ -0,0 +1,341 @@
+"""
+Command-Line Interface for Website Blocker
+Scripted and bulk blocking without the GUI
+
+Examples:
+    python src/cli.py block facebook.com reddit.com
+    python src/cli.py block -f sites.txt
+    python src/cli.py import adblock.txt hosts.txt
+    python src/cli.py apply
+    python src/cli.py timer 60
+    python src/cli.py dns --upstream 1.1.1.1
+    python src/cli.py serve --workers 4
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from blocker_engine import BlockerEngine, normalize_website
+from blocklist_importer import import_blocklist
+
+
+def read_domains(args, auto_stdin=True):
+    """Collect domains from positional args, --file and/or piped stdin"""
+    domains = list(args.domains or [])
+    source = args.file
+    if auto_stdin and source is None and not domains and not sys.stdin.isatty():
+        source = "-"
+    if source is not None:
+        stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+        try:
+            for line in stream:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    domains.append(line)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+    return domains
+
+
+def normalized(domains):
+    """Normalize and deduplicate domains, keeping their order"""
+    return list(dict.fromkeys(site for site in map(normalize_website, domains) if site))
+
+
+def cmd_block(engine, args):
+    """Add domains to the list and block them"""
+    domains = normalized(read_domains(args))
+    added = engine.add_websites(domains)
+    if added:
+        engine.write_blocked_sites()
+    engine.block(domains)
+    print(f"Blocked {len(domains)} site(s) ({len(added)} new)")
+    return 0
+
+
+def cmd_unblock(engine, args):
+    """Unblock domains, optionally removing them from the list"""
+    domains = normalized(read_domains(args))
+    engine.unblock(domains)
+    if args.remove and engine.remove_websites(domains):
+        engine.write_blocked_sites()
+    print(f"Unblocked {len(domains)} site(s)")
+    return 0
+
+
+def cmd_status(engine, args):
+    """Print the block status of listed (or given) domains"""
+    domains = normalized(read_domains(args, auto_stdin=False))
+    domains = domains or engine.blocked_websites
+    for site, blocked in engine.statuses(domains).items():
+        print(f"{'blocked' if blocked else 'unblocked'}\t{site}")
+    return 0
+
+
+def cmd_import(engine, args):
+    """Merge blocklist files into the saved list without touching the hosts file"""
+    progress = print_progress if args.progress else None
+    added = 0
+    for source in args.sources or ["-"]:
+        result = import_blocklist(
+            source, engine, progress=progress, save=False, workers=args.workers
+        )
+        added += len(result.added)
+        print(
+            f"{source}: {result.lines} line(s), {result.domains} domain(s), "
+            f"{len(result.added)} new"
+        )
+    if added:
+        engine.write_blocked_sites()
+    print(f"Imported {added} new site(s); {len(engine.blocked_websites)} total")
+    return 0
+
+
+def print_progress(lines, bytes_read, total):
+    """Report import progress on stderr"""
+    if bytes_read and total:
+        percent = f" ({100 * bytes_read / total:.0f}%)"
+    else:
+        percent = ""
+    print(f"  {lines:,} lines read{percent}", file=sys.stderr)
+
+
+def cmd_apply(engine, args):
+    """Make the hosts file block exactly the saved list"""
+    changed = engine.apply()
+    state = "updated" if changed else "already up to date"
+    print(f"Hosts file {state}: {len(engine.blocked_websites)} site(s) blocked")
+    return 0
+
+
+def cmd_timer(engine, args):
+    """Block the saved list for N minutes, then unblock it"""
+    if not engine.blocked_websites:
+        print("No sites in the list - add websites first", file=sys.stderr)
+        return 1
+
+    engine.block()
+    if not args.no_flush:
+        engine.dns.flush_pending()
+    end_time = engine.start_timer(args.minutes)
+    timer = engine.timer
+    print(f"Blocked until {end_time.strftime('%H:%M')} - press Ctrl+C to stop early")
+    try:
+        # The timer thread stays alive until its unblock has finished
+        while timer.is_alive():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        engine.cancel_timer()
+        engine.unblock()
+    print("Blocking period ended")
+    return 0
+
+
+def cmd_dns(engine, args):
+    """Serve the saved list as a DNS sinkhole until interrupted"""
+    from dns_sinkhole import DNSSinkhole, parse_address
+
+    sinkhole = DNSSinkhole(
+        engine.store,
+        upstream=parse_address(args.upstream),
+        listen=parse_address(args.listen),
+        nxdomain=args.nxdomain,
+    )
+    sinkhole.start()
+    watcher = None
+    if args.watch:
+        from file_watcher import FileWatcher
+
+        def reload():
+            """Swap in the saved list after another process changed it"""
+            try:
+                added, removed = engine.reload_blocked_sites()
+            except (OSError, ValueError) as e:
+                print(f"Block list not reloaded: {e}")
+                return
+            sinkhole.store = engine.store
+            if added or removed:
+                print(f"Block list reloaded: {len(added)} added, {len(removed)} removed")
+
+        watcher = FileWatcher(engine.config_file, reload)
+    host, port = sinkhole.address
+    print(
+        f"DNS sinkhole on {host}:{port} blocking {len(engine.blocked_websites)} "
+        f"site(s), forwarding to {args.upstream} - press Ctrl+C to stop"
+    )
+    try:
+        while True:
+            time.sleep(args.stats or 3600)
+            if args.stats:
+                stats = sinkhole.stats.snapshot()
+                print(
+                    f"  {stats['queries']:,} queries ({stats['blocked']:,} blocked, "
+                    f"{stats['cached']:,} cached)  {stats['qps']:.0f} q/s  "
+                    f"p99 {stats['p99_ms']:.2f} ms"
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.close()
+        sinkhole.stop()
+    return 0
+
+
+def cmd_serve(engine, args):
+    """Serve the block page from pre-forked worker processes until interrupted"""
+    import prefork
+
+    if not prefork.AVAILABLE:
+        print("Error: serve needs SO_REUSEPORT load balancing (Linux)", file=sys.stderr)
+        return 1
+    supervisor = prefork.PreforkSupervisor(
+        str(Path(__file__).parent.parent / "assets" / "block_page.html"),
+        workers=args.workers,
+        cert_file=args.cert,
+        ca_dir=args.ca_dir,
+        blocked_sites=engine.blocked_websites,
+        mode=args.mode,
+        host=args.host,
+        http_port=args.http_port,
+        https_port=args.https_port,
+        access_log=args.access_log,
+        watch=args.watch,
+    )
+    supervisor.start()
+    print(
+        f"Block page served by {supervisor.worker_count} {args.mode} worker(s) on "
+        f"port {supervisor.http_port} - press Ctrl+C to stop"
+    )
+    try:
+        while True:
+            time.sleep(args.stats or 3600)
+            if args.stats:
+                stats = supervisor.stats()
+                served = sum(
+                    stats.get(name, {}).get("served", 0) for name in ("http", "https")
+                )
+                print(
+                    f"  {stats['workers']} worker(s)  {served:,} connections served  "
+                    f"{stats['restarts']} restart(s)"
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+    return 0
+
+
+def build_parser():
+    """Build the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="website-blocker", description="Block websites via the hosts file"
+    )
+    parser.add_argument("--config", help="path to blocked_sites.json")
+    parser.add_argument("--hosts", help="path to the hosts file")
+    parser.add_argument(
+        "--no-flush", action="store_true", help="skip the DNS cache flush"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_domain_args(p):
+        p.add_argument("domains", nargs="*", help="domains (default: read stdin)")
+        p.add_argument("-f", "--file", help="read domains from a file ('-' for stdin)")
+
+    p = sub.add_parser("block", help="add domains to the list and block them")
+    add_domain_args(p)
+    p.set_defaults(func=cmd_block)
+
+    p = sub.add_parser("unblock", help="unblock domains")
+    add_domain_args(p)
+    p.add_argument("--remove", action="store_true", help="also remove from the list")
+    p.set_defaults(func=cmd_unblock)
+
+    p = sub.add_parser("status", help="show block status")
+    add_domain_args(p)
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser(
+        "import", help="merge hosts/AdBlock/plain blocklists into the list"
+    )
+    p.add_argument("sources", nargs="*", help="blocklist files ('-' or none for stdin)")
+    p.add_argument("--progress", action="store_true", help="report progress")
+    p.add_argument(
+        "--workers",
+        type=int,
+        help="parse files in parallel chunks across N processes (0: all cores)",
+    )
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("apply", help="block exactly the saved list")
+    p.set_defaults(func=cmd_apply)
+
+    p = sub.add_parser("timer", help="block the saved list for N minutes")
+    p.add_argument("minutes", type=float)
+    p.set_defaults(func=cmd_timer)
+
+    p = sub.add_parser("dns", help="run a DNS sinkhole for the saved list")
+    p.add_argument("--listen", default="127.0.0.1:53", help="address to serve on")
+    p.add_argument("--upstream", default="1.1.1.1:53", help="resolver to forward to")
+    p.add_argument(
+        "--nxdomain", action="store_true", help="answer NXDOMAIN instead of 0.0.0.0"
+    )
+    p.add_argument(
+        "--watch", action="store_true", help="reload the list when the config file changes"
+    )
+    p.add_argument(
+        "--stats", type=float, metavar="SECONDS", help="print stats at this interval"
+    )
+    p.set_defaults(func=cmd_dns)
+
+    p = sub.add_parser("serve", help="serve the block page from worker processes")
+    p.add_argument(
+        "--workers", type=int, help="worker processes (default: one per core)"
+    )
+    p.add_argument("--mode", choices=("thread", "pool", "async"), default="pool")
+    p.add_argument("--host", default="", help="address to listen on")
+    p.add_argument("--http-port", type=int, default=80)
+    p.add_argument("--https-port", type=int, default=443)
+    p.add_argument("--cert", help="certificate file for HTTPS")
+    p.add_argument("--ca-dir", help="mint per-host HTTPS certificates from a CA here")
+    p.add_argument(
+        "--access-log", metavar="PATH", help="log block page hits (one file per worker)"
+    )
+    p.add_argument(
+        "--watch", action="store_true", help="reload the block page when the file changes"
+    )
+    p.add_argument(
+        "--stats", type=float, metavar="SECONDS", help="print stats at this interval"
+    )
+    p.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+    """CLI entry point; returns the process exit code"""
+    args = build_parser().parse_args(argv)
+    engine = BlockerEngine(args.config, args.hosts)
+
+    try:
+        code = args.func(engine, args)
+    except PermissionError:
+        print("Permission Error: Run as Administrator", file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        # One synchronous flush for the whole invocation
+        if args.no_flush:
+            engine.dns.cancel()
+        else:
+            engine.dns.flush_pending()
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+DNS Cache Flushing
+Detects the platform's flush commands once and coalesces flush requests
+"""
+
+import platform
+import threading
+
+# Requests arriving within this window collapse into one flush
+DEBOUNCE_SECONDS = 0.5
+COMMAND_TIMEOUT = 10
+
+
+def run_command(args):
+    """Run a flush command without a shell, discarding its output"""
+    import subprocess
+
+    try:
+        subprocess.run(
+            args,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=COMMAND_TIMEOUT,
+            check=False,
+        )
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+
+def detect_flush_commands(system=None, which=None):
+    """Return the flush commands for this platform as argument lists"""
+    system = system or platform.system()
+    if which is None:
+        import shutil
+
+        which = shutil.which
+
+    if system == "Windows":
+        return [
+            ["ipconfig", "/flushdns"],
+            ["nbtstat", "-R"],
+            ["nbtstat", "-RR"],
+            ["arp", "-d", "*"],
+        ]
+
+    if system == "Darwin":
+        return [
+            ["dscacheutil", "-flushcache"],
+            ["killall", "-HUP", "mDNSResponder"],
+        ]
+
+    # Linux and other Unixes: flush whichever resolver caches are installed
+    commands = []
+    if which("resolvectl"):
+        commands.append(["resolvectl", "flush-caches"])
+    elif which("systemd-resolve"):
+        commands.append(["systemd-resolve", "--flush-caches"])
+    if which("nscd"):
+        commands.append(["nscd", "-i", "hosts"])
+    return commands
+
+
+class DNSFlusher:
+    """Runs DNS cache flushes off the calling thread, debouncing bursts"""
+
+    def __init__(self, commands=None, runner=run_command, debounce=DEBOUNCE_SECONDS):
+        self.commands = detect_flush_commands() if commands is None else commands
+        self.runner = runner
+        self.debounce = debounce
+        self.flush_count = 0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def request(self):
+        """Schedule a flush; requests inside the debounce window share it"""
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.debounce, self._run_scheduled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def pending(self):
+        """Check if a flush is scheduled but hasn't run yet"""
+        with self._lock:
+            return self._timer is not None
+
+    def flush_pending(self):
+        """Run a scheduled flush immediately instead of waiting"""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+            self.flush_now()
+
+    def cancel(self):
+        """Drop a scheduled flush"""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def flush_now(self):
+        """Run every flush command synchronously"""
+        for args in self.commands:
+            try:
+                self.runner(args)
+            except Exception as e:
+                print(f"DNS flush error: {e}")
+        self.flush_count += 1
+
+    def _run_scheduled(self):
+        """Timer callback - clear the schedule, then flush"""
+        with self._lock:
+            if self._timer is None:
+                return
+            self._timer = None
+        self.flush_now()
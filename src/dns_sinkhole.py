@@ -0,0 +1,443 @@
+"""
+Local DNS Sinkhole
+UDP/TCP resolver that answers blocked names itself and forwards the rest
+
+An alternative to the hosts file for large lists: a listed domain blocks
+the name and every subdomain, answered with the sinkhole address (or
+NXDOMAIN) straight from the engine's DomainStore. Other queries go to the
+upstream resolver, and its answers are cached until their TTLs run out.
+UDP clients get a truncated upstream answer as it is, so they retry over
+TCP, where the full answer is fetched.
+"""
+
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_LISTEN = ("127.0.0.1", 53)
+DEFAULT_UPSTREAM = ("1.1.1.1", 53)
+SINKHOLE_IPV4 = "0.0.0.0"
+SINKHOLE_IPV6 = "::"
+
+# Short, so unblocking takes effect quickly in client caches
+BLOCK_TTL = 10
+CACHE_SIZE = 10000
+UPSTREAM_TIMEOUT = 2.0
+LATENCY_SAMPLES = 10000
+
+# How often the serve loops check for a stop request
+POLL_INTERVAL = 0.1
+
+# UDP queries are answered by this many threads; datagrams arriving while
+# this many wait are dropped (clients retry)
+UDP_WORKERS = 8
+UDP_QUEUE_DEPTH = 1024
+
+TYPE_A = 1
+TYPE_AAAA = 28
+TYPE_OPT = 41
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+
+_HEADER = struct.Struct("!HHHHHH")
+_RR_FIXED = struct.Struct("!HHIH")
+
+
+def parse_address(text, default_port=53):
+    """Parse "host", "host:port", a bare IPv6 address or "[v6]:port" into (host, port)"""
+    if text.startswith("["):
+        host, _, rest = text[1:].partition("]")
+        if not rest:
+            return host, default_port
+        if not rest.startswith(":"):
+            raise ValueError(f"invalid address: {text}")
+        return host, int(rest[1:])
+    host, sep, port = text.rpartition(":")
+    # More than one colon is an unbracketed IPv6 address with no port
+    if not sep or ":" in host:
+        return text, default_port
+    return host, int(port)
+
+
+def parse_question(message):
+    """Return (qname, qtype, qclass, question_end) of a one-question query"""
+    if len(message) < _HEADER.size or _HEADER.unpack_from(message)[2] != 1:
+        raise ValueError("expected exactly one question")
+    labels = []
+    pos = _HEADER.size
+    while True:
+        length = message[pos]
+        pos += 1
+        if length == 0:
+            break
+        if length & 0xC0:
+            raise ValueError("compressed name in question")
+        labels.append(message[pos : pos + length].decode("ascii", "replace"))
+        pos += length
+    qtype, qclass = struct.unpack_from("!HH", message, pos)
+    return ".".join(labels).lower(), qtype, qclass, pos + 4
+
+
+def build_response(query, question_end, rcode=0, answers=(), ttl=BLOCK_TTL):
+    """Answer `query` with (rtype, rdata) records for its own question"""
+    qid, flags = struct.unpack_from("!HH", query)
+    # QR, copied opcode and RD, RA, rcode
+    flags = 0x8000 | (flags & 0x7900) | 0x0080 | rcode
+    parts = [_HEADER.pack(qid, flags, 1, len(answers), 0, 0), query[12:question_end]]
+    for rtype, rdata in answers:
+        # 0xC00C points back at the question name
+        parts.append(b"\xc0\x0c" + _RR_FIXED.pack(rtype, 1, ttl, len(rdata)) + rdata)
+    return b"".join(parts)
+
+
+def _skip_name(message, pos):
+    """Return the offset just past a (possibly compressed) name"""
+    while True:
+        length = message[pos]
+        if length & 0xC0 == 0xC0:
+            return pos + 2
+        pos += 1 + length
+        if length == 0:
+            return pos
+
+
+def record_ttls(message):
+    """Return [(offset, ttl)] for every TTL field in a response"""
+    qdcount, ancount, nscount, arcount = struct.unpack_from("!HHHH", message, 4)
+    pos = _HEADER.size
+    for _ in range(qdcount):
+        pos = _skip_name(message, pos) + 4
+    ttls = []
+    for _ in range(ancount + nscount + arcount):
+        pos = _skip_name(message, pos)
+        rtype, _, ttl, rdlength = _RR_FIXED.unpack_from(message, pos)
+        if rtype != TYPE_OPT:
+            ttls.append((pos + 4, ttl))
+        pos += _RR_FIXED.size + rdlength
+    return ttls
+
+
+class TTLCache:
+    """LRU cache of upstream responses that expire with their lowest TTL"""
+
+    def __init__(self, maxsize=CACHE_SIZE, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, qid):
+        """Return the cached response with `qid` and aged TTLs, or None"""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            response, ttls, stored, expires = entry
+            if now >= expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+
+        elapsed = int(now - stored)
+        message = bytearray(response)
+        struct.pack_into("!H", message, 0, qid)
+        for offset, ttl in ttls:
+            struct.pack_into("!I", message, offset, max(0, ttl - elapsed))
+        return bytes(message)
+
+    def put(self, key, response):
+        """Cache a response; ones without records or with TTL 0 are skipped"""
+        try:
+            ttls = record_ttls(response)
+        except (IndexError, struct.error):
+            return
+        lifetime = min((ttl for _, ttl in ttls), default=0)
+        if lifetime <= 0:
+            return
+        now = self.clock()
+        with self._lock:
+            self._entries[key] = (response, ttls, now, now + lifetime)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class SinkholeStats:
+    """Thread-safe query counters and a window of recent latencies"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.counts = dict.fromkeys(
+            ("queries", "blocked", "cached", "forwarded", "failed"), 0
+        )
+        self._latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds):
+        """Count one answered query of `kind` that took `seconds`"""
+        with self._lock:
+            self.counts["queries"] += 1
+            self.counts[kind] += 1
+            self._latencies.append(seconds)
+
+    def snapshot(self):
+        """Return counters plus queries/second and p99 latency in ms"""
+        with self._lock:
+            counts: dict[str, float] = dict(self.counts)
+            latencies = sorted(self._latencies)
+        elapsed = max(self.clock() - self.started, 1e-9)
+        counts["qps"] = counts["queries"] / elapsed
+        counts["p99_ms"] = (
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            if latencies
+            else 0.0
+        )
+        return counts
+
+
+class DNSRequestHandler(socketserver.BaseRequestHandler):
+    """Answers one UDP datagram"""
+
+    server: "PooledUDPServer"
+
+    def handle(self):
+        """Resolve the datagram and send the reply to the client"""
+        data, sock = self.request
+        response = self.server.sinkhole.resolve(data)
+        if response is not None:
+            sock.sendto(response, self.client_address)
+
+
+class DNSStreamHandler(socketserver.BaseRequestHandler):
+    """Answers length-prefixed queries on one TCP connection"""
+
+    server: "ThreadedTCPServer"
+
+    def handle(self):
+        """Serve queries until the client closes the connection"""
+        self.request.settimeout(UPSTREAM_TIMEOUT * 2)
+        try:
+            while True:
+                query = _recv_message(self.request)
+                if query is None:
+                    return
+                response = self.server.sinkhole.resolve(query, tcp=True)
+                if response is None:
+                    return
+                self.request.sendall(struct.pack("!H", len(response)) + response)
+        except OSError:
+            pass
+
+
+class PooledUDPServer(socketserver.UDPServer):
+    """Answers datagrams on a fixed pool of threads instead of one per datagram"""
+
+    allow_reuse_address = True
+    sinkhole: "DNSSinkhole"
+
+    def __init__(
+        self, server_address, handler_class, workers=UDP_WORKERS, queue_depth=UDP_QUEUE_DEPTH
+    ):
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(queue_depth)
+        # server_close() runs if binding fails, before there are workers
+        self._workers = []
+        super().__init__(server_address, handler_class)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"dns-udp-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        """Queue a datagram for the pool, or drop it if the queue is full"""
+        try:
+            self._queue.put_nowait((request, client_address))
+        except queue.Full:
+            self.dropped += 1
+
+    def _work(self):
+        """Worker thread: answer queued datagrams until a None sentinel"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+
+    def server_close(self):
+        """Close the socket, drop queued datagrams and stop the workers"""
+        super().server_close()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._workers:
+            self._queue.put(None)
+        self._workers = []
+
+
+class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    sinkhole: "DNSSinkhole"
+
+
+def _recv_exact(sock, count):
+    """Read exactly `count` bytes, or None if the peer closed first"""
+    chunks = []
+    while count:
+        chunk = sock.recv(count)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        count -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_message(sock):
+    """Read one length-prefixed DNS message from a TCP socket"""
+    prefix = _recv_exact(sock, 2)
+    if prefix is None:
+        return None
+    return _recv_exact(sock, struct.unpack("!H", prefix)[0])
+
+
+class DNSSinkhole:
+    """Blocks listed domains and their subdomains, forwarding everything else"""
+
+    def __init__(
+        self,
+        store,
+        upstream=DEFAULT_UPSTREAM,
+        listen=DEFAULT_LISTEN,
+        sinkhole_ip=SINKHOLE_IPV4,
+        sinkhole_ipv6=SINKHOLE_IPV6,
+        nxdomain=False,
+        cache_size=CACHE_SIZE,
+        timeout=UPSTREAM_TIMEOUT,
+    ):
+        self.store = store
+        self.upstream = upstream
+        self.listen = listen
+        self.nxdomain = nxdomain
+        self.timeout = timeout
+        self.cache = TTLCache(cache_size)
+        self.stats = SinkholeStats()
+        self._block_answers = {
+            TYPE_A: [(TYPE_A, socket.inet_pton(socket.AF_INET, sinkhole_ip))],
+            TYPE_AAAA: [(TYPE_AAAA, socket.inet_pton(socket.AF_INET6, sinkhole_ipv6))],
+        }
+        self.udp_server = None
+        self.tcp_server = None
+        self._threads = []
+
+    @property
+    def address(self):
+        """(host, port) actually bound, once started"""
+        return self.udp_server.server_address if self.udp_server else self.listen
+
+    def start(self):
+        """Bind UDP and TCP on the same port and serve in background threads"""
+        self.udp_server = PooledUDPServer(self.listen, DNSRequestHandler)
+        try:
+            # Port 0 picks a free UDP port; TCP then binds the same one
+            self.tcp_server = ThreadedTCPServer(self.address, DNSStreamHandler)
+        except OSError:
+            self.udp_server.server_close()
+            self.udp_server = None
+            raise
+        for server in (self.udp_server, self.tcp_server):
+            server.sinkhole = self
+            thread = threading.Thread(
+                target=server.serve_forever, args=(POLL_INTERVAL,), daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop both servers"""
+        for server in (self.udp_server, self.tcp_server):
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        self.udp_server = None
+        self.tcp_server = None
+        self._threads = []
+
+    def resolve(self, query, tcp=False):
+        """Return the wire response for a wire query (None to drop it)
+
+        With `tcp` False the reply may be truncated (TC set), as upstream
+        sent it; the client then asks again over TCP.
+        """
+        start = time.perf_counter()
+        try:
+            qname, qtype, _, question_end = parse_question(query)
+        except (ValueError, IndexError, struct.error):
+            return None
+
+        if self.store.match(qname, subdomains=True) is not None:
+            kind = "blocked"
+            if self.nxdomain:
+                response = build_response(query, question_end, RCODE_NXDOMAIN)
+            else:
+                answers = self._block_answers.get(qtype, [])
+                response = build_response(query, question_end, answers=answers)
+        else:
+            # UDP and TCP are cached apart: only TCP gets the untruncated answer
+            key = (qname, qtype, query[question_end - 2 : question_end], tcp)
+            response = self.cache.get(key, struct.unpack_from("!H", query)[0])
+            kind = "cached"
+            if response is None:
+                try:
+                    response = self.forward(query, tcp)
+                    self.cache.put(key, response)
+                    kind = "forwarded"
+                except (OSError, ValueError):
+                    response = build_response(query, question_end, RCODE_SERVFAIL)
+                    kind = "failed"
+
+        self.stats.record(kind, time.perf_counter() - start)
+        return response
+
+    def forward(self, query, tcp=False):
+        """Send a query upstream over UDP; with `tcp`, retry over TCP if truncated"""
+        family = socket.AF_INET6 if ":" in self.upstream[0] else socket.AF_INET
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.upstream)
+            sock.send(query)
+            while True:
+                response = sock.recv(65535)
+                # Ignore stray datagrams that don't answer this query
+                if response[:2] == query[:2]:
+                    break
+        if len(response) < _HEADER.size:
+            raise ValueError("short upstream response")
+        if tcp and response[2] & 0x02:
+            return self._forward_tcp(query)
+        return response
+
+    def _forward_tcp(self, query):
+        """Send a query upstream over TCP"""
+        with socket.create_connection(self.upstream, timeout=self.timeout) as sock:
+            sock.sendall(struct.pack("!H", len(query)) + query)
+            response = _recv_message(sock)
+        if response is None:
+            raise ValueError("upstream closed the connection")
+        return response
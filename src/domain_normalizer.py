@@ -0,0 +1,80 @@
+"""
+Domain Normalization and Validation
+Turns user input and blocklist entries into canonical ASCII hostnames
+"""
+
+import re
+from functools import lru_cache
+
+# Precompiled pipeline stages, applied in order
+_URL_CHARS = re.compile(r"[:/@?#]")
+_SCHEME = re.compile(r"^[a-z][a-z0-9+.\-]*://")
+_USERINFO = re.compile(r"^[^/@]*@")
+_PATH = re.compile(r"[/?#].*$", re.DOTALL)
+_PORT = re.compile(r":\d*$")
+
+# Ideographic full stops that IDNA treats as label separators
+_IDNA_DOTS = str.maketrans({"\u3002": ".", "\uff0e": ".", "\uff61": "."})
+
+# RFC 1123 labels (1-63 chars, no leading/trailing hyphen), at least two of
+# them, and a last label with a letter in it so bare IPs are rejected
+_HOSTNAME = re.compile(
+    r"(?:(?!-)[a-z0-9-]{1,63}(?<!-)\.)+(?=[a-z0-9-]*[a-z])(?!-)[a-z0-9-]{1,63}(?<!-)"
+)
+
+
+def normalize_domain(raw):
+    """Return the canonical hostname for `raw`, or None if it isn't valid
+
+    Strips scheme, credentials, path, port, a leading "www." and a trailing
+    dot, lower-cases, converts internationalized names to punycode and checks
+    the result against RFC 1123 hostname rules.
+    """
+    host = raw.strip().lower()
+
+    # Most blocklist entries are bare hostnames; skip the URL stages for them
+    if _URL_CHARS.search(host):
+        host = _SCHEME.sub("", host, count=1)
+        host = _USERINFO.sub("", host, count=1)
+        host = _PATH.sub("", host, count=1)
+        host = _PORT.sub("", host, count=1)
+    if host.startswith("www."):
+        host = host[4:]
+    if host.endswith("."):
+        host = host[:-1]
+
+    if not host.isascii():
+        try:
+            host = ".".join(
+                label if label.isascii() else _idna_label(label)
+                for label in host.translate(_IDNA_DOTS).split(".")
+            )
+        except UnicodeError:
+            return None
+
+    if len(host) > 253 or _HOSTNAME.fullmatch(host) is None:
+        return None
+    return host
+
+
+@lru_cache(maxsize=4096)
+def _idna_label(label):
+    """Punycode one label (cached - IDN lists repeat TLDs and brands)"""
+    return label.encode("idna").decode("ascii")
+
+
+def normalize_pattern(raw):
+    """Like normalize_domain, but also accepts a "*.example.com" wildcard"""
+    raw = raw.strip()
+    if raw.startswith("*."):
+        host = normalize_domain(raw[2:])
+        return None if host is None else f"*.{host}"
+    return normalize_domain(raw)
+
+
+def normalize_domains(raws):
+    """Yield valid, normalized hostnames from an iterable of raw entries"""
+    for raw in raws:
+        host = normalize_domain(raw)
+        if host is not None:
+            yield host
@@ -0,0 +1,163 @@
+"""
+Compact Domain Store
+Exact and wildcard domain patterns packed into one bytes blob
+
+Patterns are ASCII bytes stored back to back in a single bytes object and
+grouped into hash buckets, with two unsigned-int arrays holding the key and
+bucket offsets. Each entry costs its length plus about 8 bytes, instead of a
+full str object and list slot. A lookup hashes the host and each parent
+wildcard ("*.example.com") once: O(labels) with no per-entry objects.
+"""
+
+from array import array
+
+# Pending additions are folded into the blob once this many accumulate
+COMPACT_THRESHOLD = 65536
+
+
+def _offset_array(limit):
+    """Return an empty offset array wide enough to index up to `limit`"""
+    return array("I" if limit < 2**32 else "Q")
+
+
+class DomainStore:
+    """Set of exact and wildcard-subdomain ("*.example.com") patterns"""
+
+    def __init__(self, patterns=()):
+        self._added = set()
+        self._removed = set()
+        # Stored patterns are normalized ASCII; anything else can never match
+        self._build(
+            {
+                p.lower().rstrip(".").encode("ascii")
+                for p in patterns
+                if p.isascii()
+            }
+        )
+
+    def _build(self, keys):
+        """Pack unique byte keys into hash-ordered buckets"""
+        buckets = max(1, len(keys))
+        ordered = sorted(keys, key=lambda key: hash(key) % buckets)
+
+        offsets = _offset_array(sum(map(len, ordered)))
+        starts = _offset_array(len(ordered))
+        offsets.append(0)
+        position = 0
+        bucket = 0
+        starts.append(0)
+        for index, key in enumerate(ordered):
+            target = hash(key) % buckets
+            while bucket < target:
+                starts.append(index)
+                bucket += 1
+            position += len(key)
+            offsets.append(position)
+        while bucket < buckets:
+            starts.append(len(ordered))
+            bucket += 1
+
+        # One assignment, so lookups on other threads never see a mix of
+        # old and new arrays
+        self._packed = (b"".join(ordered), offsets, starts, buckets)
+
+    def __len__(self):
+        return len(self._packed[1]) - 1 + len(self._added) - len(self._removed)
+
+    def __contains__(self, host):
+        return self.match(host) is not None
+
+    def __iter__(self):
+        """Yield every pattern (in no particular order)"""
+        self.compact()
+        blob, offsets, _, _ = self._packed
+        for i in range(len(offsets) - 1):
+            yield blob[offsets[i] : offsets[i + 1]].decode("ascii")
+
+    @property
+    def nbytes(self):
+        """Bytes used by the packed keys and offset arrays"""
+        blob, offsets, starts, _ = self._packed
+        return (
+            len(blob)
+            + offsets.itemsize * len(offsets)
+            + starts.itemsize * len(starts)
+        )
+
+    def _in_blob(self, key):
+        """Scan the key's hash bucket for an exact byte match"""
+        blob, offsets, starts, buckets = self._packed
+        bucket = hash(key) % buckets
+        for i in range(starts[bucket], starts[bucket + 1]):
+            if blob[offsets[i] : offsets[i + 1]] == key:
+                return True
+        return False
+
+    def _has_key(self, key):
+        """Check one str key against the pending overlay and the blob"""
+        if key in self._removed:
+            return False
+        return key in self._added or self._in_blob(key.encode("ascii"))
+
+    def has(self, pattern):
+        """Check if exactly this pattern is stored"""
+        try:
+            return self._has_key(pattern.lower().rstrip("."))
+        except UnicodeEncodeError:
+            return False
+
+    def match(self, host, subdomains=False):
+        """Return the stored pattern covering `host`, or None
+
+        An exact entry wins; otherwise the closest "*.parent" wildcard. With
+        subdomains=True a plain "example.com" entry also covers its
+        subdomains, as DNS blocking expects.
+        """
+        host = host.lower().rstrip(".")
+        try:
+            if self._has_key(host):
+                return host
+            dot = host.find(".")
+            while dot != -1:
+                wildcard = "*" + host[dot:]
+                if self._has_key(wildcard):
+                    return wildcard
+                if subdomains and self._has_key(host[dot + 1 :]):
+                    return host[dot + 1 :]
+                dot = host.find(".", dot + 1)
+        except UnicodeEncodeError:
+            pass
+        return None
+
+    def add(self, pattern):
+        """Add a pattern (buffered until the next compaction)"""
+        key = pattern.lower().rstrip(".")
+        if not key.isascii():
+            raise ValueError(f"{pattern!r} is not an ASCII domain pattern")
+        self._removed.discard(key)
+        if not self._in_blob(key.encode("ascii")):
+            self._added.add(key)
+            if len(self._added) >= COMPACT_THRESHOLD:
+                self.compact()
+
+    def discard(self, pattern):
+        """Remove a pattern if present"""
+        key = pattern.lower().rstrip(".")
+        self._added.discard(key)
+        if key.isascii() and self._in_blob(key.encode("ascii")):
+            self._removed.add(key)
+
+    def compact(self):
+        """Fold pending additions and removals into the packed blob"""
+        if not self._added and not self._removed:
+            return
+        blob, offsets, _, _ = self._packed
+        added = set(self._added)
+        removed = set(self._removed)
+        keys = {blob[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)}
+        keys.difference_update(key.encode("ascii") for key in removed)
+        keys.update(key.encode("ascii") for key in added)
+        # Publish the new blob before dropping the overlay it replaces
+        self._build(keys)
+        self._added -= added
+        self._removed -= removed
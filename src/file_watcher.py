@@ -0,0 +1,164 @@
+"""
+File Watcher
+Runs a callback when a file changes, via inotify on Linux or stat polling
+
+The file's directory is watched rather than the file itself, so saves that
+rename a temp file over the original (editors, write_blocked_sites) are
+seen as well as in-place writes. Every wake-up is confirmed against the
+file's inode, size and mtime, so the callback runs once per real change.
+With inotify the same check also runs every poll interval, in case an
+event was missed; without it (other platforms, or no libc via ctypes)
+polling is all there is.
+"""
+
+import functools
+import os
+import select
+import struct
+import sys
+import threading
+
+POLL_INTERVAL = 1.0
+
+# After an event, wait this long for the rest of a save before checking
+SETTLE_DELAY = 0.05
+
+# inotify(7) event bits: finished writes, renames and creation/removal
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event: wd, mask, cookie, len, then `len` bytes of name
+_EVENT = struct.Struct("iIII")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_inotify():
+    """Return libc with inotify set up through ctypes, or None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    # ctypes is imported here so blocker_engine imports stay fast
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def inotify_available():
+    """True if inotify can be used through ctypes on this system"""
+    return _load_inotify() is not None
+
+
+def stat_key(path):
+    """Identify a file version by inode, size and mtime (None if missing)"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class FileWatcher:
+    """Calls `on_change()` on a background thread each time `path` changes"""
+
+    def __init__(self, path, on_change, interval=POLL_INTERVAL, use_inotify=True):
+        self.path = os.path.abspath(os.fspath(path))
+        self.name = os.fsencode(os.path.basename(self.path))
+        self.on_change = on_change
+        self.interval = interval
+        self.changes = 0
+        self._key = stat_key(self.path)
+        self._stop = threading.Event()
+        self._fd = self._open_inotify() if use_inotify and inotify_available() else None
+        self.backend = "poll" if self._fd is None else "inotify"
+        self._wake_r = self._wake_w = None
+        if self._fd is not None:
+            # Lets close() interrupt select() at once
+            self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+        self._thread.start()
+
+    def _open_inotify(self):
+        """Return an inotify fd watching the file's directory, or None"""
+        libc = _load_inotify()
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        directory = os.fsencode(os.path.dirname(self.path))
+        if libc.inotify_add_watch(fd, directory, WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def close(self, timeout=None):
+        """Stop watching"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._wake_w is not None:
+            os.write(self._wake_w, b"x")
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+
+    def _run(self):
+        """Watcher loop: wait for an event or the poll interval, then check"""
+        while not self._stop.is_set():
+            if self._fd is None:
+                if self._stop.wait(self.interval):
+                    return
+            else:
+                ready = select.select([self._fd, self._wake_r], [], [], self.interval)[0]
+                if self._wake_r in ready:
+                    return
+                if self._fd in ready:
+                    if self.name not in self._read_events(self._fd):
+                        continue
+                    # Let the rest of a multi-step save land first
+                    if self._stop.wait(SETTLE_DELAY):
+                        return
+                    self._read_events(self._fd)
+            self._check()
+
+    def _read_events(self, fd):
+        """Drain pending inotify events from `fd`; returns the file names they name"""
+        names: set[bytes] = set()
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            if not data:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                names.add(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+
+    def _check(self):
+        """Run the callback if the file's inode, size or mtime moved"""
+        key = stat_key(self.path)
+        if key == self._key:
+            return
+        self._key = key
+        if key is None:
+            # Deleted; wait for it to come back
+            return
+        self.changes += 1
+        try:
+            self.on_change()
+        except Exception as e:
+            print(f"File watcher callback error: {e}")
@@ -0,0 +1,251 @@
+"""
+Hosts File Engine for Website Blocking
+Owns a marker-delimited section of the hosts file and rewrites it atomically
+"""
+
+import os
+
+SECTION_BEGIN = "# >>> Website Blocker >>>"
+SECTION_END = "# <<< Website Blocker <<<"
+
+# Addresses that count as "blocked" when found outside our own section
+BLOCK_IPS = ("127.0.0.1", "0.0.0.0")
+
+# Read/write buffer used when streaming large hosts files
+COPY_BUFFER = 1 << 20
+
+
+def expand_variations(website):
+    """Return the hostnames blocked for a single website
+
+    Hosts files have no wildcards, so "*.example.com" expands to the common
+    subdomains only, without the bare domain.
+    """
+    if website.startswith("*."):
+        return expand_variations(website[2:])[1:]
+    return [
+        website,
+        f"www.{website}",
+        f"m.{website}",
+        f"mobile.{website}",
+        f"app.{website}",
+        f"api.{website}",
+    ]
+
+
+class HostsIndex:
+    """Parsed hostname -> IP map, rebuilt only when the hosts file changes"""
+
+    def __init__(self, hosts_path):
+        self.hosts_path = hosts_path
+        self.entries = {}
+        self._stat_key = None
+
+    def _current_stat_key(self):
+        """Identify the file version by inode, size and mtime"""
+        try:
+            st = os.stat(self.hosts_path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def refresh(self):
+        """Re-parse the hosts file if its stat changed since the last build"""
+        key = self._current_stat_key()
+        if key is not None and key == self._stat_key:
+            return self.entries
+
+        entries: dict[str, str] = {}
+        if key is not None:
+            try:
+                with open(self.hosts_path, "r", errors="replace") as f:
+                    for line in f:
+                        tokens = line.split("#", 1)[0].split()
+                        for host in tokens[1:]:
+                            # First mapping wins, as with the system resolver
+                            entries.setdefault(host.lower(), tokens[0])
+            except OSError:
+                key = None
+
+        self.entries = entries
+        self._stat_key = key
+        return entries
+
+    def invalidate(self):
+        """Force the next lookup to re-parse the file"""
+        self._stat_key = None
+
+    def lookup(self, hostname):
+        """Return the IP a hostname is mapped to, or None"""
+        return self.refresh().get(hostname.lower())
+
+
+class HostsEngine:
+    """Applies whole sets of blocked hostnames in a single atomic write"""
+
+    def __init__(self, hosts_path, redirect_ip="127.0.0.1"):
+        self.hosts_path = hosts_path
+        self.redirect_ip = redirect_ip
+        self.block_ips = BLOCK_IPS + (redirect_ip,)
+        self.index = HostsIndex(hosts_path)
+
+    def is_blocked(self, website):
+        """Check if a website or its www variation maps to a block address"""
+        return self._is_blocked(self.index.refresh(), website)
+
+    def statuses(self, websites):
+        """Return {website: blocked?} for many websites from one index build"""
+        entries = self.index.refresh()
+        return {website: self._is_blocked(entries, website) for website in websites}
+
+    def _is_blocked(self, entries, website):
+        """Check `website` against an already refreshed index"""
+        website = website.lower()
+        if website.startswith("*."):
+            return entries.get(f"www.{website[2:]}") in self.block_ips
+        return (
+            entries.get(website) in self.block_ips
+            or entries.get(f"www.{website}") in self.block_ips
+        )
+
+    def managed_hosts(self):
+        """Return the set of hostnames currently in our section"""
+        managed = set()
+        try:
+            with open(self.hosts_path, "r", errors="surrogateescape") as f:
+                in_section = False
+                for line in f:
+                    marker = self._marker(line)
+                    if marker is not None:
+                        in_section = marker
+                    elif in_section:
+                        managed.update(line.split("#", 1)[0].split()[1:])
+        except FileNotFoundError:
+            pass
+        return managed
+
+    def block(self, websites):
+        """Block websites (and their variations) in one write"""
+        return self.update(block=websites)
+
+    def unblock(self, websites):
+        """Unblock websites (and their variations) in one write"""
+        return self.update(unblock=websites)
+
+    def update(self, block=(), unblock=()):
+        """Add and remove websites from the managed section in one write"""
+        add = {host for site in block for host in expand_variations(site)}
+        remove = {host for site in unblock for host in expand_variations(site)}
+        remove -= add
+        return self._rewrite(lambda managed: (managed | add) - remove, remove)
+
+    def apply(self, hostnames, release=()):
+        """Make the managed section contain exactly `hostnames`
+
+        Lines outside the section that block any hostname in `release` are
+        dropped too, so entries written by older versions get cleaned up.
+        Returns True if the file was rewritten.
+        """
+        desired = set(hostnames)
+        return self._rewrite(lambda managed: desired, set(release))
+
+    @staticmethod
+    def _marker(line):
+        """Return True/False for a section begin/end marker, else None"""
+        if not line.startswith("#"):
+            return None
+        stripped = line.strip()
+        if stripped == SECTION_BEGIN:
+            return True
+        if stripped == SECTION_END:
+            return False
+        return None
+
+    def _blocks_any(self, line, hostnames):
+        """Check if a hosts line maps one of `hostnames` to a block address"""
+        tokens = line.split("#", 1)[0].split()
+        if len(tokens) < 2 or tokens[0] not in self.block_ips:
+            return False
+        return not hostnames.isdisjoint(tokens[1:])
+
+    def _rewrite(self, desired_for, release):
+        """Stream the hosts file into a temp file with a new managed section
+
+        Lines are copied one at a time, so memory stays constant no matter
+        how large the hosts file is. Each line outside the section is
+        tokenized once and its hostnames checked against `release`.
+        """
+        import tempfile
+
+        directory = os.path.dirname(os.path.abspath(self.hosts_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".hosts.", dir=directory)
+        try:
+            with os.fdopen(
+                fd, "w", buffering=COPY_BUFFER, errors="surrogateescape"
+            ) as out:
+                managed, dropped, last = self._copy_outside(out, release)
+
+                desired = desired_for(managed)
+                if not dropped and desired == managed:
+                    return False
+
+                # Make sure the section starts on its own line
+                if not last.endswith("\n"):
+                    out.write("\n")
+                if desired:
+                    out.write(SECTION_BEGIN + "\n")
+                    for host in sorted(desired):
+                        out.write(f"{self.redirect_ip} {host}\n")
+                    out.write(SECTION_END + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+
+            self._replace(tmp_path)
+            return True
+        finally:
+            self.index.invalidate()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _copy_outside(self, out, release):
+        """Copy non-section lines to `out`, returning (managed, dropped, last)"""
+        managed: set[str] = set()
+        dropped = 0
+        last = "\n"
+        in_section = False
+        try:
+            src = open(
+                self.hosts_path, "r", buffering=COPY_BUFFER, errors="surrogateescape"
+            )
+        except FileNotFoundError:
+            return managed, dropped, last
+
+        with src:
+            for line in src:
+                marker = self._marker(line)
+                if marker is not None:
+                    in_section = marker
+                elif in_section:
+                    managed.update(line.split("#", 1)[0].split()[1:])
+                elif release and self._blocks_any(line, release):
+                    dropped += 1
+                else:
+                    out.write(line)
+                    last = line
+        return managed, dropped, last
+
+    def _replace(self, tmp_path):
+        """Atomically rename the temp file over the hosts file"""
+        import shutil
+
+        if os.path.exists(self.hosts_path):
+            shutil.copymode(self.hosts_path, tmp_path)
+        try:
+            os.replace(tmp_path, self.hosts_path)
+        except OSError:
+            # Bind-mounted or locked hosts files can't be replaced;
+            # fall back to copying over them in place
+            with open(tmp_path, "rb") as src, open(self.hosts_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER)
+                dst.flush()
+                os.fsync(dst.fileno())
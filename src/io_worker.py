@@ -0,0 +1,150 @@
+"""
+Background I/O Worker
+Runs hosts edits, DNS flushes and config saves off the Tk mainloop
+"""
+
+import queue
+import threading
+
+# How often the Tk side checks for finished jobs
+POLL_INTERVAL_MS = 25
+
+
+class IOWorker:
+    """Single worker thread with a command queue and a result queue
+
+    Jobs run in submission order. Consecutive hosts edits waiting in the
+    queue are merged into one engine update, so rapid clicks cost a single
+    hosts write and a single DNS flush. Callbacks run on whichever thread
+    calls `poll()` - the Tk thread when attached with `attach(root)`.
+    """
+
+    def __init__(self, hosts, dns=None):
+        self.hosts = hosts
+        self.dns = dns
+        self.commands: queue.Queue[tuple] = queue.Queue()
+        self.results: queue.Queue[tuple] = queue.Queue()
+        self.batches_applied = 0
+        self._held = None
+        self._root = None
+        self._interval_ms = POLL_INTERVAL_MS
+        self._thread = threading.Thread(target=self._run, name="io-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, callback=None):
+        """Run func(*args) on the worker; callback(result, error) on poll"""
+        self.commands.put(("call", func, args, callback))
+
+    def submit_hosts_change(self, block=(), unblock=(), callback=None):
+        """Queue a hosts edit; edits queued back-to-back are applied together"""
+        self.commands.put(("hosts", list(block), list(unblock), callback))
+
+    def post(self, callback, result=None, error=None):
+        """Queue callback(result, error) for the next poll, from any thread"""
+        self.results.put((callback, result, error))
+
+    def attach(self, root, interval_ms=POLL_INTERVAL_MS):
+        """Dispatch results on the Tk thread by polling with root.after"""
+        self._root = root
+        self._interval_ms = interval_ms
+        self._root.after(interval_ms, self._poll_tk)
+
+    def poll(self):
+        """Run callbacks for every finished job"""
+        while True:
+            try:
+                callback, result, error = self.results.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                callback(result, error)
+            except Exception as e:
+                print(f"Worker callback error: {e}")
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued job has run (for scripts and tests)"""
+        done = threading.Event()
+        self.commands.put(("call", done.set, (), None))
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Finish queued jobs and stop the worker thread"""
+        self.commands.put(("stop",))
+        self._thread.join(timeout)
+
+    def _poll_tk(self):
+        """Tk timer callback - dispatch results, then reschedule"""
+        self.poll()
+        if self._thread.is_alive() and self._root is not None:
+            self._root.after(self._interval_ms, self._poll_tk)
+
+    def _next_job(self, block=True):
+        """Take the held-back job first, then read from the queue"""
+        if self._held is not None:
+            job, self._held = self._held, None
+            return job
+        if block:
+            return self.commands.get()
+        return self.commands.get_nowait()
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            job = self._next_job()
+            if job[0] == "stop":
+                return
+            if job[0] == "hosts":
+                self._apply_hosts_batch(job)
+            else:
+                _, func, args, callback = job
+                self._call(func, args, callback)
+
+    def _call(self, func, args, callback):
+        """Run one job and queue its result"""
+        try:
+            result, error = func(*args), None
+        except Exception as e:
+            result, error = None, e
+        if callback is not None:
+            self.results.put((callback, result, error))
+
+    def _apply_hosts_batch(self, first):
+        """Merge all queued hosts edits and apply them in one update"""
+        jobs = self._take_hosts_jobs(first)
+
+        # Later edits win, so block-then-unblock of one site is an unblock
+        desired = {}
+        for _, block, unblock, _ in jobs:
+            desired.update(dict.fromkeys(block, True))
+            desired.update(dict.fromkeys(unblock, False))
+
+        try:
+            changed = self.hosts.update(
+                block=[site for site, on in desired.items() if on],
+                unblock=[site for site, on in desired.items() if not on],
+            )
+            error = None
+        except Exception as e:
+            changed, error = False, e
+
+        self.batches_applied += 1
+        if changed and self.dns is not None:
+            self.dns.request()
+
+        for _, _, _, callback in jobs:
+            if callback is not None:
+                self.results.put((callback, changed, error))
+
+    def _take_hosts_jobs(self, first):
+        """Return `first` plus the hosts edits queued right behind it"""
+        jobs = [first]
+        while True:
+            try:
+                job = self._next_job(block=False)
+            except queue.Empty:
+                return jobs
+            if job[0] != "hosts":
+                # Runs next, after this batch
+                self._held = job
+                return jobs
+            jobs.append(job)
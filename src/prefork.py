@@ -0,0 +1,264 @@
+"""
+Pre-fork Block Page Workers
+Several server processes share the HTTP/HTTPS ports via SO_REUSEPORT
+
+One Python process serves block pages on one core at a time because of
+the GIL. The supervisor starts N worker processes that each run a
+ProxyServer bound with SO_REUSEPORT, so the kernel spreads new connections
+across them. Workers that die are restarted, and stats() sums every
+worker's counters. TLS session tickets are per process, so a resumed
+handshake only succeeds when the kernel picks the same worker again.
+With an access log, each worker writes its own file (access.0.log, ...).
+
+Needs Linux's SO_REUSEPORT load balancing; AVAILABLE is False elsewhere.
+"""
+
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+AVAILABLE = hasattr(socket, "SO_REUSEPORT") and sys.platform.startswith("linux")
+
+MONITOR_INTERVAL = 0.5
+START_TIMEOUT = 10.0
+STATS_TIMEOUT = 2.0
+STOP_TIMEOUT = 5.0
+
+# Workers drain for less than STOP_TIMEOUT, so they exit before being terminated
+DRAIN_TIMEOUT = STOP_TIMEOUT - 1.0
+
+# A worker that dies sooner than this after starting is restarted no faster
+RESTART_DELAY = 1.0
+
+
+def reserve_port(host, port):
+    """Bind (without listening) a SO_REUSEPORT socket that holds `port`
+
+    Workers join it on the same port; a bound socket that never listens
+    is not handed any connections. Port 0 picks a free port.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def sum_stats(total, stats):
+    """Add the numbers in (nested) `stats` into `total`"""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            sum_stats(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def worker_log_path(path, index):
+    """Return worker `index`'s own access log path: access.log -> access.0.log"""
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.{index}{path.suffix}"))
+
+
+def _worker_main(conn, block_page_path, cert_file, ca_dir, options):
+    """Worker process: run a ProxyServer and answer the supervisor's pipe"""
+    from proxy_server import ProxyServer
+
+    proxy = ProxyServer(block_page_path, reuse_port=True, **options)
+    try:
+        proxy.start(cert_file, ca_dir).result(START_TIMEOUT)
+    except Exception as e:
+        # Exiting without "ready" lets the monitor restart us
+        print(f"Block page worker failed to start: {e}")
+        proxy.stop(0)
+        return
+    try:
+        conn.send("ready")
+        while True:
+            command = conn.recv()
+            if command == "stop":
+                break
+            if command[0] == "stats":
+                # Echo the request id, so a reply sent too late isn't misread
+                conn.send((command[1], proxy.stats()))
+    except (EOFError, OSError):
+        # The supervisor is gone; don't outlive it
+        pass
+    finally:
+        proxy.stop(DRAIN_TIMEOUT)
+
+
+class _Worker:
+    """One worker process and the supervisor's end of its pipe"""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def stats(self, timeout):
+        """Ask the worker for its ProxyServer stats; None if no reply within `timeout`"""
+        with self.lock:
+            self.requests += 1
+            self.conn.send(("stats", self.requests))
+            deadline = time.monotonic() + timeout
+            while self.conn.poll(max(0.0, deadline - time.monotonic())):
+                request_id, stats = self.conn.recv()
+                # Skip replies to earlier requests that gave up waiting
+                if request_id == self.requests:
+                    return stats
+        return None
+
+
+class PreforkSupervisor:
+    """Runs `workers` block page processes and keeps them alive
+
+    Extra keyword options (mode, host, http_port, https_port, backlog, ...)
+    are passed to each worker's ProxyServer; mode defaults to "pool".
+    """
+
+    def __init__(self, block_page_path=None, workers=None, cert_file=None, ca_dir=None, **options):
+        if not AVAILABLE:
+            raise RuntimeError("Pre-fork workers need SO_REUSEPORT load balancing (Linux)")
+        self.block_page_path = block_page_path
+        self.worker_count = workers or os.cpu_count() or 1
+        self.cert_file = cert_file
+        self.ca_dir = None if ca_dir is None else str(ca_dir)
+        self.options = dict(options)
+        self.options.setdefault("mode", "pool")
+        self.host = self.options.setdefault("host", "")
+        self.http_port = self.options.setdefault("http_port", 80)
+        self.https_port = self.options.setdefault("https_port", 443)
+        self.restarts = 0
+        self._workers = []
+        self._reserved = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._monitor = None
+        # Workers start from a fresh interpreter; forking a process that
+        # already runs threads (GUI, I/O worker) can deadlock the child
+        self._mp = multiprocessing.get_context("spawn")
+
+    @property
+    def serves_https(self):
+        """True when workers also serve HTTPS"""
+        return self.ca_dir is not None or (
+            self.cert_file is not None and os.path.exists(self.cert_file)
+        )
+
+    def start(self):
+        """Reserve the ports, start every worker and wait until they listen"""
+        sock = reserve_port(self.host, self.http_port)
+        self._reserved.append(sock)
+        self.http_port = self.options["http_port"] = sock.getsockname()[1]
+        if self.serves_https:
+            sock = reserve_port(self.host, self.https_port)
+            self._reserved.append(sock)
+            self.https_port = self.options["https_port"] = sock.getsockname()[1]
+        if self.ca_dir is not None:
+            # Create the CA once here, not racily in every worker
+            import cert_minting
+
+            if cert_minting.AVAILABLE:
+                cert_minting.load_or_create_ca(self.ca_dir)
+
+        self._workers = [self._spawn(i) for i in range(self.worker_count)]
+        self._stop.clear()
+        self._monitor = threading.Thread(target=self._watch, name="prefork-monitor", daemon=True)
+        self._monitor.start()
+
+    def _spawn(self, index):
+        """Start worker `index` and wait for it to report ready"""
+        conn, child = self._mp.Pipe()
+        options = dict(self.options)
+        if options.get("access_log"):
+            # One file per worker, so rotation never races between processes
+            options["access_log"] = worker_log_path(options["access_log"], index)
+        process = self._mp.Process(
+            target=_worker_main,
+            args=(child, self.block_page_path, self.cert_file, self.ca_dir, options),
+            name=f"block-page-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        try:
+            if conn.poll(START_TIMEOUT):
+                conn.recv()
+        except (EOFError, OSError):
+            # Died during startup; the monitor restarts it
+            pass
+        return _Worker(process, conn)
+
+    def _watch(self):
+        """Restart workers that have exited"""
+        while not self._stop.wait(MONITOR_INTERVAL):
+            for index, worker in enumerate(list(self._workers)):
+                if worker.process.is_alive():
+                    continue
+                if time.monotonic() - worker.started < RESTART_DELAY:
+                    continue
+                if self._stop.is_set():
+                    return
+                exitcode = worker.process.exitcode
+                print(f"Block page worker {index} exited ({exitcode}); restarting")
+                worker.conn.close()
+                replacement = self._spawn(index)
+                with self._lock:
+                    self._workers[index] = replacement
+                    self.restarts += 1
+
+    def pids(self):
+        """Return the process ids of the current workers"""
+        with self._lock:
+            return [worker.process.pid for worker in self._workers]
+
+    def stats(self):
+        """Return every live worker's ProxyServer stats summed together"""
+        with self._lock:
+            workers = list(self._workers)
+            total = {"restarts": self.restarts}
+        alive = 0
+        for worker in workers:
+            try:
+                stats = worker.stats(STATS_TIMEOUT)
+            except (EOFError, OSError):
+                continue
+            if stats is not None:
+                sum_stats(total, stats)
+                alive += 1
+        total["workers"] = alive
+        return total
+
+    def stop(self):
+        """Stop the monitor and every worker, then release the ports"""
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+        for worker in self._workers:
+            with worker.lock:
+                try:
+                    worker.conn.send("stop")
+                except OSError:
+                    pass
+        for worker in self._workers:
+            worker.process.join(STOP_TIMEOUT)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.conn.close()
+        self._workers = []
+        for sock in self._reserved:
+            sock.close()
+        self._reserved = []
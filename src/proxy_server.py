@@ -3,54 +3,65 @@ Simple HTTP Server for Website Blocking
 Serves block page on localhost - no SSL certificates needed
 """
 
+import concurrent.futures
 import http.server
+import queue
+import select
+import socket
 import socketserver
+import subprocess
 import threading
 import os
-import ssl
+import time
 
+from access_log import AccessLog
+from async_block_server import (
+    HANDSHAKE_TIMEOUT,
+    IDLE_TIMEOUT,
+    LISTEN_BACKLOG,
+    MAX_BODY,
+    MAX_CONNECTIONS,
+    MAX_REQUESTS_PER_CONNECTION,
+    AsyncBlockServer,
+)
+from block_metrics import STATS_PATH, MetricsRegistry, is_loopback, stats_response
+from block_page import BlockPage
+from block_response import send_file_response
+from cert_minting import AVAILABLE as MINTING_AVAILABLE, CertificateMinter
+from domain_store import DomainStore
+from file_watcher import FileWatcher
+from tls_context import new_server_context
 
-class BlockPageHandler(http.server.SimpleHTTPRequestHandler):
-    """Serves the custom block page for any request"""
+SERVER_MODES = ("thread", "pool", "async")
 
-    block_page_content = None
+# Pool mode: connections served at once, and accepted ones allowed to wait
+MAX_IN_FLIGHT = 64
+QUEUE_DEPTH = 256
 
-    def do_GET(self):
-        """Handle GET requests - serve block page"""
-        self.serve_block_page()
+# stop() waits this long for open connections before cutting them off
+DRAIN_TIMEOUT = 10.0
 
-    def do_POST(self):
-        """Handle POST requests - serve block page"""
-        self.serve_block_page()
+# restart() waits this long for the new process to start serving
+START_TIMEOUT = 10.0
 
-    def do_HEAD(self):
-        """Handle HEAD requests"""
-        self.send_response(200)
-        self.send_header("Content-type", "text/html")
-        self.end_headers()
+# Socket handoff: listening descriptors passed to a new process, and a pipe
+# it writes "ready" to once it serves on them (see ProxyServer.restart)
+LISTEN_FDS_ENV = "BLOCKER_LISTEN_FDS"
+READY_FD_ENV = "BLOCKER_READY_FD"
 
-    def serve_block_page(self):
-        """Serve the custom block page"""
-        try:
-            content = (
-                self.block_page_content
-                if self.block_page_content
-                else self.get_fallback_page()
-            )
+# Handoff passes descriptors to the child (pass_fds) and waits on a pipe
+HANDOFF_AVAILABLE = os.name == "posix"
 
-            self.send_response(200)
-            self.send_header("Content-type", "text/html; charset=utf-8")
-            self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
-            self.send_header("Pragma", "no-cache")
-            self.send_header("Expires", "0")
-            self.end_headers()
-            self.wfile.write(content.encode("utf-8"))
-        except Exception as e:
-            print(f"Error serving block page: {e}")
+# Sent (without reading the request) when the pool and its queue are full
+SERVICE_UNAVAILABLE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Length: 0\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+)
 
-    def get_fallback_page(self):
-        """Fallback block page if file not found"""
-        return """<!DOCTYPE html>
+FALLBACK_PAGE = """<!DOCTYPE html>
 <html>
 <head>
     <title>Site Blocked</title>
@@ -91,22 +102,600 @@ class BlockPageHandler(http.server.SimpleHTTPRequestHandler):
 </body>
 </html>"""
 
+
+class BlockPageHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves the custom block page for any request"""
+
+    # Persistent connections; the server's settings override these per
+    # connection in setup()
+    protocol_version = "HTTP/1.1"
+    timeout = IDLE_TIMEOUT
+    max_requests = MAX_REQUESTS_PER_CONNECTION
+    requests_handled = 0
+
+    block_page_content = None
+    block_response = None
+    block_until = None
+
+    # Set per connection from the server; `started` per request
+    metrics = None
+    access_log = None
+    idle = False
+    port = None
+    started = 0.0
+
+    def setup(self):
+        """Apply the server's keep-alive settings to this connection"""
+        self.max_requests = getattr(self.server, "max_requests", self.max_requests)
+        self.metrics = getattr(self.server, "metrics", None)
+        self.access_log = getattr(self.server, "access_log", None)
+        self.set_idle = getattr(self.server, "set_idle", None)
+        # The server counts a connection idle until its first request line
+        self.idle = self.set_idle is not None
+        # The local port the client connected to
+        self.port = self.request.getsockname()[1]
+        self.requests_handled = 0
+        super().setup()
+        # `timeout` is a class-level default; the server's value is per connection
+        self.connection.settimeout(getattr(self.server, "idle_timeout", self.timeout))
+
+    def handle_one_request(self):
+        """Answer one request, then report the connection idle if it stays open"""
+        super().handle_one_request()
+        if not self.close_connection and self.set_idle is not None:
+            # Until the next request line, a draining server may close it
+            self.idle = True
+            self.set_idle(self.connection, True)
+
+    def parse_request(self):
+        """Note when the request line arrived, then parse the headers"""
+        self.started = time.perf_counter()
+        if self.idle and self.set_idle is not None:
+            self.idle = False
+            self.set_idle(self.connection, False)
+        return super().parse_request()
+
+    def do_GET(self):
+        """Handle GET requests - serve block page"""
+        if self.path.startswith(STATS_PATH) and self.serve_stats():
+            return
+        self.serve_block_page()
+
+    def serve_stats(self):
+        """Answer a loopback client's stats request; False if not one"""
+        if self.metrics is None or not is_loopback(self.client_address):
+            return False
+        response = stats_response(self.metrics, self.path)
+        if response is None:
+            return False
+        self.close_connection = True
+        self.wfile.write(response)
+        return True
+
+    def do_POST(self):
+        """Handle POST requests - serve block page"""
+        self.discard_body()
+        self.serve_block_page()
+
+    def discard_body(self):
+        """Read and drop the request body so the connection can be reused"""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if "Transfer-Encoding" in self.headers or not 0 <= length <= MAX_BODY:
+            self.close_connection = True
+        elif length:
+            self.rfile.read(length)
+
+    def do_HEAD(self):
+        """Handle HEAD requests"""
+        self.serve_block_page()
+
+    def serve_block_page(self):
+        """Serve the pre-built block page response in a single write
+
+        Large file-backed bodies follow the head with sendfile() instead.
+        """
+        try:
+            self.requests_handled += 1
+            if (
+                self.requests_handled >= self.max_requests
+                or self.request_version != "HTTP/1.1"
+                or getattr(self.server, "draining", False)
+            ):
+                self.close_connection = True
+            data, body = self.get_block_response().resolve(
+                self.command, self.headers, close=self.close_connection
+            )
+            if body is None:
+                self.wfile.write(data)
+            else:
+                send_file_response(self.connection, data, body)
+            if self.metrics is not None:
+                self.metrics.record(
+                    self.headers.get("Host"),
+                    self.command,
+                    self.port,
+                    time.perf_counter() - self.started,
+                )
+            if self.access_log is not None:
+                self.access_log.log(
+                    self.client_address[0],
+                    self.requestline,
+                    int(data[9:12]),
+                    len(data) + (len(body.view) if body is not None else 0),
+                    self.headers.get("Host"),
+                )
+        except Exception as e:
+            print(f"Error serving block page: {e}")
+
+    @classmethod
+    def get_block_response(cls):
+        """Return the BlockPage for the current page, compiled once per page"""
+        content = cls.block_page_content or FALLBACK_PAGE
+        response = cls.block_response
+        if response is None or response.content is not content:
+            response = BlockPage(content)
+            response.set_block_state(cls.block_until)
+            cls.block_response = response
+        return response
+
+    def get_fallback_page(self):
+        """Fallback block page if file not found"""
+        return FALLBACK_PAGE
+
     def log_message(self, format, *args):
         """Suppress log messages"""
         pass
 
 
+class DeferredTLSMixIn(socketserver.TCPServer):
+    """Runs the TLS handshake on the connection's worker thread
+
+    Wrapping the listening socket would handshake inside accept(), so one
+    slow or stalled client would hold up every other HTTPS connection. With
+    `ssl_context` set, accepted sockets are wrapped with the handshake
+    deferred, then handshaken under `handshake_timeout` by whichever thread
+    serves the connection.
+    """
+
+    ssl_context = None
+    handshake_timeout = HANDSHAKE_TIMEOUT
+
+    def __init__(self, *args, **kwargs):
+        self.handshakes = 0
+        self.resumed_handshakes = 0
+        self.handshake_failures = 0
+        self._tls_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def finish_request(self, request, client_address):
+        """Handshake (if TLS) and then run the handler"""
+        if self.ssl_context is None:
+            super().finish_request(request, client_address)
+            return
+
+        tls = self.ssl_context.wrap_socket(
+            request, server_side=True, do_handshake_on_connect=False
+        )
+        self.replace_request(request, tls)
+        try:
+            tls.settimeout(self.handshake_timeout)
+            tls.do_handshake()
+        except (OSError, ValueError):
+            # Includes ssl.SSLError and handshake timeouts
+            with self._tls_lock:
+                self.handshake_failures += 1
+            self.shutdown_request(tls)
+            return
+        with self._tls_lock:
+            self.handshakes += 1
+            if tls.session_reused:
+                self.resumed_handshakes += 1
+        try:
+            super().finish_request(tls, client_address)
+        finally:
+            # The plain socket was detached into `tls`, so close it here
+            self.shutdown_request(tls)
+
+    def replace_request(self, request, wrapped):
+        """Hook for servers that track connections (see DrainMixIn)"""
+
+    def tls_stats(self):
+        """Return full, resumed and failed handshake counts"""
+        with self._tls_lock:
+            return {
+                "handshakes": self.handshakes,
+                "full_handshakes": self.handshakes - self.resumed_handshakes,
+                "resumed_handshakes": self.resumed_handshakes,
+                "handshake_failures": self.handshake_failures,
+            }
+
+
+class ReusePortMixIn(socketserver.TCPServer):
+    """Binds with SO_REUSEPORT when `reuse_port` is set
+
+    Several processes can then listen on the same port and the kernel
+    spreads incoming connections between them (see prefork).
+    """
+
+    reuse_port = False
+
+    def server_bind(self):
+        """Set SO_REUSEPORT before binding if requested"""
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+class ListenSocketMixIn(socketserver.TCPServer):
+    """Serves on an already listening `listen_socket` instead of binding
+
+    This is how a new process takes over the sockets of the one it
+    replaces (see ProxyServer.handoff). The listening socket is made
+    non-blocking, since a process sharing it may accept a connection
+    between select() and accept().
+    """
+
+    listen_socket = None
+
+    def server_bind(self):
+        """Swap in the inherited socket, or bind as usual"""
+        if self.listen_socket is None:
+            super().server_bind()
+            return
+        self.socket.close()
+        self.socket = self.listen_socket
+        self.server_address = self.socket.getsockname()
+
+    def server_activate(self):
+        """Listen, without blocking in accept()"""
+        super().server_activate()
+        self.socket.setblocking(False)
+
+
+def _shutdown(sock, how):
+    """shutdown(2) a connection, ignoring one that is already gone"""
+    try:
+        # The plain socket method, so a TLS socket keeps its SSL state
+        socket.socket.shutdown(sock, how)
+    except OSError:
+        pass
+
+
+class DrainMixIn(socketserver.TCPServer):
+    """Lets a server stop accepting and then finish its open connections
+
+    Connections are tracked from accept() to close; TLS swaps in the
+    wrapped socket through replace_request(). Handlers report when a
+    connection sits idle before its first request or between keep-alive
+    requests; drain() shuts the read side of those, so their handler sees
+    EOF at once, while connections mid-request are answered with
+    "Connection: close".
+    """
+
+    draining = False
+
+    def __init__(self, *args, **kwargs):
+        # Open connections: socket -> True while idle between requests
+        self._connections = {}
+        self._drain_cond = threading.Condition()
+        super().__init__(*args, **kwargs)
+
+    def get_request(self):
+        """Accept a connection and track it as idle until its first request"""
+        request, client_address = super().get_request()
+        with self._drain_cond:
+            self._connections[request] = True
+        return request, client_address
+
+    def replace_request(self, request, wrapped):
+        """Track `wrapped` in place of the socket it was made from"""
+        with self._drain_cond:
+            if request in self._connections:
+                self._connections[wrapped] = self._connections.pop(request)
+
+    def shutdown_request(self, request):
+        """Stop tracking the connection, then close it"""
+        with self._drain_cond:
+            if self._connections.pop(request, None) is not None and not self._connections:
+                self._drain_cond.notify_all()
+        super().shutdown_request(request)
+
+    def set_idle(self, request, idle):
+        """Note whether a connection is waiting for its next request"""
+        with self._drain_cond:
+            if request not in self._connections:
+                return
+            self._connections[request] = idle
+            if idle and self.draining:
+                _shutdown(request, socket.SHUT_RD)
+
+    def stop_accepting(self):
+        """Stop serve_forever() and close the listening socket; open connections carry on
+
+        Replies from now on carry "Connection: close".
+        """
+        self.draining = True
+        self.shutdown()
+        self.socket.close()
+
+    def drain(self, timeout=None):
+        """Wait for open connections to finish; False if `timeout` ran out first
+
+        Connections still open at the deadline are shut down both ways.
+        """
+        with self._drain_cond:
+            self.draining = True
+            for request, idle in self._connections.items():
+                if idle:
+                    # Queued bytes are still read first, then EOF
+                    _shutdown(request, socket.SHUT_RD)
+            if self._drain_cond.wait_for(lambda: not self._connections, timeout):
+                return True
+            for request in self._connections:
+                _shutdown(request, socket.SHUT_RDWR)
+            return False
+
+
+class ThreadedTCPServer(
+    ReusePortMixIn,
+    ListenSocketMixIn,
+    DrainMixIn,
+    DeferredTLSMixIn,
+    socketserver.ThreadingMixIn,
+    socketserver.TCPServer,
+):
+    """Thread-per-connection server with a deeper listen backlog"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address,
+        handler_class,
+        backlog=LISTEN_BACKLOG,
+        idle_timeout=IDLE_TIMEOUT,
+        max_requests=MAX_REQUESTS_PER_CONNECTION,
+        reuse_port=False,
+        listen_socket=None,
+    ):
+        # Read by server_activate() when listen() is called
+        self.request_queue_size = backlog
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.reuse_port = reuse_port
+        self.listen_socket = listen_socket
+        super().__init__(server_address, handler_class)
+
+    def stats(self):
+        """Return TLS handshake counts"""
+        return self.tls_stats()
+
+
+class PooledTCPServer(
+    ReusePortMixIn, ListenSocketMixIn, DrainMixIn, DeferredTLSMixIn, socketserver.TCPServer
+):
+    """Serves connections on a fixed pool of threads behind a bounded queue
+
+    At most `max_in_flight` connections are served at once and `queue_depth`
+    more may wait; beyond that new connections are shed with a pre-encoded
+    503 (TLS connections are just closed, as they haven't handshaken yet), so
+    a retry storm costs a bounded amount of memory. A keep-alive connection
+    sitting idle holds its worker, so while connections wait for a worker
+    the longest idle ones are closed to free theirs.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        server_address,
+        handler_class,
+        backlog=LISTEN_BACKLOG,
+        idle_timeout=IDLE_TIMEOUT,
+        max_requests=MAX_REQUESTS_PER_CONNECTION,
+        max_in_flight=MAX_IN_FLIGHT,
+        queue_depth=QUEUE_DEPTH,
+        reuse_port=False,
+        listen_socket=None,
+    ):
+        self.request_queue_size = backlog
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.reuse_port = reuse_port
+        self.listen_socket = listen_socket
+        self.max_in_flight = max_in_flight
+        self.queue_depth = queue_depth
+        self.active = 0
+        self.rejected = 0
+        self.served = 0
+        self._queue: queue.Queue = queue.Queue(queue_depth)
+        self._lock = threading.Lock()
+        # Connections idle between keep-alive requests, longest idle first
+        self._kept_alive = {}
+        self._closed = False
+        # server_close() runs if binding fails, before there are workers
+        self._workers = []
+        super().__init__(server_address, handler_class)
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"block-page-{i}", daemon=True)
+            for i in range(max_in_flight)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        """Queue an accepted connection for the pool, or shed it"""
+        try:
+            self._queue.put_nowait((request, client_address))
+        except queue.Full:
+            self.reject(request)
+            return
+        self.reclaim_idle()
+
+    def set_idle(self, request, idle):
+        """Note whether a connection is waiting for its next request"""
+        super().set_idle(request, idle)
+        with self._lock:
+            if idle:
+                self._kept_alive[request] = True
+            else:
+                self._kept_alive.pop(request, None)
+        if idle:
+            self.reclaim_idle()
+
+    def reclaim_idle(self):
+        """Close idle keep-alive connections to free workers for queued ones"""
+        with self._lock:
+            waiting = self._queue.qsize() - (self.max_in_flight - self.active)
+            while waiting > 0 and self._kept_alive:
+                request = next(iter(self._kept_alive))
+                del self._kept_alive[request]
+                # Its handler sees EOF and closes, as when draining
+                _shutdown(request, socket.SHUT_RD)
+                waiting -= 1
+
+    def shutdown_request(self, request):
+        """Forget an idle connection before closing it"""
+        with self._lock:
+            self._kept_alive.pop(request, None)
+        super().shutdown_request(request)
+
+    def reject(self, request):
+        """Answer 503 and close without reading the request"""
+        with self._lock:
+            self.rejected += 1
+        if self.ssl_context is None:
+            try:
+                request.setblocking(False)
+                request.send(SERVICE_UNAVAILABLE)
+            except OSError:
+                pass
+        self.shutdown_request(request)
+
+    def _work(self):
+        """Worker thread: serve queued connections until a None sentinel"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            request, client_address = item
+            with self._lock:
+                self.active += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._lock:
+                    self.active -= 1
+                    self.served += 1
+
+    def stats(self):
+        """Return queued, active, rejected and served connection counts"""
+        with self._lock:
+            stats = {
+                "queued": self._queue.qsize(),
+                "active": self.active,
+                "rejected": self.rejected,
+                "served": self.served,
+            }
+        if self.ssl_context is not None:
+            stats.update(self.tls_stats())
+        return stats
+
+    def server_close(self):
+        """Close the socket, drop queued connections and stop the workers"""
+        super().server_close()
+        if self._closed:
+            return
+        self._closed = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.shutdown_request(item[0])
+        for _ in self._workers:
+            self._queue.put(None)
+
+
 class ProxyServer:
-    """Manages HTTP server for serving block pages"""
+    """Manages HTTP server for serving block pages
+
+    mode="thread" serves each connection on its own thread; mode="pool" on a
+    bounded pool that sheds load with 503s; mode="async" serves them all
+    from one asyncio event loop (see async_block_server). With `access_log`
+    set to a path, block page hits are logged there (see access_log). With
+    `watch`, edits to the block page file are picked up while serving.
+    Minted HTTPS certificates are limited to the `blocked_sites` patterns.
 
-    def __init__(self, block_page_path=None):
+    start() returns a future that resolves once the sockets listen; stop()
+    drains open connections before closing. restart() hands the listening
+    sockets to a new process first, so no connection is refused.
+    """
+
+    def __init__(
+        self,
+        block_page_path=None,
+        mode="thread",
+        host="",
+        http_port=80,
+        https_port=443,
+        backlog=LISTEN_BACKLOG,
+        max_connections=MAX_CONNECTIONS,
+        idle_timeout=IDLE_TIMEOUT,
+        max_requests=MAX_REQUESTS_PER_CONNECTION,
+        max_in_flight=MAX_IN_FLIGHT,
+        queue_depth=QUEUE_DEPTH,
+        reuse_port=False,
+        access_log=None,
+        watch=False,
+        blocked_sites=None,
+    ):
+        if mode not in SERVER_MODES:
+            raise ValueError(f"Unknown server mode: {mode}")
+        self.mode = mode
+        self.host = host
+        self.http_port = http_port
+        self.https_port = https_port
+        self.backlog = backlog
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.max_in_flight = max_in_flight
+        self.queue_depth = queue_depth
+        self.reuse_port = reuse_port
         self.http_server = None
         self.https_server = None
         self.http_thread = None
         self.https_thread = None
+        self.minter = None
+        self.tls_context = None
+        self.metrics = MetricsRegistry()
+        self.access_log = None
+        self.access_log_path = access_log
+        self.watch = watch
+        self.blocked_sites = blocked_sites
+        self.page_watcher = None
         self.running = False
+        self.ready: concurrent.futures.Future = concurrent.futures.Future()
+        self._ready_lock = threading.Lock()
+        self._listening = {}
+        self._expected: tuple = ()
+        # Set in a process started by restart()
+        self.inherited = take_inherited_sockets()
+        ready_fd = os.environ.pop(READY_FD_ENV, None)
+        self.ready_fd = None if ready_fd is None else int(ready_fd)
 
         # Load block page content
+        self.block_page_path = block_page_path
         BlockPageHandler.block_page_content = self.load_block_page(block_page_path)
 
     def load_block_page(self, block_page_path):
@@ -119,78 +708,305 @@ class ProxyServer:
                 pass
         return None
 
+    def make_server(self, port, ssl_context=None):
+        """Create the server for `port` in the configured mode"""
+        if self.access_log_path and self.access_log is None:
+            self.access_log = AccessLog(self.access_log_path)
+        listen_socket = self.inherited.pop(port, None)
+        if self.mode == "async":
+            return AsyncBlockServer(
+                BlockPageHandler.get_block_response(),
+                host=self.host,
+                port=port,
+                ssl_context=ssl_context,
+                backlog=self.backlog,
+                max_connections=self.max_connections,
+                idle_timeout=self.idle_timeout,
+                max_requests=self.max_requests,
+                reuse_port=self.reuse_port,
+                metrics=self.metrics,
+                access_log=self.access_log,
+                sock=listen_socket,
+            )
+
+        if self.mode == "pool":
+            return self.attach(
+                PooledTCPServer(
+                    (self.host, port),
+                    BlockPageHandler,
+                    self.backlog,
+                    self.idle_timeout,
+                    self.max_requests,
+                    self.max_in_flight,
+                    self.queue_depth,
+                    self.reuse_port,
+                    listen_socket,
+                ),
+                ssl_context,
+            )
+        return self.attach(
+            ThreadedTCPServer(
+                (self.host, port),
+                BlockPageHandler,
+                self.backlog,
+                self.idle_timeout,
+                self.max_requests,
+                self.reuse_port,
+                listen_socket,
+            ),
+            ssl_context,
+        )
+
+    def attach(self, server, ssl_context):
+        """Give a threaded server the TLS context, metrics and access log; returns it"""
+        server.ssl_context = ssl_context
+        server.metrics = self.metrics
+        server.access_log = self.access_log
+        return server
+
     def start_http_server(self):
-        """Start HTTP server on port 80"""
+        """Start HTTP server on the HTTP port"""
         try:
-            # Use ThreadingTCPServer for better handling
-            class ThreadedTCPServer(
-                socketserver.ThreadingMixIn, socketserver.TCPServer
-            ):
-                allow_reuse_address = True
-                daemon_threads = True
-
-            self.http_server = ThreadedTCPServer(("", 80), BlockPageHandler)
-            print("✓ Block page server started on port 80")
+            self.http_server = self.make_server(self.http_port)
+            self.set_listening("http", self.http_server)
+            print(f"✓ Block page server started on port {self.http_port}")
             self.http_server.serve_forever()
         except Exception as e:
             print(f"Server error: {e}")
+            self.set_listening("http", error=e)
 
-    def start_https_server(self, cert_file):
-        """Start HTTPS server on port 443"""
-        try:
-
-            class ThreadedTCPServer(
-                socketserver.ThreadingMixIn, socketserver.TCPServer
-            ):
-                allow_reuse_address = True
-                daemon_threads = True
-
-            self.https_server = ThreadedTCPServer(("", 443), BlockPageHandler)
-
-            # Wrap with SSL
-            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-            context.load_cert_chain(cert_file)
-            context.check_hostname = False
-            context.verify_mode = ssl.CERT_NONE
+    def make_tls_context(self, cert_file=None, ca_dir=None):
+        """Return the HTTPS context: per-host minted certs, or one static cert
 
-            self.https_server.socket = context.wrap_socket(
-                self.https_server.socket, server_side=True
-            )
+        Built once and reused by later servers, so session tickets and
+        cached sessions from before a restart still resume.
+        """
+        if self.tls_context is not None:
+            return self.tls_context
+        if ca_dir is not None:
+            blocked = None if self.blocked_sites is None else DomainStore(self.blocked_sites)
+            self.minter = CertificateMinter(ca_dir, blocked=blocked)
+            self.tls_context = self.minter.server_context()
+        else:
+            self.tls_context = new_server_context(cert_file)
+        return self.tls_context
 
-            print("✓ HTTPS server started on port 443")
+    def start_https_server(self, cert_file=None, ca_dir=None):
+        """Start HTTPS server on the HTTPS port"""
+        try:
+            context = self.make_tls_context(cert_file, ca_dir)
+            self.https_server = self.make_server(self.https_port, context)
+            self.set_listening("https", self.https_server)
+            print(f"✓ HTTPS server started on port {self.https_port}")
             self.https_server.serve_forever()
         except Exception as e:
             print(f"HTTPS server error: {e}")
+            self.set_listening("https", error=e)
+
+    def start(self, cert_file=None, ca_dir=None):
+        """Start HTTP and HTTPS servers
 
-    def start(self, cert_file=None):
-        """Start HTTP and HTTPS servers"""
+        With `ca_dir`, HTTPS certificates are minted per hostname from the
+        local CA kept there (needs the `cryptography` package); otherwise
+        `cert_file` is served to every host.
+
+        Returns `ready`, a Future that resolves to {"http": address, ...}
+        once every server is listening, or fails with the bind error.
+        """
         if self.running:
-            return
+            return self.ready
 
         self.running = True
 
+        if ca_dir is not None and not MINTING_AVAILABLE:
+            print("Certificate minting needs the 'cryptography' package; HTTPS uses cert_file")
+            ca_dir = None
+
+        serves_https = ca_dir is not None or (cert_file and os.path.exists(cert_file))
+        self.ready = concurrent.futures.Future()
+        self._listening = {}
+        self._expected = ("http", "https") if serves_https else ("http",)
+        if self.ready_fd is not None:
+            fd, self.ready_fd = self.ready_fd, None
+            self.ready.add_done_callback(lambda ready: self.notify_ready_fd(fd, ready))
+
         # Start HTTP server in background
         self.http_thread = threading.Thread(target=self.start_http_server, daemon=True)
         self.http_thread.start()
 
-        # Start HTTPS server if certificate exists
-        if cert_file and os.path.exists(cert_file):
+        # Start HTTPS server if a CA or certificate is available
+        if serves_https:
             self.https_thread = threading.Thread(
-                target=lambda: self.start_https_server(cert_file), daemon=True
+                target=lambda: self.start_https_server(cert_file, ca_dir), daemon=True
             )
             self.https_thread.start()
 
-    def stop(self):
-        """Stop the server"""
+        if self.watch and self.block_page_path and self.page_watcher is None:
+            self.page_watcher = FileWatcher(self.block_page_path, self.reload_block_page)
+        return self.ready
+
+    def set_listening(self, name, server=None, error=None):
+        """Record that server `name` listens (or failed to); resolves `ready`"""
+        with self._ready_lock:
+            if self.ready.done():
+                return
+            if error is not None:
+                self.ready.set_exception(error)
+                return
+            self._listening[name] = tuple(server.server_address[:2])
+            if all(expected in self._listening for expected in self._expected):
+                self.ready.set_result(dict(self._listening))
+
+    def notify_ready_fd(self, fd, ready):
+        """Tell the process that started us (see restart) over `fd` whether we serve"""
+        try:
+            if ready.exception() is None:
+                os.write(fd, b"ready\n")
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def handoff(self):
+        """Return (env, fds) that pass the listening sockets to a new process
+
+        Give them to subprocess.Popen as env and pass_fds: a ProxyServer
+        created in that process serves on these sockets rather than
+        binding its own, so connections queue up instead of being refused.
+        """
+        fds = [
+            server.socket.fileno()
+            for server in (self.http_server, self.https_server)
+            if server is not None
+        ]
+        return {LISTEN_FDS_ENV: ",".join(map(str, fds))}, fds
+
+    def restart(self, args, timeout=START_TIMEOUT, drain_timeout=DRAIN_TIMEOUT, **popen_kwargs):
+        """Replace this server with the process `args` without refusing connections
+
+        The new process inherits the listening sockets (see handoff) and
+        reports back once it serves on them; only then does this server
+        stop accepting and drain. Returns the new subprocess.Popen. If it
+        isn't ready within `timeout`, it is killed, this server keeps
+        serving and RuntimeError is raised. Needs POSIX (HANDOFF_AVAILABLE).
+        """
+        if not HANDOFF_AVAILABLE:
+            raise RuntimeError("Restart by socket handoff needs POSIX descriptor passing")
+        env, fds = self.handoff()
+        read_fd, write_fd = os.pipe()
+        env[READY_FD_ENV] = str(write_fd)
+        env = dict(popen_kwargs.pop("env", None) or os.environ, **env)
+        try:
+            process = subprocess.Popen(args, env=env, pass_fds=fds + [write_fd], **popen_kwargs)
+        finally:
+            os.close(write_fd)
+        try:
+            # EOF instead of "ready" means it failed or exited
+            ready = bool(select.select([read_fd], [], [], timeout)[0])
+            ready = ready and os.read(read_fd, 64) == b"ready\n"
+        finally:
+            os.close(read_fd)
+        if not ready:
+            process.kill()
+            process.wait()
+            raise RuntimeError("New block page server did not start")
+        self.stop(drain_timeout)
+        return process
+
+    def set_block_state(self, until):
+        """Show `until` (a datetime, or None for no end) on the block page"""
+        BlockPageHandler.block_until = until
+        BlockPageHandler.get_block_response().set_block_state(until)
+
+    def reload_block_page(self):
+        """Re-read the block page file and swap in its pre-built responses
+
+        The new page is compiled and compressed on the calling thread, then
+        installed with plain attribute assignments; requests already being
+        served finish with the page they started with. Returns True if the
+        page changed.
+        """
+        content = self.load_block_page(self.block_page_path)
+        if content is None or content == BlockPageHandler.block_page_content:
+            return False
+        page = BlockPage(content)
+        page.set_block_state(BlockPageHandler.block_until)
+        # Content first: a request between the two stores rebuilds the new
+        # page itself rather than reinstalling the old one
+        BlockPageHandler.block_page_content = content
+        BlockPageHandler.block_response = page
+        for server in (self.http_server, self.https_server):
+            if isinstance(server, AsyncBlockServer):
+                server.block_response = page
+        return True
+
+    def stats(self):
+        """Return connection counters of the running servers that keep them"""
+        stats = {
+            name: server.stats()
+            for name, server in (("http", self.http_server), ("https", self.https_server))
+            if server is not None and hasattr(server, "stats")
+        }
+        if self.minter is not None:
+            stats["certificates"] = self.minter.stats()
+        stats["block_page"] = BlockPageHandler.get_block_response().stats()
+        if self.access_log is not None:
+            stats["access_log"] = self.access_log.stats()
+        return stats
+
+    def stop(self, drain_timeout=DRAIN_TIMEOUT):
+        """Stop the server
+
+        Listening stops first; requests in flight are then answered (with
+        "Connection: close") and idle keep-alive connections closed, for up
+        to `drain_timeout` seconds before the rest are cut off. Returns True
+        if every connection finished in time.
+        """
         self.running = False
+        servers = [server for server in (self.http_server, self.https_server) if server]
+
+        for server in servers:
+            server.stop_accepting()
+
+        deadline = time.monotonic() + drain_timeout
+        drained = True
+        for server in servers:
+            drained = server.drain(max(0.0, deadline - time.monotonic())) and drained
+
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+        for sock in self.inherited.values():
+            sock.close()
+        self.inherited = {}
 
-        if self.http_server:
-            self.http_server.shutdown()
-            self.http_server.server_close()
+        if self.minter:
+            self.minter.close()
 
-        if self.https_server:
-            self.https_server.shutdown()
-            self.https_server.server_close()
+        if self.page_watcher:
+            self.page_watcher.close()
+            self.page_watcher = None
+
+        if self.access_log:
+            self.access_log.close()
+            self.access_log = None
+        return drained
+
+
+def take_inherited_sockets():
+    """Return {port: socket} for listening sockets handed over by handoff()"""
+    sockets = {}
+    for fd in os.environ.pop(LISTEN_FDS_ENV, "").split(","):
+        if not fd.strip():
+            continue
+        try:
+            sock = socket.socket(fileno=int(fd))
+            sock.set_inheritable(False)
+            sockets[sock.getsockname()[1]] = sock
+        except (ValueError, OSError) as e:
+            print(f"Ignoring inherited socket {fd}: {e}")
+    return sockets
 
 
 if __name__ == "__main__":
@@ -202,8 +1018,6 @@ if __name__ == "__main__":
     print("Press Ctrl+C to stop.")
 
     try:
-        import time
-
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
@@ -0,0 +1,38 @@
+"""
+TLS Context Settings
+One place to build and tune the block page servers' SSLContexts
+
+Repeat HTTPS visits resume their session instead of paying for a full
+handshake: stateless session tickets are on (TLS 1.2 and 1.3) alongside
+OpenSSL's server-side session cache. Key exchange is ECDHE only, with
+AES-GCM and ChaCha20 ciphers, and TLS 1.0/1.1 are refused.
+"""
+
+import ssl
+
+MINIMUM_VERSION = ssl.TLSVersion.TLSv1_2
+
+# TLS 1.2 suites; TLS 1.3 suites are always ephemeral and configured by OpenSSL
+ECDHE_CIPHERS = "ECDHE+AESGCM:ECDHE+CHACHA20"
+
+# TLS 1.3 tickets sent per full handshake; browsers open several connections
+# per site and each resumption consumes one
+TICKETS_PER_HANDSHAKE = 4
+
+
+def tune_tls_context(context):
+    """Apply the resumption, protocol and cipher settings to a server context"""
+    context.minimum_version = MINIMUM_VERSION
+    context.set_ciphers(ECDHE_CIPHERS)
+    context.options &= ~ssl.OP_NO_TICKET
+    context.options |= ssl.OP_NO_COMPRESSION | ssl.OP_CIPHER_SERVER_PREFERENCE
+    context.num_tickets = TICKETS_PER_HANDSHAKE
+    return context
+
+
+def new_server_context(cert_file=None):
+    """Create a tuned server context, loading `cert_file` if given"""
+    context = tune_tls_context(ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER))
+    if cert_file is not None:
+        context.load_cert_chain(cert_file)
+    return context
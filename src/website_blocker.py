@@ -1,12 +1,10 @@
 import tkinter as tk
 from tkinter import messagebox
-import json
-import os
-import platform
-import ctypes
-from datetime import datetime, timedelta
 from pathlib import Path
 from proxy_server import ProxyServer
+from blocker_engine import BlockerEngine, is_admin, normalize_website
+from file_watcher import FileWatcher, stat_key
+from io_worker import IOWorker
 
 
 class WebsiteBlocker:
@@ -21,23 +19,25 @@ class WebsiteBlocker:
         self.config_dir = self.base_dir / "config"
         self.assets_dir = self.base_dir / "assets"
 
-        # Configuration
+        # Blocking engine (config, hosts file, DNS flushing, timer)
         self.config_file = self.config_dir / "blocked_sites.json"
-        self.blocked_websites = self.load_blocked_sites()
+        self.engine = BlockerEngine(self.config_file)
+        self.hosts_path = self.engine.hosts_path
+        self.redirect_ip = self.engine.redirect_ip
+        self.hosts = self.engine.hosts
+        self.dns = self.engine.dns
 
-        # Hosts file path
-        if platform.system() == "Windows":
-            self.hosts_path = r"C:\Windows\System32\drivers\etc\hosts"
-        else:
-            self.hosts_path = "/etc/hosts"
+        self.worker = IOWorker(self.hosts, self.dns)
+        self.worker.attach(self.root)
+        self.site_status = {}
+        self._save_generation = 0
 
-        # Blocking configuration
-        self.redirect_ip = "127.0.0.1"
-        self.timer_id = None
+        # Pick up list edits made outside the GUI (cli.py, a text editor)
+        self.config_watcher = FileWatcher(self.config_file, self.on_config_changed)
 
-        # Start HTTP server
+        # Start HTTP server; edits to the block page are served without a restart
         block_page_path = str(self.assets_dir / "block_page.html")
-        self.proxy_server = ProxyServer(block_page_path)
+        self.proxy_server = ProxyServer(block_page_path, mode="async", watch=True)
         self.proxy_server.start()
 
         # Preset sites
@@ -61,15 +61,18 @@ class WebsiteBlocker:
 
         self.setup_ui()
 
+    @property
+    def blocked_websites(self):
+        """The engine's list of blocked sites"""
+        return self.engine.blocked_websites
+
+    @blocked_websites.setter
+    def blocked_websites(self, websites):
+        self.engine.blocked_websites = websites
+
     def is_admin(self):
         """Check if running with admin privileges"""
-        try:
-            if platform.system() == "Windows":
-                return ctypes.windll.shell32.IsUserAnAdmin()
-            else:
-                return os.geteuid() == 0  # type: ignore
-        except Exception:
-            return False
+        return is_admin()
 
     def setup_ui(self):
         """Setup the user interface"""
@@ -233,43 +236,70 @@ class WebsiteBlocker:
 
         self.update_listbox()
 
-    def load_blocked_sites(self):
-        """Load blocked sites from JSON"""
-        try:
-            if self.config_file.exists():
-                with open(self.config_file, "r") as f:
-                    return json.load(f)
-        except Exception:
-            pass
-        return []
-
     def save_blocked_sites(self):
-        """Save blocked sites to JSON"""
+        """Save blocked sites to JSON in the background"""
+        self._save_generation += 1
+        self.worker.submit(
+            self.write_blocked_sites,
+            list(self.blocked_websites),
+            self._save_generation,
+            callback=self.on_saved,
+        )
+
+    def write_blocked_sites(self, websites, generation):
+        """Write a snapshot of the list, skipping it if a newer one is queued"""
+        if generation != self._save_generation:
+            return
+        self.engine.write_blocked_sites(websites)
+
+    def on_config_changed(self):
+        """Watcher thread: parse and index an edited list, then hand it to Tk"""
+        if stat_key(self.config_file) == self.engine.saved_key:
+            # Our own save
+            return
         try:
-            with open(self.config_file, "w") as f:
-                json.dump(self.blocked_websites, f, indent=4)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save: {str(e)}")
+            result = self.engine.read_blocked_sites()
+        except (OSError, ValueError) as e:
+            print(f"Block list not reloaded: {e}")
+            return
+        self.worker.post(self.on_list_reloaded, result)
+
+    def on_list_reloaded(self, result, error):
+        """Swap in the reloaded list and block or unblock what changed"""
+        added, removed = self.engine.swap_blocked_sites(*result)
+        if not added and not removed:
+            return
+        if added:
+            self.block_websites(added)
+        if removed:
+            self.unblock_websites(removed)
+        self.update_listbox()
+        self.status_label.config(
+            text=f"Block list reloaded: {len(added)} added, {len(removed)} removed",
+            fg="#3498db",
+        )
+
+    def on_saved(self, result, error):
+        """Report a failed background save"""
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to save: {str(error)}")
 
     def add_website(self):
         """Add website to block list"""
-        website = self.website_entry.get().strip().lower()
-
-        if not website:
+        raw = self.website_entry.get().strip()
+        if not raw:
             messagebox.showwarning("Input Error", "Please enter a website")
             return
 
-        website = (
-            website.replace("http://", "").replace("https://", "").replace("www.", "")
-        )
-        if "/" in website:
-            website = website.split("/")[0]
+        website = normalize_website(raw)
+        if not website:
+            messagebox.showwarning("Input Error", f"{raw} is not a valid website")
+            return
 
-        if website in self.blocked_websites:
+        if not self.engine.add_websites([website]):
             messagebox.showinfo("Already Exists", f"{website} is already in the list")
             return
 
-        self.blocked_websites.append(website)
         self.save_blocked_sites()
         self.block_single_website(website)
         self.update_listbox()
@@ -295,7 +325,7 @@ class WebsiteBlocker:
 
             if messagebox.askyesno("Confirm", f"Remove {website}?"):
                 self.unblock_single_website(website)
-                self.blocked_websites.pop(index)
+                self.engine.remove_websites([website])
                 self.save_blocked_sites()
                 self.update_listbox()
                 self.status_label.config(text=f"Removed: {website}", fg="#e74c3c")
@@ -332,94 +362,36 @@ class WebsiteBlocker:
 
     def block_single_website(self, website):
         """Block a single website by adding to hosts file"""
-        try:
-            with open(self.hosts_path, "r") as f:
-                hosts_content = f.read()
-
-            variations = [
-                website,
-                f"www.{website}",
-                f"m.{website}",
-                f"mobile.{website}",
-                f"app.{website}",
-                f"api.{website}",
-            ]
-
-            new_entries = []
-            for var in variations:
-                entry = f"{self.redirect_ip} {var}"
-                if entry not in hosts_content:
-                    new_entries.append(entry)
-
-            if new_entries:
-                with open(self.hosts_path, "a") as f:
-                    f.write("\n" + "\n".join(new_entries) + "\n")
-
-            # Aggressive DNS flushing
-            if platform.system() == "Windows":
-                os.system("ipconfig /flushdns > nul 2>&1")
-                os.system("nbtstat -R > nul 2>&1")
-                os.system("nbtstat -RR > nul 2>&1")
-                os.system("arp -d * > nul 2>&1")
-            else:
-                os.system("sudo killall -HUP mDNSResponder > /dev/null 2>&1")
-
-        except PermissionError:
-            messagebox.showerror("Permission Error", "Run as Administrator")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to block: {str(e)}")
+        self.block_websites([website])
 
     def unblock_single_website(self, website):
         """Unblock a single website by removing from hosts file"""
-        try:
-            with open(self.hosts_path, "r") as f:
-                lines = f.readlines()
-
-            variations = [
-                website,
-                f"www.{website}",
-                f"m.{website}",
-                f"mobile.{website}",
-                f"app.{website}",
-                f"api.{website}",
-            ]
-
-            with open(self.hosts_path, "w") as f:
-                for line in lines:
-                    if not any(
-                        var in line and (self.redirect_ip in line or "0.0.0.0" in line)
-                        for var in variations
-                    ):
-                        f.write(line)
-
-            # Flush DNS
-            if platform.system() == "Windows":
-                os.system("ipconfig /flushdns > nul 2>&1")
-                os.system("nbtstat -R > nul 2>&1")
-                os.system("nbtstat -RR > nul 2>&1")
-                os.system("arp -d * > nul 2>&1")
-            else:
-                os.system("sudo killall -HUP mDNSResponder > /dev/null 2>&1")
+        self.unblock_websites([website])
+
+    def block_websites(self, websites):
+        """Queue a block of several websites (one hosts write per batch)"""
+        self.worker.submit_hosts_change(
+            block=websites,
+            callback=lambda result, error: self.on_hosts_applied(error, "block"),
+        )
+
+    def unblock_websites(self, websites):
+        """Queue an unblock of several websites (one hosts write per batch)"""
+        self.worker.submit_hosts_change(
+            unblock=websites,
+            callback=lambda result, error: self.on_hosts_applied(error, "unblock"),
+        )
 
-        except PermissionError:
+    def on_hosts_applied(self, error, action):
+        """Report a failed background hosts edit"""
+        if isinstance(error, PermissionError):
             messagebox.showerror("Permission Error", "Run as Administrator")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to unblock: {str(e)}")
+        elif error is not None:
+            messagebox.showerror("Error", f"Failed to {action}: {str(error)}")
 
     def is_website_blocked(self, website):
-        """Check if website is currently blocked in hosts file"""
-        try:
-            with open(self.hosts_path, "r") as f:
-                content = f.read()
-
-            return (
-                f"{self.redirect_ip} {website}" in content
-                or f"{self.redirect_ip} www.{website}" in content
-                or f"0.0.0.0 {website}" in content
-                or f"0.0.0.0 www.{website}" in content
-            )
-        except Exception:
-            return False
+        """Check if website is shown as blocked (as of the last refresh)"""
+        return self.site_status.get(website, False)
 
     def block_with_timer(self, minutes):
         """Block all sites for specified time"""
@@ -427,27 +399,25 @@ class WebsiteBlocker:
             messagebox.showwarning("No Sites", "Add websites first")
             return
 
-        for website in self.blocked_websites:
-            if not self.is_website_blocked(website):
-                self.block_single_website(website)
-
+        self.block_websites(self.blocked_websites)
         self.update_listbox()
 
-        end_time = datetime.now() + timedelta(minutes=minutes)
+        # The engine's timer fires on its own thread; hop back to Tk
+        end_time = self.engine.start_timer(
+            minutes,
+            on_expire=lambda: self.worker.post(
+                lambda result, error: self.timer_expired()
+            ),
+        )
+        self.proxy_server.set_block_state(end_time)
         self.status_label.config(
             text=f"⏰ Blocked until {end_time.strftime('%H:%M')}", fg="#9b59b6"
         )
 
-        if self.timer_id:
-            self.root.after_cancel(self.timer_id)
-
-        self.timer_id = self.root.after(minutes * 60 * 1000, self.timer_expired)
-
     def timer_expired(self):
         """Handle timer expiration"""
-        for website in self.blocked_websites:
-            self.unblock_single_website(website)
-
+        self.proxy_server.set_block_state(None)
+        self.unblock_websites(self.blocked_websites)
         self.update_listbox()
         self.status_label.config(
             text="⏰ Timer expired - Sites unblocked", fg="#f39c12"
@@ -455,10 +425,20 @@ class WebsiteBlocker:
         messagebox.showinfo("Timer", "Blocking period ended")
 
     def update_listbox(self):
+        """Read block status in the background, then redraw the listbox"""
+        websites = list(self.blocked_websites)
+        self.worker.submit(
+            self.hosts.statuses,
+            websites,
+            callback=lambda result, error: self.render_listbox(websites, result),
+        )
+
+    def render_listbox(self, websites, statuses):
         """Update the listbox display"""
+        self.site_status = statuses or {}
         self.listbox.delete(0, tk.END)
-        for website in self.blocked_websites:
-            status = "🔒" if self.is_website_blocked(website) else "🔓"
+        for website in websites:
+            status = "🔒" if self.site_status.get(website) else "🔓"
             self.listbox.insert(tk.END, f"{status} {website}")
 
 
@@ -0,0 +1,99 @@
+"""
+Access Log Benchmark
+Block page throughput with the access log off and on
+
+Request threads only queue a tuple; formatting and file writes happen in
+batches on the log's own thread. Throughput with logging on should stay
+within a few percent of logging off (best of several alternating runs,
+since single runs vary more than that). Also reports the cost of one
+AccessLog.log() call.
+
+Usage: python tests/benchmarks/bench_access_log.py [requests]
+"""
+
+import http.client
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from access_log import AccessLog
+from proxy_server import ProxyServer
+
+CLIENTS = 4
+
+# Off and on runs alternate; the best of each is reported
+ROUNDS = 3
+
+
+def client(address, count):
+    """Fetch the page `count` times on one keep-alive connection"""
+    conn = http.client.HTTPConnection(*address, timeout=30)
+    for _ in range(count):
+        conn.request("GET", "/", headers={"Host": "blocked.example"})
+        conn.getresponse().read()
+    conn.close()
+
+
+def measure(mode, total, log_path):
+    """Return (requests per second, access log stats or None)"""
+    proxy = ProxyServer(
+        None, mode=mode, host="127.0.0.1", max_requests=total + 1, access_log=log_path
+    )
+    server = proxy.make_server(0)
+    proxy.http_server = server
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    if mode == "async":
+        server.ready.wait(5)
+    threads = [
+        threading.Thread(target=client, args=(server.server_address, total // CLIENTS))
+        for _ in range(CLIENTS)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    log = proxy.access_log
+    proxy.stop()
+    return total // CLIENTS * CLIENTS / elapsed, log.stats() if log else None
+
+
+def main():
+    """Run the benchmark"""
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print("=" * 60)
+    print("ACCESS LOG BENCHMARK")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log = AccessLog(Path(temp_dir) / "calls.log")
+        calls = 200000
+        start = time.perf_counter()
+        for _ in range(calls):
+            log.log("127.0.0.1", "GET / HTTP/1.1", 200, 1234, "blocked.example")
+        per_call = (time.perf_counter() - start) / calls * 1e9
+        log.close()
+        print(f"AccessLog.log(): {per_call:.0f} ns/call  ({log.stats()['dropped']:,} dropped)")
+        print(f"{total:,} requests over {CLIENTS} keep-alive connections")
+
+        for mode in ("pool", "async"):
+            off = on = 0.0
+            for _ in range(ROUNDS):
+                off = max(off, measure(mode, total, None)[0])
+                rate, stats = measure(mode, total, Path(temp_dir) / f"{mode}.log")
+                on = max(on, rate)
+            change = (on - off) / off * 100
+            print(
+                f"  {mode:>5}: off {off:8,.0f} req/s   on {on:8,.0f} req/s   "
+                f"{change:+5.1f}%   ({stats['written']:,} written, {stats['dropped']:,} dropped)"
+            )
+
+
+if __name__ == "__main__":
+    main()
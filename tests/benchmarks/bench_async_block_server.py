@@ -0,0 +1,81 @@
+"""
+Block Page Server Concurrency Benchmark
+Holds N idle connections open against each server mode and reports memory
+
+Usage: python tests/benchmarks/bench_async_block_server.py [connections]
+"""
+
+import resource
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from proxy_server import ProxyServer
+
+
+def rss_kb():
+    """Current resident set size in KiB (Linux), or 0 if unknown"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def run(mode, connections):
+    """Open `connections` idle sockets, then request the page on all of them"""
+    proxy = ProxyServer(None, mode=mode, host="127.0.0.1", http_port=0)
+    proxy.start()
+    while proxy.http_server is None:
+        time.sleep(0.01)
+    if mode == "async":
+        proxy.http_server.ready.wait(5)
+    address = proxy.http_server.server_address
+    time.sleep(0.2)
+
+    before = rss_kb()
+    start = time.perf_counter()
+    sockets = [socket.create_connection(address, timeout=30) for _ in range(connections)]
+    time.sleep(0.5)
+    held = rss_kb()
+    threads = threading.active_count()
+
+    for sock in sockets:
+        sock.sendall(b"GET / HTTP/1.1\r\nHost: blocked.example\r\n\r\n")
+    ok = sum(1 for sock in sockets if sock.recv(16).startswith(b"HTTP/1.1 200"))
+    elapsed = time.perf_counter() - start
+    for sock in sockets:
+        sock.close()
+    proxy.stop()
+    return ok, elapsed, (held - before) * 1024 / connections, threads
+
+
+def main():
+    """Run the benchmark"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    limit = (hard - 200) // 2
+    connections = min(int(sys.argv[1]) if len(sys.argv) > 1 else 10000, limit)
+
+    print("=" * 60)
+    print("BLOCK PAGE SERVER CONCURRENCY BENCHMARK")
+    print("=" * 60)
+    print(f"Concurrent connections: {connections:,}")
+    for mode in ("async", "thread"):
+        ok, elapsed, per_conn, threads = run(mode, connections)
+        print(
+            f"  {mode:>6}: {ok:,} served in {elapsed:5.2f} s  "
+            f"{per_conn / 1024:7.1f} KiB RSS/connection  {threads:,} threads"
+        )
+
+
+if __name__ == "__main__":
+    main()
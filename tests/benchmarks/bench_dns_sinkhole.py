@@ -0,0 +1,106 @@
+"""
+DNS Sinkhole Benchmark
+Measures queries per second and p99 latency against a local stand-in upstream
+
+Usage: python tests/benchmarks/bench_dns_sinkhole.py [queries] [blocklist size]
+"""
+
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from dns_sinkhole import TYPE_A, DNSSinkhole, build_response, parse_question
+from domain_store import DomainStore
+
+CLIENTS = 8
+
+
+class UpstreamHandler(socketserver.BaseRequestHandler):
+    """Answers every query with one A record"""
+
+    def handle(self):
+        data, sock = self.request
+        question_end = parse_question(data)[3]
+        response = build_response(
+            data, question_end, answers=[(TYPE_A, b"\x5d\xb8\xd8\x22")], ttl=300
+        )
+        sock.sendto(response, self.client_address)
+
+
+def make_query(name, qid):
+    """Encode an A query"""
+    labels = b"".join(bytes([len(p)]) + p.encode() for p in name.split("."))
+    header = qid.to_bytes(2, "big") + b"\x01\x00\x00\x01\0\0\0\0\0\0"
+    return header + labels + b"\0\0\1\0\1"
+
+
+def client(address, names, latencies):
+    """Send queries one at a time, recording round-trip latencies"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(2)
+        for qid, name in enumerate(names):
+            start = time.perf_counter()
+            sock.sendto(make_query(name, qid & 0xFFFF), address)
+            sock.recv(65535)
+            latencies.append(time.perf_counter() - start)
+
+
+def main():
+    """Run the benchmark"""
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    listed = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+    upstream = socketserver.ThreadingUDPServer(("127.0.0.1", 0), UpstreamHandler)
+    upstream.daemon_threads = True
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+    store = DomainStore(f"ads{i}.tracker{i % 5000}.com" for i in range(listed))
+    sinkhole = DNSSinkhole(
+        store, upstream=upstream.server_address, listen=("127.0.0.1", 0)
+    )
+    sinkhole.start()
+
+    # Half blocked subdomains, half forwarded names (mostly cache hits)
+    names = [
+        f"cdn.ads{i % listed}.tracker{i % listed % 5000}.com"
+        if i % 2
+        else f"site{i % 500}.org"
+        for i in range(queries)
+    ]
+    per_client = [names[i::CLIENTS] for i in range(CLIENTS)]
+    latencies = []
+    threads = [
+        threading.Thread(target=client, args=(sinkhole.address, chunk, latencies))
+        for chunk in per_client
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = sinkhole.stats.snapshot()
+    sinkhole.stop()
+    upstream.shutdown()
+    latencies.sort()
+
+    print("=" * 60)
+    print("DNS SINKHOLE BENCHMARK")
+    print("=" * 60)
+    print(f"Blocklist: {listed:,} domains   Clients: {CLIENTS}")
+    print(f"Queries:   {queries:,} ({stats['blocked']:,} blocked, "
+          f"{stats['cached']:,} cached, {stats['forwarded']:,} forwarded)")
+    print(f"  Throughput:       {queries / elapsed:>10,.0f} queries/s")
+    print(f"  Client p99:       {latencies[int(len(latencies) * 0.99)] * 1000:>10.2f} ms")
+    print(f"  Server p99:       {stats['p99_ms']:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Domain Store Memory Benchmark
+Compares bytes per domain of DomainStore against a list of str
+
+Usage: python tests/benchmarks/bench_domain_store.py [domains]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from domain_store import DomainStore
+
+
+def make_domains(count):
+    """Generate blocklist-like hostnames"""
+    tlds = ("com", "net", "org", "io", "co.uk")
+    return [
+        f"ads{i}.tracker{i % 5000}.{tlds[i % len(tlds)]}" for i in range(count)
+    ]
+
+
+def measure(build):
+    """Return (object, bytes retained) for build()"""
+    tracemalloc.start()
+    obj = build()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, retained
+
+
+def main():
+    """Run the benchmark"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    # Built from a generator so the measured list owns every str
+    as_list, list_bytes = measure(lambda: make_domains(count))
+    store, store_bytes = measure(lambda: DomainStore(as_list))
+
+    probes = random.Random(0).sample(as_list, min(count, 100000))
+    probes = [f"cdn.{host}" if i % 2 else host for i, host in enumerate(probes)]
+    start = time.perf_counter()
+    hits = sum(1 for host in probes if host in store)
+    elapsed = time.perf_counter() - start
+
+    print("=" * 60)
+    print("DOMAIN STORE MEMORY BENCHMARK")
+    print("=" * 60)
+    print(f"Domains: {count:,}")
+    print(f"  list of str: {list_bytes / count:6.1f} bytes/domain")
+    print(f"  DomainStore: {store_bytes / count:6.1f} bytes/domain "
+          f"({store.nbytes / count:.1f} packed)  "
+          f"x{list_bytes / store_bytes:.1f} smaller")
+    print(f"  Lookups:     {len(probes) / elapsed:>12,.0f} /s  ({hits:,} hits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Hosts File Rewrite Benchmark
+Measures streaming unblock throughput on a large adblock-style hosts file
+
+Usage: python tests/benchmarks/bench_hosts_rewrite.py [lines]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from hosts_engine import HostsEngine
+
+
+def write_hosts(path, lines):
+    """Write an adblock-style hosts file with a few sites to unblock"""
+    with open(path, 'w') as f:
+        f.write("127.0.0.1 localhost\n")
+        for i in range(lines):
+            f.write(f"0.0.0.0 ads{i}.tracker{i % 97}.net\n")
+            if i % 100000 == 0:
+                f.write("0.0.0.0 reddit.com www.reddit.com\n")
+
+
+def main():
+    """Run the benchmark"""
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        hosts_path = os.path.join(tmpdir, 'hosts')
+        write_hosts(hosts_path, lines)
+        size_mb = os.path.getsize(hosts_path) / (1024 * 1024)
+        engine = HostsEngine(hosts_path)
+
+        start = time.perf_counter()
+        engine.unblock(["reddit.com"])
+        elapsed = time.perf_counter() - start
+
+        write_hosts(hosts_path, lines)
+        tracemalloc.start()
+        engine.unblock(["reddit.com"])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print("=" * 60)
+    print("HOSTS REWRITE BENCHMARK")
+    print("=" * 60)
+    print(f"Lines:        {lines:,} ({size_mb:.1f} MB)")
+    print(f"Elapsed:      {elapsed:.2f} s")
+    print(f"Throughput:   {lines / elapsed:,.0f} lines/s")
+    print(f"Peak memory:  {peak / 1024:.0f} KiB (traced)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Parallel Normalization Benchmark
+Compares serial and multi-process parsing/normalization of a large list
+
+Usage: python tests/benchmarks/bench_normalize.py [lines]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from blocklist_importer import parse_file
+
+
+def write_list(path, lines):
+    """Write a mixed-format list with URLs, IDNs and invalid entries"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(lines):
+            kind = i % 4
+            if kind == 0:
+                f.write(f"0.0.0.0 ads{i}.tracker.net\n")
+            elif kind == 1:
+                f.write(f"||Ads{i}.Example.COM^$third-party\n")
+            elif kind == 2:
+                f.write(f"https://www.site{i}.org/path?q=1\n")
+            else:
+                f.write(f"bücher{i}.рф\n" if i % 100 == 3 else "not_a_domain\n")
+
+
+def main():
+    """Run the benchmark"""
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'list.txt')
+        write_list(path, lines)
+
+        timings = {}
+        baseline = None
+        for workers in counts:
+            start = time.perf_counter()
+            result = parse_file(path, workers=workers)
+            timings[workers] = time.perf_counter() - start
+            if baseline is None:
+                baseline = result
+            elif result != baseline:
+                print(f"[X] Output with {workers} workers differs from serial")
+                sys.exit(1)
+
+    print("=" * 60)
+    print("PARALLEL NORMALIZATION BENCHMARK")
+    print("=" * 60)
+    print(f"Lines: {lines:,}   Valid unique hosts: {len(baseline[2]):,}")
+    for workers, elapsed in timings.items():
+        speedup = timings[1] / elapsed
+        print(
+            f"  {workers:>2} worker(s): {elapsed:6.2f} s  "
+            f"{lines / elapsed:>12,.0f} lines/s  x{speedup:.2f}"
+        )
+    print("[OK] Parallel output identical to serial")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Pre-fork Worker Scaling Benchmark
+Block page requests per second against 1..N SO_REUSEPORT worker processes
+
+Load comes from separate client processes, so the client side is not held
+to one core by the GIL either. Each client opens a connection, sends a
+burst of keep-alive requests, then reconnects, letting the kernel spread
+connections over the workers. Expect near-linear scaling up to the core
+count; on a single core every worker shares one CPU and scaling stays flat.
+
+Usage: python tests/benchmarks/bench_prefork.py [seconds per level]
+"""
+
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+import prefork
+from prefork import PreforkSupervisor
+
+REQUESTS_PER_CONNECTION = 20
+REQUEST = b"GET / HTTP/1.1\r\nHost: blocked.example\r\n\r\n"
+
+
+def read_response(sock, buffer):
+    """Read one response with a Content-Length body; returns leftover bytes"""
+    while b"\r\n\r\n" not in buffer:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("server closed the connection")
+        buffer += chunk
+    head, _, rest = buffer.partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    while len(rest) < length:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("server closed the connection")
+        rest += chunk
+    return rest[length:]
+
+
+def client(port, seconds):
+    """Send requests until `seconds` pass; returns the number answered"""
+    done = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+            buffer = b""
+            for _ in range(REQUESTS_PER_CONNECTION):
+                sock.sendall(REQUEST)
+                buffer = read_response(sock, buffer)
+                done += 1
+    return done
+
+
+def measure(workers, clients, seconds):
+    """Return requests per second served by `workers` processes"""
+    supervisor = PreforkSupervisor(None, workers=workers, host="127.0.0.1", http_port=0)
+    supervisor.start()
+    try:
+        with multiprocessing.Pool(clients) as pool:
+            start = time.perf_counter()
+            counts = pool.starmap(client, [(supervisor.http_port, seconds)] * clients)
+            elapsed = time.perf_counter() - start
+        return sum(counts) / elapsed, supervisor.stats()
+    finally:
+        supervisor.stop()
+
+
+def main():
+    """Run the benchmark"""
+    if not prefork.AVAILABLE:
+        print("[X] SO_REUSEPORT load balancing is not available on this platform")
+        sys.exit(1)
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    cores = os.cpu_count() or 1
+    clients = max(4, 2 * cores)
+
+    print("=" * 60)
+    print("PRE-FORK WORKER SCALING BENCHMARK")
+    print("=" * 60)
+    print(f"Cores: {cores}   Client processes: {clients}   {seconds:g} s per level")
+    baseline = None
+    for workers in sorted({1, 2, 4, cores}):
+        rate, stats = measure(workers, clients, seconds)
+        baseline = baseline or rate
+        print(
+            f"  {workers:>3} worker(s): {rate:10,.0f} req/s  x{rate / baseline:.2f}  "
+            f"({stats['http']['served']:,} connections)"
+        )
+
+
+if __name__ == "__main__":
+    main()
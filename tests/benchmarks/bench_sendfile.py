@@ -0,0 +1,85 @@
+"""
+Sendfile Block Page Benchmark
+Large block page throughput from memory versus a file with sendfile()
+
+The page carries an inline base64 image, as custom block pages often do.
+The in-memory path copies the whole body from Python into the socket on
+every request; the file-backed path hands it to the kernel with
+sendfile() after the pre-built head.
+
+Usage: python tests/benchmarks/bench_sendfile.py [page KiB] [requests]
+"""
+
+import base64
+import http.client
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from block_response import BlockResponse
+from proxy_server import BlockPageHandler, ProxyServer
+
+CLIENTS = 4
+
+
+def client(address, count):
+    """Fetch the page `count` times on one keep-alive connection"""
+    conn = http.client.HTTPConnection(*address, timeout=30)
+    for _ in range(count):
+        conn.request("GET", "/")
+        conn.getresponse().read()
+    conn.close()
+
+
+def measure(page, threshold, total, mode):
+    """Return requests per second for one storage choice"""
+    proxy = ProxyServer(None, mode=mode, host="127.0.0.1", max_requests=total + 1)
+    BlockPageHandler.block_page_content = page
+    BlockPageHandler.block_response = BlockResponse(page, sendfile_threshold=threshold)
+    server = proxy.make_server(0)
+    if mode == "async":
+        server.block_response = BlockPageHandler.block_response
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    if mode == "async":
+        server.ready.wait(5)
+    try:
+        threads = [
+            threading.Thread(target=client, args=(server.server_address, total // CLIENTS))
+            for _ in range(CLIENTS)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return total // CLIENTS * CLIENTS / (time.perf_counter() - start)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    """Run the benchmark"""
+    size_kib = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    image = base64.b64encode(os.urandom(size_kib * 1024 * 3 // 4)).decode()
+    page = f'<html><body><img src="data:image/png;base64,{image}"></body></html>'
+    megabytes = len(page) / 1e6
+
+    print("=" * 60)
+    print("SENDFILE BLOCK PAGE BENCHMARK")
+    print("=" * 60)
+    print(f"Page: {len(page) / 1024:,.0f} KiB   {total:,} requests over {CLIENTS} connections")
+    for mode in ("pool", "async"):
+        for label, threshold in (("memory", None), ("sendfile", 1)):
+            rate = measure(page, threshold, total, mode)
+            print(f"  {mode:>5} {label:>8}: {rate:8,.0f} req/s  {rate * megabytes:8,.0f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+HTTPS Handshake Throughput Benchmark
+Full and resumed TLS handshakes per second with client concurrency
+
+Handshakes run on connection threads and OpenSSL releases the GIL while it
+works, so throughput should scale with cores. Stalled clients that never
+handshake are held open throughout; they must not slow anyone else down.
+The resumed column has each client offer its previous session, as a
+browser does on a repeat visit.
+Requires the openssl command to create a throwaway certificate.
+
+Usage: python tests/benchmarks/bench_tls_handshake.py [handshakes per level]
+"""
+
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from proxy_server import ProxyServer
+from tls_context import new_server_context
+
+STALLED_CLIENTS = 20
+
+
+def make_cert(directory):
+    """Create a self-signed certificate, or None without openssl"""
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        return None
+    path = os.path.join(directory, "cert.pem")
+    subprocess.run(
+        [openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", path, "-out", path],
+        check=True, capture_output=True,
+    )
+    return path
+
+
+def client(address, context, count, resume=False):
+    """Fetch the page `count` times, each on a new TLS connection"""
+    session = None
+    for _ in range(count):
+        sock = socket.create_connection(address, timeout=30)
+        with context.wrap_socket(sock, session=session) as tls:
+            tls.sendall(b"GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+            while tls.recv(65536):
+                pass
+            if resume:
+                session = tls.session
+
+
+def measure(address, context, concurrency, per_client, resume):
+    """Return handshakes per second for `concurrency` clients"""
+    threads = [
+        threading.Thread(target=client, args=(address, context, per_client, resume))
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return per_client * concurrency / (time.perf_counter() - start)
+
+
+def main():
+    """Run the benchmark"""
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    cores = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cert_file = make_cert(tmpdir)
+        if cert_file is None:
+            print("[X] openssl command not found - cannot create a test certificate")
+            sys.exit(1)
+
+        server_context = new_server_context(cert_file)
+        client_context = ssl.create_default_context()
+        client_context.check_hostname = False
+        client_context.verify_mode = ssl.CERT_NONE
+
+        proxy = ProxyServer(
+            None, mode="pool", host="127.0.0.1", max_in_flight=STALLED_CLIENTS + 4 * cores
+        )
+        server = proxy.make_server(0, server_context)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stalled = [
+            socket.create_connection(server.server_address) for _ in range(STALLED_CLIENTS)
+        ]
+
+        print("=" * 60)
+        print("HTTPS HANDSHAKE THROUGHPUT BENCHMARK")
+        print("=" * 60)
+        print(f"Cores: {cores}   Stalled clients held open: {STALLED_CLIENTS}")
+        print(f"  {'clients':>7}  {'full/s':>9}  {'scaling':>7}  {'resumed/s':>9}")
+        baseline = None
+        for concurrency in sorted({1, 2, 4, cores, 2 * cores}):
+            per_client = max(1, total // concurrency)
+            full = measure(server.server_address, client_context, concurrency, per_client, False)
+            resumed = measure(server.server_address, client_context, concurrency, per_client, True)
+            baseline = baseline or full
+            print(f"  {concurrency:>7}  {full:>9,.0f}  x{full / baseline:>6.2f}  {resumed:>9,.0f}")
+
+        for sock in stalled:
+            sock.close()
+        server.shutdown()
+        server.server_close()
+        print(f"  Server stats: {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Unit tests for access_log module
+"""
+
+import http.client
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from access_log import AccessLog, format_record
+from proxy_server import ProxyServer
+
+
+class TestFormatRecord(unittest.TestCase):
+    """Test log line formatting"""
+
+    def test_common_log_format_with_host(self):
+        """Test a record becomes a Common Log Format line plus the Host"""
+        line = format_record(
+            (0.0, "10.0.0.5", "GET / HTTP/1.1", 200, 1234, "a.com"), "01/Jan/2026:00:00:00 +0000"
+        )
+        self.assertEqual(
+            line,
+            '10.0.0.5 - - [01/Jan/2026:00:00:00 +0000] "GET / HTTP/1.1" 200 1234 "a.com"\n',
+        )
+
+    def test_quotes_are_escaped(self):
+        """Test quotes in the request line or Host can't end the field early"""
+        line = format_record((0.0, "::1", 'GET /"x HTTP/1.1', 304, 10, None), "t")
+        self.assertIn('"GET /\\"x HTTP/1.1" 304 10 "-"', line)
+
+
+class TestAccessLog(unittest.TestCase):
+    """Test buffering, dropping and rotation"""
+
+    def setUp(self):
+        """Create a temp directory for log files"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = Path(self.temp_dir) / "access.log"
+
+    def tearDown(self):
+        """Remove the temp directory"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def lines(self, path=None):
+        """Return the lines of a log file"""
+        return Path(path or self.path).read_text().splitlines()
+
+    def test_records_are_written_in_order(self):
+        """Test queued records reach the file by close()"""
+        log = AccessLog(self.path, flush_interval=60)
+        for i in range(5):
+            log.log("127.0.0.1", f"GET /{i} HTTP/1.1", 200, 100, "a.com")
+        log.close()
+        lines = self.lines()
+        self.assertEqual(len(lines), 5)
+        self.assertIn('"GET /4 HTTP/1.1"', lines[4])
+        self.assertEqual(log.stats()["written"], 5)
+
+    def test_full_batch_wakes_the_writer(self):
+        """Test the writer writes a full batch without waiting for the interval"""
+        log = AccessLog(self.path, batch_size=4, flush_interval=60)
+        self.addCleanup(log.close)
+        for _ in range(4):
+            log.log("127.0.0.1", "GET / HTTP/1.1", 200, 100, "a.com")
+        for _ in range(100):
+            if log.stats()["written"] == 4:
+                break
+            threading.Event().wait(0.02)
+        self.assertEqual(log.stats()["written"], 4)
+
+    def test_full_buffer_drops_and_counts(self):
+        """Test records beyond the buffer are dropped instead of waiting"""
+        log = AccessLog(self.path, buffer_size=3, flush_interval=60)
+        for _ in range(5):
+            log.log("127.0.0.1", "GET / HTTP/1.1", 200, 100, "a.com")
+        self.assertEqual(log.stats()["dropped"], 2)
+        self.assertEqual(log.stats()["pending"], 3)
+        log.close()
+        self.assertEqual(len(self.lines()), 3)
+
+    def test_drops_do_not_wait_for_the_writer(self):
+        """Test a full buffer drops at once while the writer is busy on the disk"""
+        log = AccessLog(self.path, buffer_size=1, flush_interval=60)
+        log.log("127.0.0.1", "GET / HTTP/1.1", 200, 100, "a.com")
+        dropped = threading.Event()
+
+        def log_one():
+            log.log("127.0.0.1", "GET / HTTP/1.1", 200, 100, "a.com")
+            dropped.set()
+
+        # The writer holds its lock for the whole write
+        with log._lock:
+            threading.Thread(target=log_one).start()
+            self.assertTrue(dropped.wait(2))
+        self.assertEqual(log.stats()["dropped"], 1)
+        log.close()
+
+    def test_rotation_keeps_backups(self):
+        """Test the file rotates by size and only backup_count old files stay"""
+        log = AccessLog(self.path, batch_size=1, flush_interval=60, max_bytes=100, backup_count=2)
+        for i in range(6):
+            log.log("127.0.0.1", f"GET /{i} HTTP/1.1", 200, 100, "a.com")
+            log.flush()
+        log.close()
+        self.assertEqual(log.stats()["rotations"], 5)
+        self.assertIn("/5 ", self.lines()[0])
+        self.assertIn("/4 ", self.lines(f"{self.path}.1")[0])
+        self.assertIn("/3 ", self.lines(f"{self.path}.2")[0])
+        self.assertFalse(Path(f"{self.path}.3").exists())
+
+    def test_concurrent_writers(self):
+        """Test records from many threads are all written once"""
+        log = AccessLog(self.path, batch_size=64)
+
+        def work():
+            for _ in range(500):
+                log.log("127.0.0.1", "GET / HTTP/1.1", 200, 100, "a.com")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log.close()
+        self.assertEqual(len(self.lines()), 2000)
+        self.assertEqual(log.stats()["dropped"], 0)
+
+
+class TestServerAccessLog(unittest.TestCase):
+    """Test block page servers write access log lines"""
+
+    def setUp(self):
+        """Create a temp directory for the log"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = Path(self.temp_dir) / "access.log"
+
+    def tearDown(self):
+        """Remove the temp directory"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def check_mode(self, mode):
+        """Serve a GET and a HEAD, then read them back from the log"""
+        proxy = ProxyServer(None, mode=mode, host="127.0.0.1", access_log=self.path)
+        server = proxy.make_server(0)
+        proxy.http_server = server
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        if mode == "async":
+            self.assertTrue(server.ready.wait(5))
+        try:
+            conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+            conn.request("GET", "/page", headers={"Host": "blocked.example"})
+            length = len(conn.getresponse().read())
+            conn.request("HEAD", "/", headers={"Host": "blocked.example"})
+            conn.getresponse().read()
+            conn.close()
+        finally:
+            proxy.stop()
+        lines = self.path.read_text().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("127.0.0.1 - - ["))
+        self.assertIn('"GET /page HTTP/1.1" 200 ', lines[0])
+        self.assertTrue(lines[0].endswith('"blocked.example"'))
+        self.assertGreater(int(lines[0].split()[-2]), length)
+        self.assertIn('"HEAD / HTTP/1.1" 200 ', lines[1])
+
+    def test_thread_mode(self):
+        """Test the threaded server logs each hit"""
+        self.check_mode("thread")
+
+    def test_async_mode(self):
+        """Test the async server logs each hit"""
+        self.check_mode("async")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,261 @@
+"""
+Unit tests for async_block_server module
+"""
+
+import gzip
+import http.client
+import socket
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from async_block_server import AsyncBlockServer
+from block_response import BlockResponse
+from proxy_server import ProxyServer
+
+PAGE = "<html><body>Blocked ✓</body></html>"
+
+
+class ServerTestCase(unittest.TestCase):
+    """Runs an AsyncBlockServer on a free localhost port"""
+
+    server_options = {}
+    response_options = {}
+
+    def setUp(self):
+        """Start the server in a background thread"""
+        self.block_response = BlockResponse(PAGE * 20, **self.response_options)
+        self.server = AsyncBlockServer(
+            self.block_response, host="127.0.0.1", port=0, **self.server_options
+        )
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.assertTrue(self.server.ready.wait(5))
+
+    def tearDown(self):
+        """Stop the server"""
+        self.server.shutdown()
+        self.thread.join(5)
+
+    def request(self, method, body=None, headers=None):
+        """Send one request, returning the response"""
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        conn.request(method, "/some/path", body=body, headers=headers or {})
+        response = conn.getresponse()
+        data = response.read()
+        conn.close()
+        return response, data
+
+
+class TestResponses(ServerTestCase):
+    """Test the replies match BlockPageHandler"""
+
+    def test_get_serves_page(self):
+        """Test GET returns the page with no-cache headers"""
+        response, data = self.request("GET")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(data.decode("utf-8"), PAGE * 20)
+        self.assertEqual(response.getheader("Content-type"), "text/html; charset=utf-8")
+        self.assertIn("no-cache", response.getheader("Cache-Control"))
+
+    def test_gzip_and_conditional_get(self):
+        """Test gzip is negotiated and a matching ETag gets a 304"""
+        response, data = self.request("GET", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(data).decode("utf-8"), PAGE * 20)
+
+        etag = response.getheader("ETag")
+        response, data = self.request(
+            "GET", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+        )
+        self.assertEqual(response.status, 304)
+        self.assertEqual(data, b"")
+
+    def test_post_consumes_body(self):
+        """Test POST reads the body and returns the page"""
+        response, data = self.request("POST", body=b"x" * 100000)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(data.decode("utf-8"), PAGE * 20)
+
+    def test_head_has_no_body(self):
+        """Test HEAD returns headers only"""
+        response, data = self.request("HEAD")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(data, b"")
+
+    def test_unknown_method(self):
+        """Test unsupported methods get 501"""
+        response, _ = self.request("DELETE")
+        self.assertEqual(response.status, 501)
+
+    def test_many_concurrent_connections(self):
+        """Test a burst of simultaneous connections is served"""
+        sockets = [
+            socket.create_connection(self.server.server_address, timeout=5)
+            for _ in range(200)
+        ]
+        for sock in sockets:
+            sock.sendall(b"GET / HTTP/1.1\r\nHost: x\r\n\r\n")
+        for sock in sockets:
+            self.assertTrue(sock.recv(64).startswith(b"HTTP/1.1 200 OK"))
+            sock.close()
+
+
+class TestKeepAlive(ServerTestCase):
+    """Test persistent connections"""
+
+    server_options = {"max_requests": 3, "idle_timeout": 0.3}
+
+    def test_requests_share_connection_until_cap(self):
+        """Test requests reuse one socket and the capped reply closes it"""
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        conn.request("POST", "/", body=b"form=data")
+        conn.getresponse().read()
+        sock = conn.sock
+        conn.request("HEAD", "/")
+        response = conn.getresponse()
+        self.assertEqual(response.read(), b"")
+        self.assertIsNone(response.getheader("Connection"))
+        self.assertIs(conn.sock, sock)
+        conn.request("GET", "/")
+        response = conn.getresponse()
+        response.read()
+        self.assertEqual(response.getheader("Connection"), "close")
+        self.assertEqual(self.server.served, 3)
+        conn.close()
+
+    def test_idle_connection_times_out(self):
+        """Test a kept-alive connection closes once idle"""
+        sock = socket.create_connection(self.server.server_address, timeout=5)
+        sock.sendall(b"HEAD / HTTP/1.1\r\nHost: x\r\n\r\n")
+        self.assertIn(b"200 OK", sock.recv(4096))
+        self.assertEqual(sock.recv(64), b"")
+        sock.close()
+
+    def test_http10_closes(self):
+        """Test HTTP/1.0 requests get Connection: close"""
+        sock = socket.create_connection(self.server.server_address, timeout=5)
+        sock.sendall(b"HEAD / HTTP/1.0\r\n\r\n")
+        self.assertIn(b"Connection: close", sock.recv(4096))
+        sock.close()
+
+    def post_with_length(self, length):
+        """Send a POST with a raw Content-Length value, returning all it gets back"""
+        sock = socket.create_connection(self.server.server_address, timeout=5)
+        sock.sendall(
+            b"POST / HTTP/1.1\r\nHost: x\r\nContent-Length: " + length + b"\r\n\r\n"
+        )
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        sock.close()
+        return b"".join(chunks)
+
+    def test_malformed_length_closes(self):
+        """Test a non-numeric Content-Length gets the page and Connection: close"""
+        data = self.post_with_length(b"abc")
+        self.assertTrue(data.startswith(b"HTTP/1.1 200 OK"))
+        self.assertIn(b"Connection: close", data)
+
+    def test_negative_length_closes(self):
+        """Test a negative Content-Length is not kept alive"""
+        data = self.post_with_length(b"-5")
+        self.assertTrue(data.startswith(b"HTTP/1.1 200 OK"))
+        self.assertIn(b"Connection: close", data)
+
+
+class TestFileBackedResponses(TestResponses):
+    """Run the response tests with bodies sent by sendfile()"""
+
+    response_options = {"sendfile_threshold": 1}
+
+    def test_body_is_file_backed(self):
+        """Test every body lives in a file rather than in the variants"""
+        self.assertEqual(set(self.block_response.files), set(self.block_response.bodies))
+
+
+class TestFileBackedKeepAlive(TestKeepAlive):
+    """Run the keep-alive tests with bodies sent by sendfile()"""
+
+    response_options = {"sendfile_threshold": 1}
+
+
+class TestConnectionLimit(ServerTestCase):
+    """Test connections over the limit wait for a slot"""
+
+    server_options = {"max_connections": 1}
+
+    def test_second_connection_waits(self):
+        """Test the second client is answered only after the first finishes"""
+        first = socket.create_connection(self.server.server_address, timeout=5)
+        time.sleep(0.1)
+        second = socket.create_connection(self.server.server_address, timeout=5)
+        second.sendall(b"GET / HTTP/1.0\r\n\r\n")
+        second.settimeout(0.3)
+        with self.assertRaises(socket.timeout):
+            second.recv(64)
+
+        first.sendall(b"GET / HTTP/1.0\r\n\r\n")
+        self.assertTrue(first.recv(64).startswith(b"HTTP/1.1 200"))
+        first.close()
+        second.settimeout(5)
+        self.assertTrue(second.recv(64).startswith(b"HTTP/1.1 200"))
+        second.close()
+
+
+class TestSlowClient(ServerTestCase):
+    """Test idle clients are dropped"""
+
+    server_options = {"request_timeout": 0.2}
+
+    def test_idle_connection_closed(self):
+        """Test a client that never sends a request is disconnected"""
+        sock = socket.create_connection(self.server.server_address, timeout=5)
+        self.assertEqual(sock.recv(64), b"")
+        sock.close()
+
+
+class TestLifecycle(unittest.TestCase):
+    """Test start/stop edge cases"""
+
+    def test_shutdown_before_serving(self):
+        """Test shutdown() before serve_forever() makes it return at once"""
+        server = AsyncBlockServer(BlockResponse(PAGE), host="127.0.0.1", port=0)
+        server.shutdown()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_proxy_server_async_mode(self):
+        """Test ProxyServer serves the page in async mode"""
+        proxy = ProxyServer(None, mode="async", host="127.0.0.1", http_port=0)
+        proxy.start()
+        try:
+            deadline = time.monotonic() + 5
+            while proxy.http_server is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(proxy.http_server.ready.wait(5))
+            conn = http.client.HTTPConnection(*proxy.http_server.server_address)
+            conn.request("GET", "/")
+            self.assertIn(b"Site Blocked", conn.getresponse().read())
+            conn.close()
+        finally:
+            proxy.stop()
+
+    def test_unknown_mode_rejected(self):
+        """Test an invalid mode raises ValueError"""
+        with self.assertRaises(ValueError):
+            ProxyServer(None, mode="fork")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
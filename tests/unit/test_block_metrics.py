@@ -0,0 +1,185 @@
+"""
+Unit tests for block_metrics module
+"""
+
+import http.client
+import json
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+import block_metrics
+from block_metrics import MetricsRegistry, is_loopback, stats_response
+from proxy_server import BlockPageHandler, ProxyServer
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test recording and merged snapshots"""
+
+    def setUp(self):
+        """Create an empty registry"""
+        self.metrics = MetricsRegistry()
+
+    def test_counts_by_host_method_and_port(self):
+        """Test Host headers are normalized when read, not when recorded"""
+        self.metrics.record("A.com:80", "GET", 80, 0.001)
+        self.metrics.record("a.com", "HEAD", 443, 0.001)
+        self.metrics.record("<junk>", "GET", 80, 0.001)
+        self.metrics.record(None, "POST", 80, 0.001)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["requests"], 4)
+        self.assertEqual(snapshot["hosts"], {"a.com": 2, "unknown": 2})
+        self.assertEqual(snapshot["methods"], {"GET": 2, "HEAD": 1, "POST": 1})
+        self.assertEqual(snapshot["ports"], {"80": 3, "443": 1})
+
+    def test_threads_merge_and_exited_shards_fold(self):
+        """Test per-thread shards add up and are retired once threads exit"""
+        def work():
+            for _ in range(1000):
+                self.metrics.record("a.com", "GET", 80, 0.0002)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.metrics.snapshot()["hosts"], {"a.com": 4000})
+        self.assertEqual(self.metrics._shards, [])
+        self.assertEqual(self.metrics.snapshot()["requests"], 4000)
+
+    def test_series_are_bounded(self):
+        """Test new hosts beyond the series limit count as other"""
+        with patch.object(block_metrics, "MAX_SERIES", 2):
+            for host in ("a.com", "b.com", "c.com", "d.com"):
+                self.metrics.record(host, "GET", 80, 0.001)
+        self.assertEqual(
+            self.metrics.snapshot()["hosts"], {"a.com": 1, "b.com": 1, "other": 2}
+        )
+
+    def test_retired_series_are_bounded(self):
+        """Test shards of exited threads fold into a total with the same series limit"""
+        def work(host):
+            self.metrics.record(host, "GET", 80, 0.001)
+
+        with patch.object(block_metrics, "MAX_SERIES", 2):
+            for host in ("a.com", "b.com", "c.com", "d.com"):
+                thread = threading.Thread(target=work, args=(host,))
+                thread.start()
+                thread.join()
+            snapshot = self.metrics.snapshot()
+        self.assertEqual(len(self.metrics._retired.counts), 3)
+        self.assertEqual(snapshot["hosts"], {"a.com": 1, "b.com": 1, "other": 2})
+
+    def test_latency_histogram(self):
+        """Test latencies land in log-scale buckets with a +Inf overflow"""
+        self.metrics.record("a.com", "GET", 80, 0.00001)
+        self.metrics.record("a.com", "GET", 80, 0.00015)
+        self.metrics.record("a.com", "GET", 80, 10.0)
+        latency = self.metrics.snapshot()["latency"]
+        self.assertEqual(latency["buckets"]["5e-05"], 1)
+        self.assertEqual(latency["buckets"]["0.0002"], 1)
+        self.assertEqual(latency["buckets"]["+Inf"], 1)
+        self.assertAlmostEqual(latency["sum_seconds"], 10.00016)
+        self.assertEqual(latency["p50_ms"], 0.2)
+
+    def test_prometheus_format(self):
+        """Test series, cumulative buckets and label escaping"""
+        self.metrics.record("a.com", 'G"ET', 80, 0.00001)
+        self.metrics.record("a.com", "GET", 80, 0.00015)
+        text = self.metrics.to_prometheus().decode()
+        self.assertIn('blocker_requests_total{host="a.com",method="G\\"ET",port="80"} 1', text)
+        self.assertIn('blocker_request_duration_seconds_bucket{le="5e-05"} 1', text)
+        self.assertIn('blocker_request_duration_seconds_bucket{le="0.0002"} 2', text)
+        self.assertIn('blocker_request_duration_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn("blocker_request_duration_seconds_count 2", text)
+
+    def test_stats_response(self):
+        """Test only the reserved paths produce a response"""
+        self.assertIsNone(stats_response(self.metrics, "/__statsx"))
+        response = stats_response(self.metrics, "/__stats?pretty=1")
+        head, _, body = response.partition(b"\r\n\r\n")
+        self.assertIn(b"Content-Type: application/json", head)
+        self.assertEqual(json.loads(body)["requests"], 0)
+
+    def test_is_loopback(self):
+        """Test only loopback clients may read stats"""
+        self.assertTrue(is_loopback(("127.0.0.1", 5000)))
+        self.assertTrue(is_loopback(("::1", 5000, 0, 0)))
+        self.assertFalse(is_loopback(("192.168.1.20", 5000)))
+        self.assertFalse(is_loopback(None))
+
+
+class TestStatsEndpoint(unittest.TestCase):
+    """Test /__stats on running servers"""
+
+    def fetch(self, address, path, host="blocked.example"):
+        """GET `path`, returning (status, content type, body)"""
+        conn = http.client.HTTPConnection(*address, timeout=5)
+        conn.request("GET", path, headers={"Host": host})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response.status, response.getheader("Content-Type"), body
+
+    def check_server(self, proxy, server):
+        """Serve two page hits, then read them back from both stats paths"""
+        address = server.server_address
+        self.fetch(address, "/")
+        self.fetch(address, "/some/page")
+        # A hit is recorded after its response is written, so the second one
+        # can trail the client by a moment
+        deadline = time.monotonic() + 5
+        while proxy.metrics.snapshot()["requests"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        status, content_type, body = self.fetch(address, "/__stats")
+        self.assertEqual((status, content_type), (200, "application/json"))
+        stats = json.loads(body)
+        self.assertEqual(stats["hosts"], {"blocked.example": 2})
+        self.assertEqual(stats["ports"], {str(address[1]): 2})
+
+        _, content_type, body = self.fetch(address, "/__stats/prometheus")
+        self.assertTrue(content_type.startswith("text/plain"))
+        self.assertIn(b'host="blocked.example",method="GET"', body)
+        # Stats requests are not counted as block page hits
+        self.assertEqual(proxy.metrics.snapshot()["requests"], 2)
+
+    def test_thread_mode(self):
+        """Test the threaded server serves stats"""
+        proxy = ProxyServer(None, host="127.0.0.1")
+        server = proxy.make_server(0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            self.check_server(proxy, server)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_remote_clients_get_the_block_page(self):
+        """Test a non-loopback client asking for stats is not answered with them"""
+        with patch.object(BlockPageHandler, "__init__", lambda *args: None):
+            handler = BlockPageHandler(None, None, None)
+        handler.client_address = ("192.168.1.20", 5000)
+        handler.metrics = MetricsRegistry()
+        handler.path = "/__stats"
+        self.assertFalse(handler.serve_stats())
+
+    def test_async_mode(self):
+        """Test the async server serves stats"""
+        proxy = ProxyServer(None, mode="async", host="127.0.0.1")
+        server = proxy.make_server(0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.assertTrue(server.ready.wait(5))
+        try:
+            self.check_server(proxy, server)
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
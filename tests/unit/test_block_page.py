@@ -0,0 +1,134 @@
+"""
+Unit tests for block_page module
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from block_page import (
+    BlockPage, BlockTemplate, hits_label, host_from_header, until_label
+)
+
+TEMPLATE = "<p>{{ host }} is blocked until {{until}}</p>" + "<!-- padding -->" * 20
+HITS_TEMPLATE = "<p>{{ host }} blocked {{ hits }} time(s)</p>"
+
+
+def body_of(response):
+    """Return the identity body of a BlockResponse as text"""
+    return bytes(response.bodies["identity"]).decode()
+
+
+class TestHelpers(unittest.TestCase):
+    """Test Host parsing and value formatting"""
+
+    def test_host_from_header(self):
+        """Test ports are dropped, case folded and junk rejected"""
+        self.assertEqual(host_from_header("Blocked.Example:8080"), "blocked.example")
+        self.assertEqual(host_from_header("example.com."), "example.com")
+        self.assertEqual(host_from_header("[::1]:80"), "[::1]")
+        self.assertIsNone(host_from_header("<script>"))
+        self.assertIsNone(host_from_header(""))
+        self.assertIsNone(host_from_header(None))
+
+    def test_hits_label(self):
+        """Test counts are exact below 10 and stepped by leading digit after"""
+        self.assertEqual(
+            [hits_label(n) for n in (1, 9, 10, 19, 25, 999, 1000)],
+            ["1", "9", "10+", "10+", "20+", "900+", "1000+"],
+        )
+
+    def test_until_label(self):
+        """Test the end shows as a time today and with the date otherwise"""
+        now = datetime(2025, 11, 24, 9, 0)
+        self.assertEqual(until_label(datetime(2025, 11, 24, 14, 30), now), "14:30")
+        self.assertEqual(until_label(datetime(2025, 11, 25, 1, 5), now), "Nov 25, 01:05")
+        self.assertEqual(until_label(None, now), "further notice")
+
+
+class TestBlockTemplate(unittest.TestCase):
+    """Test template compilation"""
+
+    def test_fields_are_escaped(self):
+        """Test values are HTML-escaped and unknown fields left alone"""
+        template = BlockTemplate("<b>{{ host }}</b>{{ other }}")
+        self.assertEqual(template.fields, ["host"])
+        self.assertEqual(
+            template.render({"host": '"><script>'}),
+            "<b>&quot;&gt;&lt;script&gt;</b>{{ other }}",
+        )
+
+
+class TestBlockPage(unittest.TestCase):
+    """Test per-host responses and the render cache"""
+
+    def test_static_page_is_shared(self):
+        """Test a page without fields is one response for every host"""
+        page = BlockPage("<p>Blocked</p>")
+        self.assertIs(page.response_for("a.com"), page.response_for("b.com"))
+        self.assertEqual(page.stats()["renders"], 0)
+
+    def test_rendered_per_host_and_cached(self):
+        """Test each host gets its own page, built once"""
+        page = BlockPage(TEMPLATE)
+        first = page.response_for("a.com")
+        self.assertIn("a.com is blocked until further notice", body_of(first))
+        self.assertIs(page.response_for("A.com:80"), first)
+        self.assertIn("this site", body_of(page.response_for("<bad>")))
+        self.assertEqual(page.stats(), {"cached": 2, "renders": 2})
+
+    def test_block_state_changes_the_page(self):
+        """Test a new end time produces a new response"""
+        page = BlockPage(TEMPLATE)
+        before = page.response_for("a.com")
+        page.set_block_state(datetime.now().replace(hour=23, minute=59))
+        after = page.response_for("a.com")
+        self.assertIsNot(after, before)
+        self.assertIn("until 23:59", body_of(after))
+        self.assertNotEqual(after.etags["identity"], before.etags["identity"])
+
+    def test_hit_counts_rebuild_by_step(self):
+        """Test hit counts show in the page and settle between steps"""
+        page = BlockPage(HITS_TEMPLATE)
+        for _ in range(9):
+            page.response_for("a.com")
+        self.assertIn("blocked 10+ time(s)", body_of(page.response_for("a.com")))
+        renders = page.stats()["renders"]
+        for _ in range(9):
+            page.response_for("a.com")
+        self.assertEqual(page.stats()["renders"], renders)
+
+    def test_cache_is_bounded(self):
+        """Test the least recently used host is evicted"""
+        page = BlockPage(TEMPLATE, cache_size=2)
+        first = page.response_for("a.com")
+        page.response_for("b.com")
+        page.response_for("c.com")
+        self.assertEqual(page.stats()["cached"], 2)
+        self.assertIsNot(page.response_for("a.com"), first)
+
+    def test_resolve_uses_host_header(self):
+        """Test resolve() picks the response by the request's Host header"""
+        page = BlockPage(TEMPLATE)
+        head, _ = page.resolve("HEAD", {"host": "a.com"})
+        self.assertEqual(head, page.response_for("a.com").render("HEAD"))
+        self.assertIn(b"b.com is blocked", page.render("GET", {"host": "b.com"}))
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "needs /proc/self/fd")
+    def test_large_pages_per_host_hold_no_descriptors(self):
+        """Test caching many large per-host pages doesn't open a file for each"""
+        page = BlockPage("<p>{{ host }}</p>" + "<!-- padding -->" * 5000)
+        before = len(os.listdir("/proc/self/fd"))
+        for i in range(100):
+            response = page.response_for(f"site{i}.com")
+        self.assertEqual(response.files, {})
+        self.assertLess(len(os.listdir("/proc/self/fd")) - before, 5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,195 @@
+"""
+Unit tests for block_response module
+"""
+
+import gzip
+import socket
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+import block_response
+from block_response import (
+    BlockResponse, accepted_encodings, parse_headers, send_file_response
+)
+
+PAGE = "<html><body>" + "Blocked. Stay focused! " * 50 + "</body></html>"
+
+
+def split(response):
+    """Split raw response bytes into (status line, headers dict, body)"""
+    head, _, body = response.partition(b"\r\n\r\n")
+    status, _, header_block = head.partition(b"\r\n")
+    return status.decode(), parse_headers(header_block), body
+
+
+class TestVariants(unittest.TestCase):
+    """Test the pre-built responses"""
+
+    def setUp(self):
+        """Build the responses once"""
+        self.response = BlockResponse(PAGE)
+
+    def test_identity_get(self):
+        """Test the plain response has a matching Content-Length and ETag"""
+        status, headers, body = split(self.response.render("GET"))
+        self.assertEqual(status, "HTTP/1.1 200 OK")
+        self.assertEqual(body.decode("utf-8"), PAGE)
+        self.assertEqual(int(headers["content-length"]), len(body))
+        self.assertEqual(headers["etag"], self.response.etags["identity"])
+        self.assertEqual(headers["cache-control"], "no-cache")
+        self.assertEqual(headers["connection"], "close")
+        self.assertNotIn("content-encoding", headers)
+
+    def test_gzip_variant(self):
+        """Test gzip is chosen when accepted and decompresses to the page"""
+        status, headers, body = split(
+            self.response.render("GET", {"accept-encoding": "deflate, gzip;q=0.8"})
+        )
+        self.assertEqual(headers["content-encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body).decode("utf-8"), PAGE)
+        self.assertEqual(int(headers["content-length"]), len(body))
+        self.assertNotEqual(headers["etag"], self.response.etags["identity"])
+
+    def test_rejected_encoding(self):
+        """Test gzip;q=0 falls back to identity"""
+        _, headers, _ = split(self.response.render("GET", {"accept-encoding": "gzip;q=0"}))
+        self.assertNotIn("content-encoding", headers)
+
+    def test_head_has_headers_only(self):
+        """Test HEAD gets the GET headers and no body"""
+        status, headers, body = split(self.response.render("HEAD"))
+        self.assertEqual(body, b"")
+        self.assertEqual(int(headers["content-length"]), len(PAGE.encode()))
+
+    def test_if_none_match(self):
+        """Test a matching (or weak, or listed) ETag gets a bodiless 304"""
+        etag = self.response.etags["identity"]
+        for value in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            status, headers, body = split(
+                self.response.render("GET", {"if-none-match": value})
+            )
+            self.assertEqual(status, "HTTP/1.1 304 Not Modified")
+            self.assertEqual(body, b"")
+            self.assertEqual(headers["etag"], etag)
+        status, _, _ = split(self.response.render("GET", {"if-none-match": '"stale"'}))
+        self.assertEqual(status, "HTTP/1.1 200 OK")
+
+    def test_etag_is_per_encoding(self):
+        """Test an identity ETag doesn't validate the gzip variant"""
+        status, _, _ = split(self.response.render("GET", {
+            "accept-encoding": "gzip",
+            "if-none-match": self.response.etags["identity"],
+        }))
+        self.assertEqual(status, "HTTP/1.1 200 OK")
+
+    def test_keep_alive_variant(self):
+        """Test close=False omits Connection: close"""
+        _, headers, _ = split(self.response.render("GET", close=False))
+        self.assertNotIn("connection", headers)
+
+    def test_variants_are_prebuilt(self):
+        """Test render returns the same object every time"""
+        self.assertIs(self.response.render("GET"), self.response.render("GET"))
+
+    def test_tiny_page_not_compressed(self):
+        """Test encodings that don't shrink the page aren't offered"""
+        tiny = BlockResponse("<p>x</p>")
+        self.assertEqual(list(tiny.bodies), ["identity"])
+
+    def test_brotli_when_available(self):
+        """Test brotli is preferred when the optional module is installed"""
+        fake = type("Brotli", (), {"compress": staticmethod(lambda data: b"br")})
+        with patch.object(block_response, "brotli", fake):
+            response = BlockResponse(PAGE)
+        _, headers, body = split(response.render("GET", {"accept-encoding": "gzip, br"}))
+        self.assertEqual(headers["content-encoding"], "br")
+        self.assertEqual(body, b"br")
+
+
+class TestFileBackedBodies(unittest.TestCase):
+    """Test bodies over the sendfile threshold"""
+
+    def setUp(self):
+        """Build the same page in memory and file-backed"""
+        self.in_memory = BlockResponse(PAGE, sendfile_threshold=None)
+        self.response = BlockResponse(PAGE, sendfile_threshold=1000)
+
+    def test_only_large_bodies_are_spilled(self):
+        """Test the identity body moves to a file and small gzip stays in memory"""
+        self.assertEqual(list(self.response.files), ["identity"])
+        self.assertEqual(bytes(self.response.bodies["identity"]), PAGE.encode())
+
+    def test_resolve_splits_head_and_body(self):
+        """Test GET resolves to the head plus the file, HEAD to the head alone"""
+        head, body = self.response.resolve("GET")
+        self.assertTrue(head.endswith(b"\r\n\r\n"))
+        self.assertEqual(bytes(body.view), PAGE.encode())
+        self.assertEqual(self.response.resolve("HEAD"), (head, None))
+
+    def test_render_matches_in_memory(self):
+        """Test the full response bytes are identical either way"""
+        for method in ("GET", "HEAD"):
+            self.assertEqual(self.response.render(method), self.in_memory.render(method))
+
+    def test_send_file_response(self):
+        """Test the head and file body arrive intact over a socket"""
+        left, right = socket.socketpair()
+        with left, right:
+            left.settimeout(5)
+            head, body = self.response.resolve("GET")
+            send_file_response(left, head, body)
+            left.shutdown(socket.SHUT_WR)
+            received = b""
+            while True:
+                chunk = right.recv(65536)
+                if not chunk:
+                    break
+                received += chunk
+        self.assertEqual(received, self.in_memory.render("GET"))
+
+    @patch.object(block_response, "HAVE_SENDFILE", False)
+    @patch.object(
+        socket.socket, "_sendfile_use_sendfile", side_effect=socket._GiveupOnSendfile
+    )
+    def test_send_file_response_without_os_sendfile(self, _):
+        """Test the body is sent whole, every time, where socket.sendfile() would fall back"""
+        left, right = socket.socketpair()
+        with left, right:
+            left.settimeout(5)
+            for _ in range(2):
+                head, body = self.response.resolve("GET")
+                send_file_response(left, head, body)
+            left.shutdown(socket.SHUT_WR)
+            received = b""
+            while True:
+                chunk = right.recv(65536)
+                if not chunk:
+                    break
+                received += chunk
+        self.assertEqual(received, self.in_memory.render("GET") * 2)
+
+
+class TestHeaderParsing(unittest.TestCase):
+    """Test request header helpers"""
+
+    def test_parse_headers(self):
+        """Test names are lower-cased and values stripped"""
+        self.assertEqual(
+            parse_headers(b"Host: x\r\nAccept-Encoding:  gzip \r\nbad line"),
+            {"host": "x", "accept-encoding": "gzip"},
+        )
+
+    def test_accepted_encodings(self):
+        """Test q=0 codings are excluded"""
+        self.assertEqual(
+            accepted_encodings("gzip;q=0, br, identity;q=0.5"), {"br", "identity"}
+        )
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
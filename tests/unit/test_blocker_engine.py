@@ -0,0 +1,221 @@
+"""
+Unit tests for blocker_engine module
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+import sys
+
+# Add src to path
+SRC_DIR = Path(__file__).parent.parent.parent / 'src'
+sys.path.insert(0, str(SRC_DIR))
+
+from blocker_engine import BlockerEngine, normalize_website
+
+# Cumulative import budget for the headless engine, in microseconds
+IMPORT_BUDGET_US = 50000
+
+
+class EngineTestCase(unittest.TestCase):
+    """Base class providing an engine on temporary files"""
+
+    def setUp(self):
+        """Create a temporary config and hosts file"""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.config_file = Path(self.test_dir.name) / 'config' / 'blocked_sites.json'
+        self.hosts_path = os.path.join(self.test_dir.name, 'hosts')
+        with open(self.hosts_path, 'w') as f:
+            f.write("127.0.0.1 localhost\n")
+        self.dns = Mock()
+        self.engine = BlockerEngine(self.config_file, self.hosts_path, dns=self.dns)
+
+    def tearDown(self):
+        """Remove temporary files"""
+        self.engine.cancel_timer()
+        self.test_dir.cleanup()
+
+
+class TestNormalizeWebsite(unittest.TestCase):
+    """Test user input normalization"""
+
+    def test_strips_scheme_www_and_path(self):
+        """Test a full URL is reduced to its domain"""
+        self.assertEqual(
+            normalize_website(" https://www.Example.com/path?q=1 "), "example.com"
+        )
+
+
+class TestSiteList(EngineTestCase):
+    """Test blocked-site list management"""
+
+    def test_missing_config_is_empty(self):
+        """Test a missing config file loads as an empty list"""
+        self.assertEqual(self.engine.blocked_websites, [])
+
+    def test_add_deduplicates(self):
+        """Test adding skips sites already in the list"""
+        added = self.engine.add_websites(["a.com", "http://a.com", "b.com"])
+        self.assertEqual(added, ["a.com", "b.com"])
+        self.assertEqual(self.engine.add_websites(["b.com"]), [])
+
+    def test_remove(self):
+        """Test removing sites from the list"""
+        self.engine.add_websites(["a.com", "b.com"])
+        self.assertEqual(self.engine.remove_websites(["a.com"]), ["a.com"])
+        self.assertEqual(self.engine.blocked_websites, ["b.com"])
+
+    def test_remove_legacy_entries(self):
+        """Test entries saved before strict normalization can still be removed"""
+        legacy = ["intranet", "example.com:8080", "Foo.com"]
+        self.engine.blocked_websites = legacy + ["b.com"]
+        for site in legacy:
+            self.assertEqual(self.engine.remove_websites([site]), [site])
+        self.assertEqual(self.engine.blocked_websites, ["b.com"])
+
+    def test_wildcard_listing(self):
+        """Test *.domain entries match subdomains and block common ones"""
+        self.assertEqual(self.engine.add_websites(["*.Tracker.net"]), ["*.tracker.net"])
+        self.assertEqual(self.engine.listed_match("a.b.tracker.net"), "*.tracker.net")
+        self.assertIsNone(self.engine.listed_match("tracker.net"))
+        self.engine.block()
+        self.assertTrue(self.engine.hosts.index.lookup("www.tracker.net"))
+        self.assertIsNone(self.engine.hosts.index.lookup("tracker.net"))
+        self.assertEqual(self.engine.statuses(), {"*.tracker.net": True})
+
+    def test_store_follows_list(self):
+        """Test the domain store tracks adds, removes and reassignment"""
+        self.engine.add_websites(["a.com", "b.com"])
+        self.engine.remove_websites(["a.com"])
+        self.assertIsNone(self.engine.listed_match("a.com"))
+        self.assertEqual(self.engine.add_websites(["a.com"]), ["a.com"])
+        self.engine.blocked_websites = ["c.com"]
+        self.assertIsNone(self.engine.listed_match("b.com"))
+        self.assertEqual(self.engine.listed_match("c.com"), "c.com")
+
+    def test_write_and_reload(self):
+        """Test the list round-trips through the config file"""
+        self.engine.add_websites(["a.com"])
+        self.engine.write_blocked_sites()
+        with open(self.config_file) as f:
+            self.assertEqual(json.load(f), ["a.com"])
+        reloaded = BlockerEngine(self.config_file, self.hosts_path, dns=self.dns)
+        self.assertEqual(reloaded.blocked_websites, ["a.com"])
+
+
+class TestHotReload(EngineTestCase):
+    """Test reloading the list after another process edits it"""
+
+    def write_outside(self, text):
+        """Change the config file the way another program would"""
+        self.config_file.write_text(text)
+
+    def test_own_write_is_not_reloaded(self):
+        """Test the engine's own save is recognised and skipped"""
+        self.engine.add_websites(["a.com"])
+        self.engine.write_blocked_sites()
+        self.assertEqual(self.engine.reload_blocked_sites(), ([], []))
+
+    def test_outside_edit_swaps_list_and_index(self):
+        """Test an edited file replaces the list and the domain store"""
+        self.engine.add_websites(["a.com", "b.com"])
+        self.engine.write_blocked_sites()
+        old_store = self.engine.store
+        self.write_outside('["b.com", "*.c.net"]')
+        self.assertEqual(self.engine.reload_blocked_sites(), (["*.c.net"], ["a.com"]))
+        self.assertEqual(self.engine.blocked_websites, ["b.com", "*.c.net"])
+        self.assertEqual(self.engine.listed_match("x.c.net"), "*.c.net")
+        self.assertIsNone(self.engine.listed_match("a.com"))
+        # The old store is untouched for anyone still holding it
+        self.assertEqual(old_store.match("a.com"), "a.com")
+
+    def test_half_written_file_keeps_the_list(self):
+        """Test an unparseable file raises instead of emptying the list"""
+        self.engine.add_websites(["a.com"])
+        self.engine.write_blocked_sites()
+        self.write_outside('["b.com", ')
+        with self.assertRaises(ValueError):
+            self.engine.reload_blocked_sites()
+        self.write_outside('{"sites": []}')
+        with self.assertRaises(ValueError):
+            self.engine.reload_blocked_sites()
+        self.assertEqual(self.engine.blocked_websites, ["a.com"])
+
+
+class TestBlocking(EngineTestCase):
+    """Test blocking through the engine"""
+
+    def test_block_all_and_unblock_all(self):
+        """Test blocking and unblocking the whole list"""
+        self.engine.add_websites(["a.com", "b.com"])
+        self.assertTrue(self.engine.block())
+        self.assertEqual(self.engine.statuses(), {"a.com": True, "b.com": True})
+        self.assertTrue(self.engine.unblock())
+        self.assertEqual(self.engine.statuses(), {"a.com": False, "b.com": False})
+        self.assertEqual(self.dns.request.call_count, 2)
+
+    def test_no_flush_when_unchanged(self):
+        """Test a no-op block doesn't flush DNS"""
+        self.engine.add_websites(["a.com"])
+        self.engine.block()
+        self.dns.reset_mock()
+        self.assertFalse(self.engine.block())
+        self.dns.request.assert_not_called()
+
+    def test_timer_unblocks_on_expiry(self):
+        """Test the default timer expiry unblocks the list"""
+        self.engine.add_websites(["a.com"])
+        self.engine.block()
+        with patch.object(self.engine, 'unblock') as mock_unblock:
+            end = self.engine.start_timer(0.001)
+            self.assertIsNotNone(end)
+            self.engine.timer.join(2)
+        mock_unblock.assert_called_once_with()
+        self.assertIsNone(self.engine.timer_end)
+
+    def test_timer_custom_callback_and_cancel(self):
+        """Test a custom expiry callback and cancellation"""
+        fired = threading.Event()
+        self.engine.start_timer(0.001, on_expire=fired.set)
+        self.assertTrue(fired.wait(2))
+
+        self.engine.start_timer(60)
+        self.engine.cancel_timer()
+        self.assertIsNone(self.engine.timer)
+
+
+class TestHeadlessImport(unittest.TestCase):
+    """Test the engine imports fast and without tkinter"""
+
+    def test_import_budget_without_tkinter(self):
+        """Test `import blocker_engine` stays under budget and skips tkinter"""
+        code = (
+            "import sys, blocker_engine; "
+            "assert 'tkinter' not in sys.modules; "
+            "assert 'proxy_server' not in sys.modules"
+        )
+        timings = []
+        for _ in range(3):
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', code],
+                capture_output=True, text=True, cwd=str(SRC_DIR), timeout=60,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+            for line in result.stderr.splitlines():
+                parts = line.split('|')
+                if len(parts) == 3 and parts[2].strip() == 'blocker_engine':
+                    timings.append(int(parts[1]))
+
+        # Best of three, to ignore a cold disk cache on the first run
+        self.assertEqual(len(timings), 3)
+        cumulative = min(timings)
+        self.assertLess(cumulative, IMPORT_BUDGET_US)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
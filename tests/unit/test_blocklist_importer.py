@@ -0,0 +1,192 @@
+"""
+Unit tests for blocklist_importer module
+"""
+
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+import sys
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+import blocklist_importer
+from blocker_engine import BlockerEngine
+from blocklist_importer import (
+    chunk_ranges,
+    import_blocklist,
+    iter_domains,
+    parse_file,
+    parse_line,
+)
+
+
+class TestParseLine(unittest.TestCase):
+    """Test per-format line parsing"""
+
+    def test_hosts_format(self):
+        """Test hosts lines yield every hostname after the address"""
+        self.assertEqual(parse_line("0.0.0.0 ads.example.com"), ["ads.example.com"])
+        self.assertEqual(
+            parse_line("127.0.0.1  a.com b.com  # two hosts\n"), ["a.com", "b.com"]
+        )
+        self.assertEqual(parse_line(":: ads.example.com"), ["ads.example.com"])
+
+    def test_hosts_reserved_names_skipped(self):
+        """Test localhost-style entries are never imported"""
+        self.assertEqual(parse_line("127.0.0.1 localhost"), [])
+        self.assertEqual(parse_line("255.255.255.255 broadcasthost"), [])
+        self.assertEqual(parse_line("0.0.0.0 0.0.0.0"), [])
+
+    def test_adblock_domain_rules(self):
+        """Test ||domain^ rules, with or without options"""
+        self.assertEqual(parse_line("||ads.example.com^"), ["ads.example.com"])
+        self.assertEqual(parse_line("||t.net^$third-party"), ["t.net"])
+
+    def test_adblock_unsupported_rules(self):
+        """Test exceptions, paths, wildcards and cosmetic rules are skipped"""
+        for line in ["@@||good.com^", "||ads.com/banner^", "||ads*.com^",
+                     "||ads.com", "example.com##.ad", "[Adblock Plus 2.0]",
+                     "! Title: list"]:
+            self.assertEqual(parse_line(line), [], line)
+
+    def test_plain_domains(self):
+        """Test plain lists, comments and blanks"""
+        self.assertEqual(parse_line("tracker.net\n"), ["tracker.net"])
+        self.assertEqual(parse_line("# comment"), [])
+        self.assertEqual(parse_line("   "), [])
+        self.assertEqual(parse_line("notadomain"), [])
+
+    def test_iter_domains(self):
+        """Test iterating a mixed stream"""
+        stream = io.StringIO("0.0.0.0 a.com\n||b.com^\nc.com\n")
+        self.assertEqual(list(iter_domains(stream)), ["a.com", "b.com", "c.com"])
+
+
+class TestImportBlocklist(unittest.TestCase):
+    """Test merging blocklists into the engine"""
+
+    def setUp(self):
+        """Create an engine on temporary files"""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.config_file = os.path.join(self.test_dir.name, 'blocked_sites.json')
+        self.engine = BlockerEngine(
+            self.config_file, os.path.join(self.test_dir.name, 'hosts'), dns=Mock()
+        )
+
+    def tearDown(self):
+        """Remove temporary files"""
+        self.test_dir.cleanup()
+
+    def test_dedupes_and_normalizes(self):
+        """Test duplicates across formats and existing entries are merged"""
+        self.engine.add_websites(["existing.com"])
+        stream = io.StringIO(
+            "0.0.0.0 Ads.Example.com\n||ads.example.com^\nexisting.com\n"
+            "https://www.new.com/path\n"
+        )
+        result = import_blocklist(stream, self.engine)
+        self.assertEqual(result.lines, 4)
+        self.assertEqual(result.domains, 4)
+        self.assertEqual(result.added, ["ads.example.com", "new.com"])
+        self.assertTrue(os.path.exists(self.config_file))
+
+    def test_progress_reported(self):
+        """Test progress callbacks fire periodically and at the end"""
+        path = os.path.join(self.test_dir.name, 'list.txt')
+        with open(path, 'w') as f:
+            for i in range(25):
+                f.write(f"0.0.0.0 ads{i}.com\n")
+        progress = Mock()
+        original = blocklist_importer.PROGRESS_EVERY
+        blocklist_importer.PROGRESS_EVERY = 10
+        try:
+            result = import_blocklist(path, self.engine, progress=progress)
+        finally:
+            blocklist_importer.PROGRESS_EVERY = original
+
+        self.assertEqual(len(result.added), 25)
+        self.assertEqual(progress.call_count, 3)
+        lines, bytes_read, total = progress.call_args[0]
+        self.assertEqual(lines, 25)
+        self.assertEqual(bytes_read, total)
+        self.assertEqual(total, os.path.getsize(path))
+
+    def test_nothing_new_skips_save(self):
+        """Test the config isn't rewritten when nothing was added"""
+        import_blocklist(io.StringIO("# empty\n"), self.engine)
+        self.assertFalse(os.path.exists(self.config_file))
+
+
+
+class TestParallelPipeline(unittest.TestCase):
+    """Test the chunked, multi-process parse path"""
+
+    def setUp(self):
+        """Write a mixed-format list with duplicates and invalid entries"""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.test_dir.name, 'list.txt')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for i in range(3000):
+                f.write(f"0.0.0.0 ads{i % 1000}.example.com\n")
+                f.write(f"||Tracker{i}.Net^\n")
+                f.write("bücher.de\n" if i % 7 == 0 else "not_valid\n")
+            f.write("last.com")  # no trailing newline
+
+    def tearDown(self):
+        """Remove temporary files"""
+        self.test_dir.cleanup()
+
+    def test_chunks_are_line_aligned(self):
+        """Test chunk ranges cover the file and end on line breaks"""
+        ranges = chunk_ranges(self.path, chunk_bytes=1000)
+        self.assertGreater(len(ranges), 10)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.path))
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[end - 1:end], b"\n")
+
+    def test_parallel_matches_serial(self):
+        """Test the process pool yields exactly the serial output"""
+        serial = parse_file(self.path, workers=1, chunk_bytes=1000)
+        parallel = parse_file(self.path, workers=2, chunk_bytes=1000)
+        self.assertEqual(serial, parallel)
+        lines, _, hosts = serial
+        self.assertEqual(lines, 9001)
+        self.assertEqual(len(hosts), 1000 + 3000 + 2)
+        self.assertEqual(hosts[0], "ads0.example.com")
+        self.assertIn("xn--bcher-kva.de", hosts)
+        self.assertEqual(hosts[-1], "last.com")
+
+    def test_import_with_workers_matches_streaming(self):
+        """Test parallel import adds the same sites as streaming import"""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("\n*.Ads.example.com\n0.0.0.0 *.cdn.tracker.net\n")
+        engines = []
+        for workers in (None, 2):
+            engine = BlockerEngine(
+                os.path.join(self.test_dir.name, f'cfg{workers}.json'),
+                os.path.join(self.test_dir.name, 'hosts'),
+                dns=Mock(),
+            )
+            import_blocklist(self.path, engine, workers=workers, save=False)
+            engines.append(engine)
+        self.assertEqual(engines[0].blocked_websites, engines[1].blocked_websites)
+        self.assertIn("*.ads.example.com", engines[1].blocked_websites)
+        self.assertIn("*.cdn.tracker.net", engines[1].blocked_websites)
+
+    def test_empty_file(self):
+        """Test an empty file parses to nothing"""
+        empty = os.path.join(self.test_dir.name, 'empty.txt')
+        open(empty, 'w').close()
+        self.assertEqual(parse_file(empty, workers=2), (0, 0, []))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
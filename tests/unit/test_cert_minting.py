@@ -0,0 +1,132 @@
+"""
+Unit Tests for Certificate Minting
+Tests the local CA, per-host leaf certificates and the SNI context cache
+"""
+
+import os
+import socket
+import ssl
+import tempfile
+import threading
+import time
+import types
+import unittest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+import cert_minting
+from domain_store import DomainStore
+from proxy_server import ProxyServer
+
+
+@unittest.skipUnless(cert_minting.AVAILABLE, "cryptography package not installed")
+class TestCertificateMinter(unittest.TestCase):
+    """Test CertificateMinter against real TLS handshakes"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create one CA for the whole class; RSA keys are slow to make"""
+        cls.ca_dir = tempfile.TemporaryDirectory()
+        cls.minter = cert_minting.CertificateMinter(cls.ca_dir.name, cache_size=2)
+        cls.client_context = ssl.create_default_context(cafile=cls.minter.ca_cert_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop key generation and remove the CA"""
+        cls.minter.close()
+        cls.ca_dir.cleanup()
+
+    def test_ca_is_created_once(self):
+        """Test the CA files are written once and reloaded afterwards"""
+        self.assertTrue(os.path.exists(os.path.join(self.ca_dir.name, "ca.pem")))
+        key_mode = os.stat(os.path.join(self.ca_dir.name, "ca-key.pem")).st_mode
+        self.assertEqual(key_mode & 0o077, 0)
+
+        cert, _ = cert_minting.load_or_create_ca(self.ca_dir.name)
+        self.assertEqual(cert.serial_number, self.minter.ca_cert.serial_number)
+
+    def test_context_cache_is_lru(self):
+        """Test contexts are reused per host and the oldest is evicted"""
+        first = self.minter.context_for("a.example")
+        self.assertIs(self.minter.context_for("A.example."), first)
+        self.minter.context_for("b.example")
+        self.minter.context_for("a.example")
+        self.minter.context_for("c.example")
+
+        # b was least recently used when c arrived
+        self.assertIs(self.minter.context_for("a.example"), first)
+        minted = self.minter.minted
+        self.minter.context_for("b.example")
+        self.assertEqual(self.minter.minted, minted + 1)
+
+    def test_sni_mints_only_for_blocked_names(self):
+        """Test unlisted or invalid SNI names keep the default context"""
+        self.minter.blocked = DomainStore(["blocked.example"])
+        try:
+            minted = self.minter.minted
+            for name in ("other.example", "bad name!", "x" * 300):
+                sock = types.SimpleNamespace(context=None)
+                self.assertIsNone(self.minter.sni_callback(sock, name, None))
+                self.assertIsNone(sock.context)
+            self.assertEqual(self.minter.minted, minted)
+
+            sock = types.SimpleNamespace(context=None)
+            self.minter.sni_callback(sock, "www.Blocked.example", None)
+            self.assertIsNotNone(sock.context)
+        finally:
+            self.minter.blocked = None
+
+    def test_proxy_passes_blocked_sites(self):
+        """Test ProxyServer limits its minter to the listed sites"""
+        proxy = ProxyServer(None, blocked_sites=["blocked.example"])
+        proxy.make_tls_context(ca_dir=self.ca_dir.name)
+        try:
+            self.assertIsNotNone(proxy.minter.blocked.match("a.blocked.example", True))
+            self.assertIsNone(proxy.minter.blocked.match("other.example", True))
+        finally:
+            proxy.minter.close()
+
+    def test_key_pool_is_filled_in_background(self):
+        """Test keys are waiting before anyone asks for one"""
+        pool = cert_minting.KeyPool(size=2)
+        try:
+            deadline = time.monotonic() + 10
+            while pool.ready() < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            pool.get()
+            self.assertEqual((pool.hits, pool.misses), (1, 0))
+        finally:
+            pool.close()
+
+    def test_sni_handshake_verifies(self):
+        """Test a client trusting the CA verifies a minted cert by hostname"""
+        proxy = ProxyServer(None, mode="pool", host="127.0.0.1", max_in_flight=2)
+        server = proxy.make_server(0, self.minter.server_context())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for hostname in ("blocked.example", "www.blocked.example"):
+                sock = socket.create_connection(server.server_address, timeout=10)
+                # Raises ssl.SSLCertVerificationError on a hostname mismatch
+                with self.client_context.wrap_socket(sock, server_hostname=hostname) as tls:
+                    tls.sendall(b"GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+                    self.assertTrue(tls.recv(64).startswith(b"HTTP/1.1 200"))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_missing_package_raises(self):
+        """Test the minter explains what is missing without cryptography"""
+        available = cert_minting.AVAILABLE
+        cert_minting.AVAILABLE = False
+        try:
+            with self.assertRaises(RuntimeError):
+                cert_minting.CertificateMinter(self.ca_dir.name)
+        finally:
+            cert_minting.AVAILABLE = available
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+"""
+Unit tests for cli module
+"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+import cli
+import prefork
+from hosts_engine import HostsEngine
+
+
+class CLITestCase(unittest.TestCase):
+    """Base class running the CLI against temporary files"""
+
+    def setUp(self):
+        """Create a temporary config and hosts file"""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.config_file = os.path.join(self.test_dir.name, 'blocked_sites.json')
+        self.hosts_path = os.path.join(self.test_dir.name, 'hosts')
+        with open(self.hosts_path, 'w') as f:
+            f.write("127.0.0.1 localhost\n")
+
+    def tearDown(self):
+        """Remove temporary files"""
+        self.test_dir.cleanup()
+
+    def run_cli(self, *argv, stdin=None):
+        """Run the CLI, returning (exit code, stdout)"""
+        out = io.StringIO()
+        argv = ['--config', self.config_file, '--hosts', self.hosts_path,
+                '--no-flush'] + list(argv)
+        with redirect_stdout(out):
+            if stdin is not None:
+                with patch('sys.stdin', io.StringIO(stdin)):
+                    code = cli.main(argv)
+            else:
+                code = cli.main(argv)
+        return code, out.getvalue()
+
+    def saved_sites(self):
+        """Return the saved site list"""
+        with open(self.config_file) as f:
+            return json.load(f)
+
+
+class TestBlockCommands(CLITestCase):
+    """Test block, unblock and status"""
+
+    def test_block_and_status(self):
+        """Test blocking from args and reading status back"""
+        code, _ = self.run_cli('block', 'facebook.com', 'https://www.reddit.com/r/x')
+        self.assertEqual(code, 0)
+        self.assertEqual(self.saved_sites(), ['facebook.com', 'reddit.com'])
+
+        _, out = self.run_cli('status', 'facebook.com', 'example.com')
+        self.assertIn("blocked\tfacebook.com", out)
+        self.assertIn("unblocked\texample.com", out)
+
+    def test_unblock_and_remove(self):
+        """Test unblocking with --remove drops the site from the list"""
+        self.run_cli('block', 'a.com', 'b.com')
+        self.run_cli('unblock', '--remove', 'a.com')
+        self.assertEqual(self.saved_sites(), ['b.com'])
+        _, out = self.run_cli('status')
+        self.assertEqual(out, "blocked\tb.com\n")
+
+    def test_bulk_stdin_single_write(self):
+        """Test thousands of domains from stdin cost one hosts write"""
+        domains = "\n".join(f"site{i}.com" for i in range(3000))
+        with patch.object(HostsEngine, '_replace', autospec=True,
+                          side_effect=HostsEngine._replace) as mock_replace:
+            code, out = self.run_cli('block', stdin=domains + "\n# comment\n")
+        self.assertEqual(code, 0)
+        self.assertEqual(mock_replace.call_count, 1)
+        self.assertIn("Blocked 3000 site(s)", out)
+
+    def test_block_from_file(self):
+        """Test reading domains from --file"""
+        path = os.path.join(self.test_dir.name, 'sites.txt')
+        with open(path, 'w') as f:
+            f.write("a.com\n\nb.com  # trailing comment\n")
+        self.run_cli('block', '-f', path)
+        self.assertEqual(self.saved_sites(), ['a.com', 'b.com'])
+
+
+class TestListCommands(CLITestCase):
+    """Test import and apply"""
+
+    def test_import_then_apply(self):
+        """Test import only saves, apply writes the hosts file"""
+        self.run_cli('import', stdin="a.com\nb.com\n")
+        engine = HostsEngine(self.hosts_path)
+        self.assertFalse(engine.is_blocked('a.com'))
+
+        code, out = self.run_cli('apply')
+        self.assertEqual(code, 0)
+        self.assertIn("updated", out)
+        self.assertTrue(engine.is_blocked('a.com'))
+
+        _, out = self.run_cli('apply')
+        self.assertIn("already up to date", out)
+
+    def test_import_mixed_formats_from_files(self):
+        """Test importing hosts and AdBlock files in one invocation"""
+        hosts_list = os.path.join(self.test_dir.name, 'hosts.txt')
+        adblock_list = os.path.join(self.test_dir.name, 'adblock.txt')
+        with open(hosts_list, 'w') as f:
+            f.write("0.0.0.0 localhost\n0.0.0.0 ads.example.com\n")
+        with open(adblock_list, 'w') as f:
+            f.write("! comment\n||ads.example.com^\n||tracker.net^$third-party\n")
+        code, out = self.run_cli('import', hosts_list, adblock_list)
+        self.assertEqual(code, 0)
+        self.assertEqual(self.saved_sites(), ['ads.example.com', 'tracker.net'])
+        self.assertIn("Imported 2 new site(s)", out)
+
+    def test_apply_drops_unlisted_sites(self):
+        """Test apply removes sites no longer in the list"""
+        self.run_cli('block', 'a.com', 'b.com')
+        with open(self.config_file, 'w') as f:
+            json.dump(['a.com'], f)
+        self.run_cli('apply')
+        engine = HostsEngine(self.hosts_path)
+        self.assertTrue(engine.is_blocked('a.com'))
+        self.assertFalse(engine.is_blocked('b.com'))
+
+    def test_timer_requires_sites(self):
+        """Test timer fails cleanly with an empty list"""
+        with patch('sys.stderr', io.StringIO()):
+            code, _ = self.run_cli('timer', '1')
+        self.assertEqual(code, 1)
+
+    def test_timer_blocks_then_unblocks(self):
+        """Test timer blocks the list and unblocks it on expiry"""
+        self.run_cli('import', stdin="a.com\n")
+        with patch('cli.time.sleep'):
+            code, out = self.run_cli('timer', '0.0001')
+        self.assertEqual(code, 0)
+        self.assertIn("Blocking period ended", out)
+        self.assertFalse(HostsEngine(self.hosts_path).is_blocked('a.com'))
+
+    def test_timer_no_flush_skips_the_flush(self):
+        """Test --no-flush keeps timer from flushing the DNS cache when it blocks"""
+        self.run_cli('import', stdin="a.com\n")
+        with patch('cli.time.sleep'), patch('dns_flush.DNSFlusher.flush_pending') as flush:
+            code, _ = self.run_cli('timer', '0.0001')
+        self.assertEqual(code, 0)
+        flush.assert_not_called()
+
+    def test_dns_sinkhole_serves_list(self):
+        """Test the dns command serves the saved list until interrupted"""
+        self.run_cli('import', stdin="a.com\n")
+        with patch('cli.time.sleep', side_effect=KeyboardInterrupt):
+            code, out = self.run_cli('dns', '--listen', '127.0.0.1:0')
+        self.assertEqual(code, 0)
+        self.assertIn("blocking 1 site(s)", out)
+
+    @unittest.skipUnless(prefork.AVAILABLE, "SO_REUSEPORT load balancing not available")
+    def test_serve_runs_workers(self):
+        """Test the serve command starts workers and stops them on interrupt"""
+        with patch('cli.time.sleep', side_effect=KeyboardInterrupt):
+            code, out = self.run_cli(
+                'serve', '--workers', '1', '--host', '127.0.0.1', '--http-port', '0'
+            )
+        self.assertEqual(code, 0)
+        self.assertIn("served by 1 pool worker(s)", out)
+
+    def test_serve_without_prefork_support(self):
+        """Test serve exits with an error where workers can't share a port"""
+        with patch.object(prefork, 'AVAILABLE', False):
+            with patch('sys.stderr', io.StringIO()) as err:
+                code, _ = self.run_cli('serve', '--http-port', '0')
+        self.assertEqual(code, 1)
+        self.assertIn("SO_REUSEPORT", err.getvalue())
+
+    def test_permission_error_exit_code(self):
+        """Test a permission error is reported with exit code 1"""
+        with patch.object(HostsEngine, 'update', side_effect=PermissionError):
+            with patch('sys.stderr', io.StringIO()) as err:
+                code, _ = self.run_cli('block', 'a.com')
+        self.assertEqual(code, 1)
+        self.assertIn("Administrator", err.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,127 @@
+"""
+Unit tests for dns_flush module
+"""
+
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+import sys
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from dns_flush import DNSFlusher, detect_flush_commands, run_command
+
+
+class StubRunner:
+    """Records commands instead of running them"""
+
+    def __init__(self):
+        self.calls = []
+        self.flushed = threading.Event()
+
+    def __call__(self, args):
+        self.calls.append(args)
+        self.flushed.set()
+
+
+class TestDetectFlushCommands(unittest.TestCase):
+    """Test per-platform flush strategy detection"""
+
+    def test_windows_commands(self):
+        """Test Windows uses ipconfig and nbtstat"""
+        commands = detect_flush_commands("Windows")
+        self.assertIn(["ipconfig", "/flushdns"], commands)
+        self.assertIn(["nbtstat", "-R"], commands)
+
+    def test_macos_commands(self):
+        """Test macOS signals mDNSResponder"""
+        commands = detect_flush_commands("Darwin")
+        self.assertIn(["killall", "-HUP", "mDNSResponder"], commands)
+
+    def test_linux_systemd_resolved(self):
+        """Test Linux prefers resolvectl when available"""
+        which = Mock(side_effect=lambda name: name == "resolvectl")
+        commands = detect_flush_commands("Linux", which=which)
+        self.assertEqual(commands, [["resolvectl", "flush-caches"]])
+
+    def test_linux_nscd(self):
+        """Test Linux falls back to nscd"""
+        which = Mock(side_effect=lambda name: name == "nscd")
+        commands = detect_flush_commands("Linux", which=which)
+        self.assertEqual(commands, [["nscd", "-i", "hosts"]])
+
+    def test_linux_no_cache(self):
+        """Test Linux without a resolver cache needs no flush"""
+        self.assertEqual(detect_flush_commands("Linux", which=lambda n: None), [])
+
+
+class TestRunCommand(unittest.TestCase):
+    """Test the default command runner"""
+
+    @patch('subprocess.run')
+    def test_runs_without_shell(self, mock_run):
+        """Test commands are passed as argument lists, not via a shell"""
+        run_command(["ipconfig", "/flushdns"])
+        args, kwargs = mock_run.call_args
+        self.assertEqual(args[0], ["ipconfig", "/flushdns"])
+        self.assertFalse(kwargs.get('shell', False))
+
+    @patch('subprocess.run', side_effect=FileNotFoundError)
+    def test_missing_command_ignored(self, mock_run):
+        """Test a missing binary doesn't raise"""
+        run_command(["resolvectl", "flush-caches"])
+
+
+class TestDNSFlusher(unittest.TestCase):
+    """Test debounced flushing"""
+
+    def test_burst_collapses_into_one_flush(self):
+        """Test many requests inside the window cause a single flush"""
+        runner = StubRunner()
+        flusher = DNSFlusher([["flush"]], runner=runner, debounce=0.05)
+        for _ in range(100):
+            flusher.request()
+        self.assertTrue(runner.flushed.wait(2))
+        time.sleep(0.1)
+        self.assertEqual(runner.calls, [["flush"]])
+        self.assertEqual(flusher.flush_count, 1)
+
+    def test_request_returns_immediately(self):
+        """Test request doesn't run commands on the calling thread"""
+        runner = Mock()
+        flusher = DNSFlusher([["flush"]], runner=runner, debounce=10)
+        flusher.request()
+        runner.assert_not_called()
+        self.assertTrue(flusher.pending())
+        flusher.cancel()
+        self.assertFalse(flusher.pending())
+
+    def test_flush_pending_runs_now(self):
+        """Test a scheduled flush can be forced immediately"""
+        runner = StubRunner()
+        flusher = DNSFlusher([["a"], ["b"]], runner=runner, debounce=10)
+        flusher.request()
+        flusher.flush_pending()
+        self.assertEqual(runner.calls, [["a"], ["b"]])
+        self.assertFalse(flusher.pending())
+
+    def test_flush_pending_without_request(self):
+        """Test forcing with nothing scheduled is a no-op"""
+        runner = StubRunner()
+        flusher = DNSFlusher([["a"]], runner=runner)
+        flusher.flush_pending()
+        self.assertEqual(runner.calls, [])
+
+    def test_runner_errors_suppressed(self):
+        """Test a failing runner doesn't stop later commands"""
+        runner = Mock(side_effect=[RuntimeError("boom"), None])
+        flusher = DNSFlusher([["a"], ["b"]], runner=runner)
+        flusher.flush_now()
+        self.assertEqual(runner.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,335 @@
+"""
+Unit tests for dns_sinkhole module
+"""
+
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from dns_sinkhole import (
+    DNSSinkhole,
+    TTLCache,
+    TYPE_A,
+    TYPE_AAAA,
+    build_response,
+    parse_address,
+    parse_question,
+    record_ttls,
+)
+from domain_store import DomainStore
+
+UPSTREAM_IP = socket.inet_aton("93.184.216.34")
+
+
+def make_query(name, qtype=TYPE_A, qid=0x1234):
+    """Encode a recursive query for one name"""
+    labels = b"".join(
+        bytes([len(label)]) + label.encode() for label in name.split(".")
+    )
+    header = struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0)
+    return header + labels + b"\0" + struct.pack("!HH", qtype, 1)
+
+
+def answers(response):
+    """Return (rcode, [(rtype, ttl, rdata)]) from a response"""
+    question_end = parse_question(response)[3]
+    rcode = response[3] & 0x0F
+    records = []
+    pos = question_end
+    for _ in range(struct.unpack_from("!H", response, 6)[0]):
+        pos += 2
+        rtype, _, ttl, length = struct.unpack_from("!HHIH", response, pos)
+        pos += 10
+        records.append((rtype, ttl, response[pos:pos + length]))
+        pos += length
+    return rcode, records
+
+
+class StandInUpstream:
+    """Local upstream resolver answering every A query with one address"""
+
+    def __init__(self, ttl=300, truncate=False, host="127.0.0.1"):
+        self.queries = 0
+        upstream = self
+
+        def respond(query):
+            upstream.queries += 1
+            _, qtype, _, question_end = parse_question(query)
+            records = [(TYPE_A, UPSTREAM_IP)] if qtype == TYPE_A else []
+            return build_response(query, question_end, answers=records, ttl=ttl)
+
+        class UDPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                response = bytearray(respond(data))
+                if truncate:
+                    response[2] |= 0x02
+                sock.sendto(bytes(response), self.client_address)
+
+        class TCPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                length = struct.unpack("!H", self.request.recv(2))[0]
+                response = respond(self.request.recv(length))
+                self.request.sendall(struct.pack("!H", len(response)) + response)
+
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        udp_class = type("UDPServer", (socketserver.UDPServer,), {"address_family": family})
+        tcp_class = type("TCPServer", (socketserver.TCPServer,), {"address_family": family})
+        self.udp = udp_class((host, 0), UDPHandler)
+        self.tcp = tcp_class(self.udp.server_address[:2], TCPHandler)
+        self.address = self.udp.server_address[:2]
+        for server in (self.udp, self.tcp):
+            threading.Thread(
+                target=server.serve_forever, args=(0.05,), daemon=True
+            ).start()
+
+    def close(self):
+        for server in (self.udp, self.tcp):
+            server.shutdown()
+            server.server_close()
+
+
+class SinkholeTestCase(unittest.TestCase):
+    """Runs a sinkhole on a free localhost port against a stand-in upstream"""
+
+    upstream_options = {}
+    sinkhole_options = {}
+
+    def setUp(self):
+        """Start the upstream and the sinkhole"""
+        self.upstream = StandInUpstream(**self.upstream_options)
+        self.store = DomainStore(["blocked.com", "*.wild.net"])
+        self.sinkhole = DNSSinkhole(
+            self.store,
+            upstream=self.upstream.address,
+            listen=("127.0.0.1", 0),
+            timeout=1.0,
+            **self.sinkhole_options,
+        )
+        self.sinkhole.start()
+
+    def tearDown(self):
+        """Stop both servers"""
+        self.sinkhole.stop()
+        self.upstream.close()
+
+    def ask(self, name, qtype=TYPE_A, qid=0x1234):
+        """Query the sinkhole over UDP"""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(2)
+            sock.sendto(make_query(name, qtype, qid), self.sinkhole.address)
+            response = sock.recv(65535)
+        self.assertEqual(struct.unpack_from("!H", response)[0], qid)
+        return answers(response)
+
+
+class TestBlocking(SinkholeTestCase):
+    """Test blocked names are answered locally"""
+
+    def test_blocked_name_and_subdomains(self):
+        """Test a listed domain blocks itself and every subdomain"""
+        for name in ("blocked.com", "a.b.BLOCKED.com"):
+            rcode, records = self.ask(name)
+            self.assertEqual(rcode, 0)
+            self.assertEqual(records, [(TYPE_A, 10, b"\0\0\0\0")])
+        self.assertEqual(self.upstream.queries, 0)
+
+    def test_wildcard_spares_bare_domain(self):
+        """Test *.wild.net blocks subdomains and forwards wild.net"""
+        self.assertEqual(self.ask("x.wild.net")[1][0][2], b"\0\0\0\0")
+        self.assertEqual(self.ask("wild.net")[1][0][2], UPSTREAM_IP)
+
+    def test_aaaa_and_other_types(self):
+        """Test AAAA gets :: and other types get an empty answer"""
+        rcode, records = self.ask("blocked.com", TYPE_AAAA)
+        self.assertEqual(records, [(TYPE_AAAA, 10, b"\0" * 16)])
+        rcode, records = self.ask("blocked.com", 16)
+        self.assertEqual((rcode, records), (0, []))
+
+    def test_store_updates_are_live(self):
+        """Test domains added to the store are blocked immediately"""
+        self.store.add("late.org")
+        self.assertEqual(self.ask("www.late.org")[1][0][2], b"\0\0\0\0")
+
+    def test_tcp_query(self):
+        """Test the same answers are served over TCP"""
+        query = make_query("blocked.com")
+        with socket.create_connection(self.sinkhole.address, timeout=2) as sock:
+            for _ in range(2):
+                sock.sendall(struct.pack("!H", len(query)) + query)
+                length = struct.unpack("!H", sock.recv(2))[0]
+                response = sock.recv(length)
+                self.assertEqual(answers(response)[1][0][2], b"\0\0\0\0")
+
+    def test_garbage_is_dropped(self):
+        """Test malformed datagrams get no reply"""
+        self.assertIsNone(self.sinkhole.resolve(b"\0\1"))
+
+
+class TestNXDomain(SinkholeTestCase):
+    """Test the NXDOMAIN mode"""
+
+    sinkhole_options = {"nxdomain": True}
+
+    def test_blocked_is_nxdomain(self):
+        """Test blocked names get NXDOMAIN with no records"""
+        self.assertEqual(self.ask("sub.blocked.com"), (3, []))
+
+
+class TestForwarding(SinkholeTestCase):
+    """Test forwarding, caching and stats"""
+
+    def test_forward_then_cache(self):
+        """Test a repeat query is served from cache with the new id"""
+        self.assertEqual(self.ask("example.com")[1], [(TYPE_A, 300, UPSTREAM_IP)])
+        self.assertEqual(self.ask("example.com", qid=0x4321)[1][0][2], UPSTREAM_IP)
+        self.assertEqual(self.upstream.queries, 1)
+
+        stats = self.sinkhole.stats.snapshot()
+        self.assertEqual(stats['queries'], 2)
+        self.assertEqual(stats['forwarded'], 1)
+        self.assertEqual(stats['cached'], 1)
+        self.assertGreater(stats['qps'], 0)
+        self.assertGreater(stats['p99_ms'], 0)
+
+    def test_upstream_down_is_servfail(self):
+        """Test an unreachable upstream yields SERVFAIL"""
+        self.upstream.close()
+        self.sinkhole.timeout = 0.2
+        self.assertEqual(self.ask("down.example")[0], 2)
+        self.assertEqual(self.sinkhole.stats.snapshot()['failed'], 1)
+        self.upstream = StandInUpstream()
+
+
+@unittest.skipUnless(socket.has_ipv6, "IPv6 not available")
+class TestIPv6Upstream(SinkholeTestCase):
+    """Test forwarding to an upstream on an IPv6 address"""
+
+    upstream_options = {"host": "::1", "truncate": True}
+
+    def test_udp_and_tcp_forwarding(self):
+        """Test UDP reaches the upstream and the truncated retry goes over TCP"""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(2)
+            sock.sendto(make_query("example.com"), self.sinkhole.address)
+            self.assertTrue(sock.recv(65535)[2] & 0x02)
+        response = self.sinkhole.resolve(make_query("example.com"), tcp=True)
+        self.assertEqual(answers(response)[1], [(TYPE_A, 300, UPSTREAM_IP)])
+        self.assertEqual(self.upstream.queries, 3)
+
+
+class TestTruncatedUpstream(SinkholeTestCase):
+    """Test truncated UDP answers reach UDP clients as truncated"""
+
+    upstream_options = {"truncate": True}
+
+    def ask_tcp(self, name):
+        """Query the sinkhole over TCP, returning the raw response"""
+        query = make_query(name)
+        with socket.create_connection(self.sinkhole.address, timeout=2) as sock:
+            sock.sendall(struct.pack("!H", len(query)) + query)
+            length = struct.unpack("!H", sock.recv(2))[0]
+            return sock.recv(length)
+
+    def test_udp_client_gets_tc(self):
+        """Test a UDP client gets the TC reply and no TCP retry is made"""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(2)
+            sock.sendto(make_query("big.example"), self.sinkhole.address)
+            response = sock.recv(65535)
+        self.assertTrue(response[2] & 0x02)
+        self.assertEqual(self.upstream.queries, 1)
+
+    def test_tcp_client_gets_full_answer(self):
+        """Test a TCP query retries upstream over TCP and isn't served to UDP"""
+        response = self.ask_tcp("big.example")
+        self.assertFalse(response[2] & 0x02)
+        self.assertEqual(answers(response)[1][0][2], UPSTREAM_IP)
+        self.assertEqual(self.upstream.queries, 2)
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(2)
+            sock.sendto(make_query("big.example"), self.sinkhole.address)
+            self.assertTrue(sock.recv(65535)[2] & 0x02)
+        self.assertEqual(self.upstream.queries, 3)
+
+
+class TestUDPPool(SinkholeTestCase):
+    """Test UDP queries are served by a fixed pool of threads"""
+
+    def test_no_thread_per_datagram(self):
+        """Test many queries don't start a thread each"""
+        before = threading.active_count()
+        for i in range(50):
+            self.ask("blocked.com", qid=i)
+        self.assertLessEqual(threading.active_count(), before)
+        self.assertEqual(self.sinkhole.udp_server.dropped, 0)
+
+
+class TestTTLCache(unittest.TestCase):
+    """Test TTL ageing and LRU eviction"""
+
+    def setUp(self):
+        """Create a cache with a fake clock"""
+        self.now = 100.0
+        self.cache = TTLCache(maxsize=2, clock=lambda: self.now)
+        query = make_query("example.com")
+        self.response = build_response(
+            query, parse_question(query)[3], answers=[(TYPE_A, UPSTREAM_IP)], ttl=60
+        )
+
+    def test_ttl_ages_and_expires(self):
+        """Test TTLs count down and the entry expires"""
+        self.cache.put("k", self.response)
+        self.now += 45
+        cached = self.cache.get("k", 7)
+        self.assertEqual(record_ttls(cached)[0][1], 15)
+        self.assertEqual(struct.unpack_from("!H", cached)[0], 7)
+        self.now += 15
+        self.assertIsNone(self.cache.get("k", 7))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted"""
+        for key in ("a", "b"):
+            self.cache.put(key, self.response)
+        self.cache.get("a", 1)
+        self.cache.put("c", self.response)
+        self.assertIsNone(self.cache.get("b", 1))
+        self.assertIsNotNone(self.cache.get("a", 1))
+
+    def test_uncacheable_responses(self):
+        """Test empty or zero-TTL responses are not cached"""
+        query = make_query("example.com")
+        self.cache.put("empty", build_response(query, parse_question(query)[3]))
+        self.cache.put("garbage", b"\0" * 5)
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestParseAddress(unittest.TestCase):
+    """Test host:port parsing"""
+
+    def test_parse(self):
+        """Test the port is optional"""
+        self.assertEqual(parse_address("1.1.1.1"), ("1.1.1.1", 53))
+        self.assertEqual(parse_address("127.0.0.1:5353"), ("127.0.0.1", 5353))
+
+    def test_parse_ipv6(self):
+        """Test bare and bracketed IPv6 addresses"""
+        self.assertEqual(parse_address("::1"), ("::1", 53))
+        self.assertEqual(parse_address("2001:db8::1"), ("2001:db8::1", 53))
+        self.assertEqual(parse_address("[2001:db8::1]:5353"), ("2001:db8::1", 5353))
+        self.assertEqual(parse_address("[::1]"), ("::1", 53))
+        with self.assertRaises(ValueError):
+            parse_address("[::1]53")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+"""
+Unit tests for domain_normalizer module
+"""
+
+import unittest
+from pathlib import Path
+import sys
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from domain_normalizer import normalize_domain, normalize_domains
+
+
+class TestNormalizeDomain(unittest.TestCase):
+    """Test the normalization pipeline"""
+
+    def test_strips_url_parts(self):
+        """Test scheme, credentials, port, path, query and fragment removal"""
+        self.assertEqual(
+            normalize_domain("https://user:pw@WWW.Example.com:8080/a?b=1#c"),
+            "example.com",
+        )
+
+    def test_only_leading_www_removed(self):
+        """Test www. is only stripped as the first label"""
+        self.assertEqual(normalize_domain("www.example.com"), "example.com")
+        self.assertEqual(normalize_domain("awww.com"), "awww.com")
+        self.assertEqual(normalize_domain("news.www.example.com"), "news.www.example.com")
+
+    def test_trailing_dot(self):
+        """Test fully-qualified names lose their trailing dot"""
+        self.assertEqual(normalize_domain("example.com."), "example.com")
+
+    def test_idna(self):
+        """Test internationalized names become punycode"""
+        self.assertEqual(normalize_domain("Bücher.de"), "xn--bcher-kva.de")
+        self.assertEqual(normalize_domain("xn--bcher-kva.de"), "xn--bcher-kva.de")
+        self.assertEqual(normalize_domain("пример.рф"), "xn--e1afmkfd.xn--p1ai")
+        self.assertEqual(normalize_domain("bücher\u3002de"), "xn--bcher-kva.de")
+
+    def test_rejects_invalid(self):
+        """Test invalid hostnames are rejected"""
+        for raw in ["", "localhost", "-bad.com", "bad-.com", "a..com",
+                    "1.2.3.4", "exa mple.com", "under_score.com",
+                    "*.example.com", "a" * 64 + ".com"]:
+            self.assertIsNone(normalize_domain(raw), raw)
+
+    def test_normalize_domains_filters(self):
+        """Test the iterable form drops invalid entries"""
+        self.assertEqual(
+            list(normalize_domains(["A.com", "bad", "http://b.org/x"])),
+            ["a.com", "b.org"],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
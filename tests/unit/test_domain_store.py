@@ -0,0 +1,99 @@
+"""
+Unit tests for domain_store module
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+import domain_store
+from domain_store import DomainStore
+
+
+class TestDomainStore(unittest.TestCase):
+    """Test exact and wildcard matching"""
+
+    def setUp(self):
+        """Build a small store"""
+        self.store = DomainStore(["ads.example.com", "*.tracker.net", "b.org", "b.org"])
+
+    def test_len_and_iter(self):
+        """Test duplicates collapse and iteration yields patterns"""
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual(
+            sorted(self.store), ["*.tracker.net", "ads.example.com", "b.org"]
+        )
+
+    def test_exact(self):
+        """Test exact entries match only themselves"""
+        self.assertEqual(self.store.match("ADS.example.com"), "ads.example.com")
+        self.assertIn("b.org", self.store)
+        self.assertNotIn("x.b.org", self.store)
+        self.assertNotIn("example.com", self.store)
+        self.assertNotIn("com", self.store)
+
+    def test_wildcard_matches_subdomains_only(self):
+        """Test *.tracker.net covers subdomains but not the bare domain"""
+        self.assertEqual(self.store.match("a.b.tracker.net"), "*.tracker.net")
+        self.assertIn("x.tracker.net", self.store)
+        self.assertNotIn("tracker.net", self.store)
+        self.assertNotIn("eviltracker.net", self.store)
+
+    def test_has_is_exact_pattern(self):
+        """Test has() checks the stored pattern itself"""
+        self.assertTrue(self.store.has("*.tracker.net"))
+        self.assertFalse(self.store.has("x.tracker.net"))
+
+    def test_add_and_discard(self):
+        """Test pending changes are visible before and after compaction"""
+        self.store.add("new.com")
+        self.store.discard("b.org")
+        self.store.discard("missing.com")
+        self.assertIn("new.com", self.store)
+        self.assertNotIn("b.org", self.store)
+        self.assertEqual(len(self.store), 3)
+        self.store.compact()
+        self.assertIn("new.com", self.store)
+        self.assertNotIn("b.org", self.store)
+        self.assertEqual(len(self.store), 3)
+
+        self.store.add("b.org")
+        self.assertIn("b.org", self.store)
+
+    def test_compacts_at_threshold(self):
+        """Test pending additions are folded into the blob automatically"""
+        original = domain_store.COMPACT_THRESHOLD
+        domain_store.COMPACT_THRESHOLD = 10
+        try:
+            for i in range(25):
+                self.store.add(f"site{i}.com")
+        finally:
+            domain_store.COMPACT_THRESHOLD = original
+        self.assertLess(len(self.store._added), 10)
+        self.assertEqual(len(self.store), 28)
+        self.assertTrue(all(f"site{i}.com" in self.store for i in range(25)))
+
+    def test_non_ascii_host_does_not_match(self):
+        """Test a raw unicode host is a miss, not an error"""
+        self.assertIsNone(self.store.match("bücher.example.com"))
+        self.assertFalse(self.store.has("bücher.example.com"))
+        with self.assertRaises(ValueError):
+            self.store.add("bücher.example.com")
+
+    def test_case_and_trailing_dot(self):
+        """Test lookups ignore case and a trailing root dot"""
+        self.assertEqual(self.store.match("X.Tracker.NET."), "*.tracker.net")
+
+    def test_compact_footprint(self):
+        """Test stored bytes stay close to the raw key length"""
+        domains = [f"host{i}.example{i % 100}.com" for i in range(10000)]
+        store = DomainStore(domains)
+        raw = sum(len(domain) for domain in domains)
+        self.assertLess(store.nbytes, raw + 10 * len(domains))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
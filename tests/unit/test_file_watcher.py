@@ -0,0 +1,124 @@
+"""
+Unit tests for file_watcher module
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from file_watcher import FileWatcher, inotify_available, stat_key
+
+
+class WatcherTestCase(unittest.TestCase):
+    """Base class: a watched file in a temp directory"""
+
+    use_inotify = True
+
+    def setUp(self):
+        """Create the file and start watching it"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = Path(self.temp_dir) / "blocked_sites.json"
+        self.path.write_text("[]")
+        self.changed = threading.Semaphore(0)
+        self.watcher = FileWatcher(
+            self.path, self.changed.release, interval=0.05, use_inotify=self.use_inotify
+        )
+
+    def tearDown(self):
+        """Stop watching and remove the directory"""
+        self.watcher.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def replace(self, text):
+        """Save the file the way editors do: write a temp file and rename it"""
+        temp = self.path.with_suffix(".tmp")
+        temp.write_text(text)
+        os.replace(temp, self.path)
+
+    def test_atomic_replace_is_seen(self):
+        """Test a rename over the file triggers one callback"""
+        self.replace('["a.com"]')
+        self.assertTrue(self.changed.acquire(timeout=5))
+        self.assertFalse(self.changed.acquire(timeout=0.3))
+        self.assertEqual(self.watcher.changes, 1)
+
+    def test_in_place_write_is_seen(self):
+        """Test rewriting the file in place triggers a callback"""
+        self.path.write_text('["a.com", "b.com"]')
+        self.assertTrue(self.changed.acquire(timeout=5))
+
+    def test_deleted_file_waits_for_return(self):
+        """Test removing the file is not a change, but recreating it is"""
+        self.path.unlink()
+        self.assertFalse(self.changed.acquire(timeout=0.3))
+        self.path.write_text('["b.com"]')
+        self.assertTrue(self.changed.acquire(timeout=5))
+
+    def test_close_stops_the_thread(self):
+        """Test close() ends the watcher thread promptly"""
+        self.watcher.close()
+        self.assertFalse(self.watcher._thread.is_alive())
+        self.replace('["a.com"]')
+        self.assertFalse(self.changed.acquire(timeout=0.3))
+
+
+@unittest.skipUnless(inotify_available(), "inotify not available")
+class TestInotifyWatcher(WatcherTestCase):
+    """Test the inotify backend"""
+
+    def test_backend(self):
+        """Test inotify is used when available"""
+        self.assertEqual(self.watcher.backend, "inotify")
+
+    def test_other_files_are_ignored(self):
+        """Test writes to neighbouring files don't trigger a callback"""
+        (Path(self.temp_dir) / "other.json").write_text("{}")
+        self.assertFalse(self.changed.acquire(timeout=0.3))
+
+
+class TestPollingWatcher(WatcherTestCase):
+    """Test the stat-polling fallback"""
+
+    use_inotify = False
+
+    def test_backend(self):
+        """Test polling is used when inotify is turned off"""
+        self.assertEqual(self.watcher.backend, "poll")
+
+
+class TestCallbackErrors(unittest.TestCase):
+    """Test a failing callback doesn't stop the watcher"""
+
+    def test_keeps_watching(self):
+        """Test the watcher reports the error and sees the next change"""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        path = Path(temp_dir) / "page.html"
+        path.write_text("1")
+        calls = threading.Semaphore(0)
+
+        def on_change():
+            calls.release()
+            raise ValueError("bad page")
+
+        watcher = FileWatcher(path, on_change, interval=0.05)
+        self.addCleanup(watcher.close)
+        path.write_text("22")
+        self.assertTrue(calls.acquire(timeout=5))
+        path.write_text("333")
+        self.assertTrue(calls.acquire(timeout=5))
+
+    def test_stat_key_of_missing_file(self):
+        """Test a missing file has no key"""
+        self.assertIsNone(stat_key(os.path.join(tempfile.gettempdir(), "no-such-file")))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,240 @@
+"""
+Unit tests for hosts_engine module
+"""
+
+import os
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import sys
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from hosts_engine import (
+    HostsEngine,
+    HostsIndex,
+    SECTION_BEGIN,
+    SECTION_END,
+    expand_variations,
+)
+
+
+class HostsFileTestCase(unittest.TestCase):
+    """Base class providing a temporary hosts file"""
+
+    initial_content = "127.0.0.1 localhost\n::1 localhost\n"
+
+    def setUp(self):
+        """Create a temporary hosts file"""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.hosts_path = os.path.join(self.test_dir.name, 'hosts')
+        with open(self.hosts_path, 'w') as f:
+            f.write(self.initial_content)
+        self.engine = HostsEngine(self.hosts_path)
+
+    def tearDown(self):
+        """Remove the temporary hosts file"""
+        self.test_dir.cleanup()
+
+    def read_hosts(self):
+        """Return the current hosts file content"""
+        with open(self.hosts_path) as f:
+            return f.read()
+
+
+class TestExpandVariations(unittest.TestCase):
+    """Test variation expansion"""
+
+    def test_six_variations(self):
+        """Test each site expands to six hostnames"""
+        variations = expand_variations("example.com")
+        self.assertEqual(len(variations), 6)
+        self.assertIn("www.example.com", variations)
+        self.assertIn("api.example.com", variations)
+
+
+class TestManagedSection(HostsFileTestCase):
+    """Test managed section writes"""
+
+    def test_block_writes_section(self):
+        """Test blocking creates a marker-delimited section"""
+        self.engine.block(["example.com"])
+        content = self.read_hosts()
+        self.assertTrue(content.startswith(self.initial_content))
+        self.assertIn(SECTION_BEGIN, content)
+        self.assertIn(SECTION_END, content)
+        self.assertIn("127.0.0.1 www.example.com\n", content)
+
+    def test_unblock_removes_empty_section(self):
+        """Test unblocking the last site removes the section"""
+        self.engine.block(["example.com"])
+        self.engine.unblock(["example.com"])
+        self.assertEqual(self.read_hosts(), self.initial_content)
+
+    def test_bulk_block_single_write(self):
+        """Test a bulk block performs exactly one write"""
+        sites = [f"site{i}.com" for i in range(500)]
+        with patch.object(self.engine, '_replace',
+                          wraps=self.engine._replace) as mock_replace:
+            self.engine.block(sites)
+        mock_replace.assert_called_once()
+        self.assertEqual(len(self.engine.managed_hosts()), 500 * 6)
+
+    def test_unchanged_set_skips_write(self):
+        """Test re-applying the same set doesn't rewrite the file"""
+        self.engine.block(["example.com"])
+        with patch.object(self.engine, '_replace') as mock_replace:
+            changed = self.engine.block(["example.com"])
+        self.assertFalse(changed)
+        mock_replace.assert_not_called()
+
+    def test_update_blocks_and_unblocks(self):
+        """Test block and unblock can be combined in one update"""
+        self.engine.block(["a.com"])
+        self.engine.update(block=["b.com"], unblock=["a.com"])
+        hosts = self.engine.managed_hosts()
+        self.assertIn("b.com", hosts)
+        self.assertNotIn("a.com", hosts)
+
+    def test_no_temp_files_left(self):
+        """Test the atomic write cleans up its temp file"""
+        self.engine.block(["example.com"])
+        self.assertEqual(os.listdir(self.test_dir.name), ['hosts'])
+
+
+class TestLegacyEntries(HostsFileTestCase):
+    """Test cleanup of entries written outside the section"""
+
+    initial_content = (
+        "127.0.0.1 localhost\n"
+        "127.0.0.1 example.com\n"
+        "0.0.0.0 www.example.com\n"
+        "10.0.0.5 api.example.com\n"
+    )
+
+    def test_unblock_drops_legacy_lines(self):
+        """Test unblocking removes old appended entries"""
+        self.engine.unblock(["example.com"])
+        content = self.read_hosts()
+        self.assertIn("127.0.0.1 localhost", content)
+        self.assertNotIn("127.0.0.1 example.com", content)
+        self.assertNotIn("0.0.0.0 www.example.com", content)
+        # Non-blocking mappings are left alone
+        self.assertIn("10.0.0.5 api.example.com", content)
+
+    def test_substring_hosts_not_dropped(self):
+        """Test hostnames are matched as tokens, not substrings"""
+        with open(self.hosts_path, 'a') as f:
+            f.write("0.0.0.0 notexample.com\n")
+        self.engine.unblock(["example.com"])
+        self.assertIn("0.0.0.0 notexample.com", self.read_hosts())
+
+
+class TestStreamingRewrite(HostsFileTestCase):
+    """Test the streaming rewrite of large third-party hosts files"""
+
+    def write_adblock_hosts(self, count):
+        """Append an adblock-style list of `count` entries"""
+        with open(self.hosts_path, 'a') as f:
+            for i in range(count):
+                f.write(f"0.0.0.0 ads{i}.tracker.net\n")
+
+    def test_preserves_undecodable_bytes(self):
+        """Test lines that aren't valid UTF-8 survive a rewrite"""
+        with open(self.hosts_path, 'ab') as f:
+            f.write(b"10.1.1.1 caf\xe9.lan\n")
+        self.engine.block(["example.com"])
+        with open(self.hosts_path, 'rb') as f:
+            self.assertIn(b"10.1.1.1 caf\xe9.lan\n", f.read())
+
+    def test_unblock_removes_only_targets(self):
+        """Test unblocking leaves third-party entries untouched"""
+        self.write_adblock_hosts(1000)
+        with open(self.hosts_path, 'a') as f:
+            f.write("0.0.0.0 reddit.com www.reddit.com\n")
+        self.engine.unblock(["reddit.com"])
+        content = self.read_hosts()
+        self.assertNotIn("reddit.com", content)
+        self.assertEqual(content.count("tracker.net"), 1000)
+
+    def test_constant_memory(self):
+        """Test peak memory doesn't grow with the hosts file size"""
+        self.write_adblock_hosts(200000)
+        with open(self.hosts_path, 'a') as f:
+            f.write("0.0.0.0 reddit.com\n")
+        size = os.path.getsize(self.hosts_path)
+
+        tracemalloc.start()
+        try:
+            changed = self.engine.unblock(["reddit.com"])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertTrue(changed)
+        self.assertLess(peak, size / 2)
+
+
+class TestHostsIndex(HostsFileTestCase):
+    """Test the parsed hosts index"""
+
+    initial_content = (
+        "127.0.0.1 localhost\n"
+        "0.0.0.0 facebook.com www.facebook.com  # social\n"
+        "# 127.0.0.1 commented.com\n"
+    )
+
+    def test_lookup_exact_hostname(self):
+        """Test lookups match whole hostnames only"""
+        index = HostsIndex(self.hosts_path)
+        self.assertEqual(index.lookup("facebook.com"), "0.0.0.0")
+        self.assertEqual(index.lookup("WWW.Facebook.com"), "0.0.0.0")
+        self.assertIsNone(index.lookup("book.com"))
+        self.assertIsNone(index.lookup("commented.com"))
+
+    def test_parses_once_until_stat_changes(self):
+        """Test the file is only re-read when its stat changes"""
+        index = HostsIndex(self.hosts_path)
+        index.refresh()
+        with patch('builtins.open') as mock_open_call:
+            for _ in range(100):
+                index.lookup("facebook.com")
+        mock_open_call.assert_not_called()
+
+        with open(self.hosts_path, 'a') as f:
+            f.write("127.0.0.1 reddit.com\n")
+        self.assertEqual(index.lookup("reddit.com"), "127.0.0.1")
+
+    def test_is_blocked_no_substring_false_positive(self):
+        """Test book.com isn't reported blocked because of facebook.com"""
+        self.assertTrue(self.engine.is_blocked("facebook.com"))
+        self.assertFalse(self.engine.is_blocked("book.com"))
+
+    def test_index_follows_engine_writes(self):
+        """Test the index sees changes made through the engine"""
+        self.assertFalse(self.engine.is_blocked("reddit.com"))
+        self.engine.block(["reddit.com"])
+        self.assertTrue(self.engine.is_blocked("reddit.com"))
+        self.engine.unblock(["reddit.com"])
+        self.assertFalse(self.engine.is_blocked("reddit.com"))
+
+    def test_statuses_stat_once(self):
+        """Test a batch of status checks stats the hosts file once"""
+        with patch('hosts_engine.os.stat', wraps=os.stat) as mock_stat:
+            statuses = self.engine.statuses(["facebook.com", "book.com", "reddit.com"])
+        self.assertEqual(
+            statuses, {"facebook.com": True, "book.com": False, "reddit.com": False}
+        )
+        self.assertEqual(mock_stat.call_count, 1)
+
+    def test_missing_file_is_empty(self):
+        """Test a missing hosts file yields an empty index"""
+        index = HostsIndex(os.path.join(self.test_dir.name, 'missing'))
+        self.assertIsNone(index.lookup("facebook.com"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,142 @@
+"""
+Unit tests for io_worker module
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+import sys
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from hosts_engine import HostsEngine
+from io_worker import IOWorker
+
+
+class GatedHosts:
+    """Hosts engine stub whose first update waits on a gate"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.updates = []
+
+    def update(self, block=(), unblock=()):
+        self.started.set()
+        self.gate.wait(5)
+        self.updates.append((sorted(block), sorted(unblock)))
+        return True
+
+
+class TestIOWorker(unittest.TestCase):
+    """Test the background worker"""
+
+    def test_submit_runs_off_calling_thread(self):
+        """Test jobs run on the worker thread"""
+        worker = IOWorker(Mock())
+        seen = []
+        worker.submit(lambda: seen.append(threading.current_thread().name))
+        self.assertTrue(worker.wait_idle(2))
+        worker.close(2)
+        self.assertEqual(seen, ["io-worker"])
+
+    def test_callbacks_run_on_poll(self):
+        """Test callbacks are only dispatched by poll()"""
+        worker = IOWorker(Mock())
+        callback = Mock()
+        worker.submit(lambda x: x * 2, 21, callback=callback)
+        worker.wait_idle(2)
+        callback.assert_not_called()
+        worker.poll()
+        callback.assert_called_once_with(42, None)
+        worker.close(2)
+
+    def test_errors_passed_to_callback(self):
+        """Test exceptions are reported to the callback"""
+        worker = IOWorker(Mock())
+        callback = Mock()
+        worker.submit(Mock(side_effect=PermissionError("denied")), callback=callback)
+        worker.wait_idle(2)
+        worker.poll()
+        result, error = callback.call_args[0]
+        self.assertIsNone(result)
+        self.assertIsInstance(error, PermissionError)
+        worker.close(2)
+
+    def test_rapid_edits_merge_into_one_update(self):
+        """Test edits queued while busy are applied as one batch"""
+        hosts = GatedHosts()
+        dns = Mock()
+        worker = IOWorker(hosts, dns)
+
+        worker.submit_hosts_change(block=["first.com"])
+        self.assertTrue(hosts.started.wait(2))
+        for i in range(20):
+            worker.submit_hosts_change(block=[f"site{i}.com"])
+        worker.submit_hosts_change(unblock=["site0.com"])
+        hosts.gate.set()
+        worker.wait_idle(2)
+        worker.close(2)
+
+        self.assertEqual(len(hosts.updates), 2)
+        block, unblock = hosts.updates[1]
+        self.assertEqual(len(block), 19)
+        self.assertEqual(unblock, ["site0.com"])
+        self.assertEqual(dns.request.call_count, 2)
+
+    def test_order_kept_around_batches(self):
+        """Test a job queued after hosts edits runs after they apply"""
+        hosts = GatedHosts()
+        worker = IOWorker(hosts)
+        order = []
+        worker.submit_hosts_change(block=["a.com"])
+        hosts.started.wait(2)
+        worker.submit_hosts_change(block=["b.com"])
+        worker.submit(lambda: order.append(len(hosts.updates)))
+        hosts.gate.set()
+        worker.wait_idle(2)
+        worker.close(2)
+        self.assertEqual(order, [2])
+
+    def test_attach_polls_with_after(self):
+        """Test attach schedules polling through root.after"""
+        root = Mock()
+        worker = IOWorker(Mock())
+        worker.attach(root, interval_ms=10)
+        root.after.assert_called_once_with(10, worker._poll_tk)
+        worker._poll_tk()
+        self.assertEqual(root.after.call_count, 2)
+        worker.close(2)
+
+
+class TestResponsiveness(unittest.TestCase):
+    """Test the calling thread stays responsive during large applies"""
+
+    def test_submit_fast_during_large_apply(self):
+        """Test queuing stays under one frame (16 ms) during a 10k-site apply"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            hosts_path = os.path.join(tmpdir, 'hosts')
+            with open(hosts_path, 'w') as f:
+                f.write("127.0.0.1 localhost\n")
+            worker = IOWorker(HostsEngine(hosts_path))
+
+            worker.submit_hosts_change(block=[f"site{i}.com" for i in range(10000)])
+            worst = 0.0
+            for i in range(200):
+                start = time.perf_counter()
+                worker.submit_hosts_change(unblock=[f"site{i}.com"])
+                worker.poll()
+                worst = max(worst, time.perf_counter() - start)
+
+            self.assertTrue(worker.wait_idle(30))
+            worker.close(5)
+            self.assertLess(worst, 0.016)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
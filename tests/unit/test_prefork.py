@@ -0,0 +1,125 @@
+"""
+Unit Tests for Pre-fork Workers
+Tests SO_REUSEPORT workers, supervisor restarts and stats aggregation
+"""
+
+import http.client
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+import prefork
+from prefork import PreforkSupervisor, _Worker, sum_stats, worker_log_path
+
+
+def fetch(port):
+    """GET the block page on a new connection; returns the status"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", "/")
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+
+class TestSumStats(unittest.TestCase):
+    """Test merging worker stats"""
+
+    def test_sums_nested_numbers(self):
+        """Test numbers add up at every level and other values are ignored"""
+        total = {}
+        sum_stats(total, {"http": {"served": 2, "active": 1}, "name": "x"})
+        sum_stats(total, {"http": {"served": 3}, "https": {"handshakes": 4}})
+        self.assertEqual(total, {"http": {"served": 5, "active": 1}, "https": {"handshakes": 4}})
+
+
+class TestWorkerLogPath(unittest.TestCase):
+    """Test per-worker access log names"""
+
+    def test_index_goes_before_the_suffix(self):
+        """Test rotated backups of one worker can't collide with another's file"""
+        self.assertEqual(worker_log_path("/var/log/access.log", 2), "/var/log/access.2.log")
+        self.assertEqual(worker_log_path("access", 0), "access.0")
+
+
+class TestWorkerStats(unittest.TestCase):
+    """Test stats requests over a worker's pipe"""
+
+    def test_late_reply_is_not_taken_for_the_next(self):
+        """Test a reply that missed its deadline is skipped by the next request"""
+        ours, theirs = multiprocessing.Pipe()
+        self.addCleanup(ours.close)
+        self.addCleanup(theirs.close)
+        worker = _Worker(None, ours)
+
+        def reply(delay):
+            command, request_id = theirs.recv()
+            time.sleep(delay)
+            theirs.send((request_id, {"requests": request_id}))
+
+        slow = threading.Thread(target=reply, args=(0.3,))
+        slow.start()
+        self.assertIsNone(worker.stats(0.1))
+        slow.join()
+
+        prompt = threading.Thread(target=reply, args=(0,))
+        prompt.start()
+        self.assertEqual(worker.stats(5), {"requests": 2})
+        prompt.join()
+
+
+@unittest.skipUnless(prefork.AVAILABLE, "SO_REUSEPORT load balancing not available")
+class TestPreforkSupervisor(unittest.TestCase):
+    """Test a two-worker supervisor on a free port"""
+
+    def setUp(self):
+        """Start two pool-mode workers"""
+        self.supervisor = PreforkSupervisor(
+            None, workers=2, host="127.0.0.1", http_port=0, max_in_flight=4
+        )
+        self.supervisor.start()
+
+    def tearDown(self):
+        """Stop the workers"""
+        self.supervisor.stop()
+
+    def test_workers_share_the_port(self):
+        """Test every request is served and counted across workers"""
+        for _ in range(20):
+            self.assertEqual(fetch(self.supervisor.http_port), 200)
+        # A connection is counted once the worker has closed it, which can
+        # trail the client reading its response
+        deadline = time.monotonic() + 5
+        stats = self.supervisor.stats()
+        while stats["http"]["served"] < 20 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            stats = self.supervisor.stats()
+        self.assertEqual(stats["workers"], 2)
+        self.assertEqual(stats["http"]["served"], 20)
+        self.assertEqual(len(set(self.supervisor.pids())), 2)
+
+    def test_dead_worker_is_restarted(self):
+        """Test a killed worker is replaced and the port keeps serving"""
+        victim = self.supervisor.pids()[0]
+        os.kill(victim, signal.SIGKILL)
+        deadline = time.monotonic() + 10
+        while self.supervisor.restarts == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        self.assertEqual(self.supervisor.restarts, 1)
+        self.assertNotIn(victim, self.supervisor.pids())
+        for _ in range(10):
+            self.assertEqual(fetch(self.supervisor.http_port), 200)
+        self.assertEqual(self.supervisor.stats()["workers"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,19 @@
 Unit tests for proxy_server module
 """
 
+import base64
+import gzip
+import http.client
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
 import unittest
+from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 import sys
 from pathlib import Path
@@ -10,7 +22,8 @@ from pathlib import Path
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
 
-from proxy_server import ProxyServer, BlockPageHandler
+from proxy_server import HANDOFF_AVAILABLE, ProxyServer, BlockPageHandler
+from tls_context import new_server_context
 
 
 class TestBlockPageHandler(unittest.TestCase):
@@ -43,19 +56,24 @@ class TestBlockPageHandler(unittest.TestCase):
         """Test HEAD request returns 200"""
         mock_request = Mock()
         mock_client = ('127.0.0.1', 8080)
-        mock_server = Mock()
+        mock_server = Mock(draining=False)
 
         with patch.object(BlockPageHandler, '__init__', lambda x, y, z, w: None):
             handler = BlockPageHandler(mock_request, mock_client, mock_server)
-            handler.send_response = Mock()
-            handler.send_header = Mock()
-            handler.end_headers = Mock()
+            handler.server = mock_server
+            handler.command = "HEAD"
+            handler.request_version = "HTTP/1.1"
+            handler.close_connection = False
+            handler.headers = {}
+            handler.wfile = Mock()
 
             handler.do_HEAD()
 
-            handler.send_response.assert_called_with(200)
-            handler.send_header.assert_called()
-            handler.end_headers.assert_called_once()
+            # Status line and headers go out in one write, with no body
+            handler.wfile.write.assert_called_once()
+            response = handler.wfile.write.call_args[0][0]
+            self.assertTrue(response.startswith(b"HTTP/1.1 200 OK\r\n"))
+            self.assertTrue(response.endswith(b"\r\n\r\n"))
 
 
 class TestProxyServer(unittest.TestCase):
@@ -82,6 +100,119 @@ class TestProxyServer(unittest.TestCase):
             server.start()
             mock_thread.assert_called_once()
 
+    def test_thread_mode_backlog(self):
+        """Test the threaded server listens with the configured backlog"""
+        server = ProxyServer(None, host="127.0.0.1", http_port=0, backlog=256)
+        tcp_server = server.make_server(0)
+        try:
+            self.assertEqual(tcp_server.request_queue_size, 256)
+        finally:
+            tcp_server.server_close()
+
+    def test_thread_mode_conditional_get(self):
+        """Test the threaded server negotiates gzip and answers 304"""
+        BlockPageHandler.block_page_content = "<html>" + "blocked " * 100 + "</html>"
+        server = ProxyServer(None, host="127.0.0.1", http_port=0)
+        tcp_server = server.make_server(0)
+        thread = threading.Thread(target=tcp_server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            conn = http.client.HTTPConnection(*tcp_server.server_address, timeout=5)
+            conn.request("GET", "/", headers={"Accept-Encoding": "gzip"})
+            response = conn.getresponse()
+            body = response.read()
+            self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+            self.assertIn(b"blocked", gzip.decompress(body))
+            conn.close()
+
+            conn = http.client.HTTPConnection(*tcp_server.server_address, timeout=5)
+            conn.request("GET", "/", headers={
+                "Accept-Encoding": "gzip", "If-None-Match": response.getheader("ETag"),
+            })
+            self.assertEqual(conn.getresponse().status, 304)
+            conn.close()
+        finally:
+            tcp_server.shutdown()
+            tcp_server.server_close()
+
+    def test_thread_mode_keep_alive(self):
+        """Test the threaded server reuses connections up to the cap"""
+        server = ProxyServer(
+            None, host="127.0.0.1", http_port=0, max_requests=3, idle_timeout=0.3
+        )
+        tcp_server = server.make_server(0)
+        thread = threading.Thread(target=tcp_server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            conn = http.client.HTTPConnection(*tcp_server.server_address, timeout=5)
+            conn.request("POST", "/", body=b"form=data")
+            conn.getresponse().read()
+            sock = conn.sock
+            conn.request("HEAD", "/")
+            response = conn.getresponse()
+            self.assertEqual(response.read(), b"")
+            self.assertGreater(int(response.getheader("Content-Length")), 0)
+            self.assertIs(conn.sock, sock)
+            conn.request("GET", "/")
+            response = conn.getresponse()
+            response.read()
+            self.assertEqual(response.getheader("Connection"), "close")
+            conn.close()
+
+            # An idle connection is dropped after the timeout
+            raw = socket.create_connection(tcp_server.server_address, timeout=5)
+            raw.sendall(b"HEAD / HTTP/1.1\r\nHost: x\r\n\r\n")
+            self.assertIn(b"200 OK", raw.recv(4096))
+            self.assertEqual(raw.recv(64), b"")
+            raw.close()
+        finally:
+            tcp_server.shutdown()
+            tcp_server.server_close()
+
+    def test_thread_mode_large_page_uses_sendfile(self):
+        """Test a page with an inline image is served from its file, twice per connection"""
+        image = base64.b64encode(os.urandom(150 * 1024)).decode()
+        page = f'<html><img src="data:image/png;base64,{image}"></html>'
+        server = ProxyServer(None, host="127.0.0.1", http_port=0)
+        BlockPageHandler.block_page_content = page
+        self.addCleanup(setattr, BlockPageHandler, "block_page_content", None)
+        tcp_server = server.make_server(0)
+        self.assertIn("identity", BlockPageHandler.get_block_response().response_for().files)
+        thread = threading.Thread(target=tcp_server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            conn = http.client.HTTPConnection(*tcp_server.server_address, timeout=5)
+            conn.request("GET", "/")
+            self.assertEqual(conn.getresponse().read().decode(), page)
+            conn.request("GET", "/", headers={"Accept-Encoding": "gzip"})
+            self.assertEqual(gzip.decompress(conn.getresponse().read()).decode(), page)
+            conn.close()
+        finally:
+            tcp_server.shutdown()
+            tcp_server.server_close()
+
+    def test_block_page_names_the_host(self):
+        """Test the templated asset page shows the Host and the block end"""
+        asset = Path(__file__).parent.parent.parent / "assets" / "block_page.html"
+        server = ProxyServer(str(asset), host="127.0.0.1", http_port=0)
+        self.addCleanup(server.set_block_state, None)
+        server.set_block_state(datetime(2030, 1, 2, 18, 45))
+        tcp_server = server.make_server(0)
+        thread = threading.Thread(target=tcp_server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            conn = http.client.HTTPConnection(*tcp_server.server_address, timeout=5)
+            conn.request("GET", "/", headers={"Host": "Distracting.Example"})
+            page = conn.getresponse().read().decode()
+            conn.close()
+            self.assertIn("distracting.example has been blocked", page)
+            self.assertIn("Blocked until Jan 02, 18:45", page)
+            self.assertIn("Visits blocked: 1", page)
+            self.assertEqual(server.stats()["block_page"]["renders"], 1)
+        finally:
+            tcp_server.shutdown()
+            tcp_server.server_close()
+
     def test_load_block_page_success(self):
         """Test loading block page successfully"""
         import unittest.mock
@@ -109,6 +240,604 @@ class TestProxyServer(unittest.TestCase):
         self.assertFalse(server.running)
 
 
+class TestHotReload(unittest.TestCase):
+    """Test swapping in an edited block page while serving"""
+
+    def setUp(self):
+        """Write a first version of the page"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.page_path = Path(self.temp_dir) / "block_page.html"
+        self.page_path.write_text(self.version(0))
+
+    def tearDown(self):
+        """Remove the page and reset the shared handler state"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        BlockPageHandler.block_page_content = None
+        BlockPageHandler.block_response = None
+
+    def version(self, number):
+        """Page text for version `number`; odd versions are large enough for sendfile"""
+        padding = "x" * (100 * 1024 if number % 2 else 10)
+        return f"<html><body>v{number} {padding} v{number}</body></html>"
+
+    def hammer(self, mode):
+        """Fetch continuously through ten reloads; every body must be one whole version"""
+        proxy = ProxyServer(str(self.page_path), mode=mode, host="127.0.0.1")
+        server = proxy.make_server(0)
+        proxy.http_server = server
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        if mode == "async":
+            self.assertTrue(server.ready.wait(5))
+        versions = {self.version(n).encode() for n in range(11)}
+        stop = threading.Event()
+        bodies, errors = [], []
+
+        def client():
+            try:
+                conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+                while not stop.is_set():
+                    conn.request("GET", "/", headers={"Accept-Encoding": "identity"})
+                    bodies.append(conn.getresponse().read())
+                conn.close()
+            except Exception as e:
+                errors.append(e)
+
+        clients = [threading.Thread(target=client) for _ in range(3)]
+        for thread in clients:
+            thread.start()
+        try:
+            for number in range(1, 11):
+                self.page_path.write_text(self.version(number))
+                self.assertTrue(proxy.reload_block_page())
+                time.sleep(0.02)
+            self.assertFalse(proxy.reload_block_page())
+            stop.set()
+            for thread in clients:
+                thread.join()
+            conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+            conn.request("GET", "/")
+            self.assertEqual(conn.getresponse().read(), self.version(10).encode())
+            conn.close()
+        finally:
+            stop.set()
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(errors, [])
+        self.assertTrue(bodies)
+        self.assertTrue(all(body in versions for body in bodies))
+
+    def test_thread_mode_swaps_whole_pages(self):
+        """Test reloads under load in thread mode"""
+        self.hammer("thread")
+
+    def test_async_mode_swaps_whole_pages(self):
+        """Test reloads under load in async mode"""
+        self.hammer("async")
+
+    def test_missing_file_keeps_the_page(self):
+        """Test a page file that disappears leaves the current page in place"""
+        proxy = ProxyServer(str(self.page_path))
+        self.page_path.unlink()
+        self.assertFalse(proxy.reload_block_page())
+        self.assertIn("v0", BlockPageHandler.get_block_response().content)
+
+    def test_watch_reloads_on_save(self):
+        """Test start(watch=True) picks up an edit to the page file"""
+        proxy = ProxyServer(str(self.page_path), host="127.0.0.1", http_port=0, watch=True)
+        proxy.start()
+        try:
+            self.page_path.write_text(self.version(2))
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if "v2" in (BlockPageHandler.block_page_content or ""):
+                    break
+                time.sleep(0.02)
+            self.assertIn("v2", BlockPageHandler.get_block_response().content)
+        finally:
+            proxy.stop()
+        self.assertIsNone(proxy.page_watcher)
+
+
+CHILD_SERVER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from proxy_server import ProxyServer
+
+proxy = ProxyServer(sys.argv[2], mode=sys.argv[3], host="127.0.0.1", http_port=int(sys.argv[4]))
+proxy.start().result(10)
+sys.stdin.read()
+proxy.stop()
+"""
+
+
+class TestLifecycle(unittest.TestCase):
+    """Test readiness, draining on stop and restart by socket handoff"""
+
+    modes = ("thread", "pool", "async")
+
+    def setUp(self):
+        """Create a temp directory for page files"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the directory and reset the shared handler state"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        BlockPageHandler.block_page_content = None
+        BlockPageHandler.block_response = None
+
+    def start(self, mode, **options):
+        """Start a ProxyServer on a free port; returns it and its address"""
+        proxy = ProxyServer(None, mode=mode, host="127.0.0.1", http_port=0, **options)
+        address = proxy.start().result(5)["http"]
+        return proxy, address
+
+    def stop_in_background(self, proxy, drain_timeout=5):
+        """Call proxy.stop() on another thread; returns the thread and a result list"""
+        result = []
+        thread = threading.Thread(target=lambda: result.append(proxy.stop(drain_timeout)))
+        thread.start()
+        return thread, result
+
+    def test_ready_reports_the_address(self):
+        """Test start() resolves to the listening address in every mode"""
+        for mode in self.modes:
+            with self.subTest(mode=mode):
+                proxy, address = self.start(mode)
+                try:
+                    self.assertNotEqual(address[1], 0)
+                    conn = http.client.HTTPConnection(*address, timeout=5)
+                    conn.request("GET", "/")
+                    self.assertEqual(conn.getresponse().status, 200)
+                    conn.close()
+                finally:
+                    self.assertTrue(proxy.stop())
+
+    def test_ready_fails_when_the_port_is_taken(self):
+        """Test the future carries the bind error instead of hanging"""
+        busy = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(busy.close)
+        for mode in self.modes:
+            with self.subTest(mode=mode):
+                proxy = ProxyServer(
+                    None, mode=mode, host="127.0.0.1", http_port=busy.getsockname()[1]
+                )
+                try:
+                    with self.assertRaises(OSError):
+                        proxy.start().result(5)
+                finally:
+                    proxy.stop()
+
+    def test_drain_finishes_a_request_in_flight(self):
+        """Test a request still arriving during stop() is answered, with Connection: close"""
+        for mode in self.modes:
+            with self.subTest(mode=mode):
+                proxy, address = self.start(mode)
+                sock = socket.create_connection(address, timeout=5)
+                sock.sendall(
+                    b"POST / HTTP/1.1\r\nHost: a.com\r\nContent-Length: 10\r\n\r\n12345"
+                )
+                time.sleep(0.2)
+                thread, result = self.stop_in_background(proxy)
+                time.sleep(0.2)
+                self.assertTrue(thread.is_alive())
+                sock.sendall(b"67890")
+                response = http.client.HTTPResponse(sock)
+                response.begin()
+                self.assertEqual(response.status, 200)
+                self.assertEqual(response.getheader("Connection"), "close")
+                response.read()
+                sock.close()
+                thread.join(5)
+                self.assertEqual(result, [True])
+
+    def test_drain_closes_idle_keep_alive_connections(self):
+        """Test an idle keep-alive connection doesn't hold stop() for the idle timeout"""
+        for mode in self.modes:
+            with self.subTest(mode=mode):
+                proxy, address = self.start(mode, idle_timeout=30)
+                conn = http.client.HTTPConnection(*address, timeout=5)
+                conn.request("GET", "/")
+                conn.getresponse().read()
+                started = time.monotonic()
+                self.assertTrue(proxy.stop())
+                self.assertLess(time.monotonic() - started, 2)
+                self.assertEqual(conn.sock.recv(64), b"")
+                conn.close()
+
+    def test_drain_closes_connections_with_no_request_yet(self):
+        """Test a pre-connected socket that never sends a request doesn't hold stop()"""
+        for mode in self.modes:
+            with self.subTest(mode=mode):
+                proxy, address = self.start(mode, idle_timeout=30)
+                sock = socket.create_connection(address, timeout=5)
+                time.sleep(0.2)
+                started = time.monotonic()
+                self.assertTrue(proxy.stop())
+                self.assertLess(time.monotonic() - started, 2)
+                self.assertEqual(sock.recv(64), b"")
+                sock.close()
+
+    def test_drain_deadline(self):
+        """Test a connection that never finishes is cut off at the deadline"""
+        for mode in self.modes:
+            with self.subTest(mode=mode):
+                proxy, address = self.start(mode)
+                sock = socket.create_connection(address, timeout=5)
+                sock.sendall(b"POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\n123")
+                time.sleep(0.2)
+                started = time.monotonic()
+                self.assertFalse(proxy.stop(drain_timeout=0.3))
+                self.assertLess(time.monotonic() - started, 2)
+                sock.close()
+
+    @unittest.skipUnless(HANDOFF_AVAILABLE, "socket handoff needs POSIX")
+    def test_restart_refuses_no_connections(self):
+        """Test clients hammering across a restart see no errors and both pages"""
+        old_page = Path(self.temp_dir) / "old.html"
+        old_page.write_text("<html><body>old version</body></html>")
+        new_page = Path(self.temp_dir) / "new.html"
+        new_page.write_text("<html><body>new version</body></html>")
+        src = str(Path(__file__).parent.parent.parent / "src")
+        for mode in ("thread", "async"):
+            with self.subTest(mode=mode):
+                proxy = ProxyServer(str(old_page), mode=mode, host="127.0.0.1", http_port=0)
+                address = proxy.start().result(5)["http"]
+                stop = threading.Event()
+                seen, errors = [], []
+
+                def client():
+                    # A new connection per request, so every accept() counts;
+                    # reading to EOF lets the server close first, keeping
+                    # TIME_WAIT off client ports
+                    while not stop.is_set():
+                        try:
+                            sock = socket.create_connection(address, timeout=5)
+                            sock.sendall(b"GET / HTTP/1.1\r\nHost: a.com\r\nConnection: close\r\n\r\n")
+                            data = b""
+                            while True:
+                                chunk = sock.recv(65536)
+                                if not chunk:
+                                    break
+                                data += chunk
+                            sock.close()
+                        except Exception as e:
+                            errors.append(e)
+                            continue
+                        if not data.startswith(b"HTTP/1.1 200 "):
+                            errors.append(data[:40])
+                        seen.append(b"new version" in data)
+
+                clients = [threading.Thread(target=client) for _ in range(4)]
+                for thread in clients:
+                    thread.start()
+                child = None
+                try:
+                    time.sleep(0.3)
+                    child = proxy.restart(
+                        [sys.executable, "-c", CHILD_SERVER, src, str(new_page), mode,
+                         str(address[1])],
+                        stdin=subprocess.PIPE,
+                    )
+                    time.sleep(0.5)
+                finally:
+                    stop.set()
+                    for thread in clients:
+                        thread.join()
+                    if child is not None:
+                        child.stdin.close()
+                        child.wait(10)
+                    proxy.stop()
+                self.assertEqual(errors, [])
+                self.assertIn(False, seen)
+                self.assertIn(True, seen)
+                self.assertTrue(seen[-1])
+
+    @unittest.skipUnless(HANDOFF_AVAILABLE, "socket handoff needs POSIX")
+    def test_failed_restart_keeps_serving(self):
+        """Test a new process that exits early is reported and the old one carries on"""
+        proxy, address = self.start("thread")
+        try:
+            with self.assertRaises(RuntimeError):
+                proxy.restart([sys.executable, "-c", "pass"])
+            conn = http.client.HTTPConnection(*address, timeout=5)
+            conn.request("GET", "/")
+            self.assertEqual(conn.getresponse().status, 200)
+            conn.close()
+        finally:
+            proxy.stop()
+
+    def test_restart_without_handoff_support(self):
+        """Test restart() says so where descriptors can't be passed, and keeps serving"""
+        proxy, address = self.start("thread")
+        try:
+            with patch("proxy_server.HANDOFF_AVAILABLE", False):
+                with self.assertRaisesRegex(RuntimeError, "POSIX"):
+                    proxy.restart([sys.executable, "-c", "pass"])
+            conn = http.client.HTTPConnection(*address, timeout=5)
+            conn.request("GET", "/")
+            self.assertEqual(conn.getresponse().status, 200)
+            conn.close()
+        finally:
+            proxy.stop()
+
+
+class TestPooledServer(unittest.TestCase):
+    """Test the bounded pool mode"""
+
+    def setUp(self):
+        """Start a pool of one worker with a one-deep queue"""
+        self.proxy = ProxyServer(
+            None, mode="pool", host="127.0.0.1", http_port=0,
+            max_in_flight=1, queue_depth=1,
+        )
+        self.server = self.proxy.make_server(0)
+        self.proxy.http_server = self.server
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        """Stop the server"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def connect(self):
+        """Open a raw connection"""
+        return socket.create_connection(self.server.server_address, timeout=5)
+
+    def wait_for(self, key, value):
+        """Wait until a stats counter reaches a value"""
+        deadline = time.monotonic() + 5
+        while self.server.stats()[key] != value and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.stats()[key], value)
+
+    def test_sheds_load_when_saturated(self):
+        """Test the third connection gets a 503 while one is active and one queued"""
+        busy = self.connect()
+        self.wait_for("active", 1)
+        waiting = self.connect()
+        self.wait_for("queued", 1)
+
+        shed = self.connect()
+        self.assertTrue(shed.recv(64).startswith(b"HTTP/1.1 503"))
+        shed.close()
+        self.assertEqual(
+            self.proxy.stats()["http"],
+            {"queued": 1, "active": 1, "rejected": 1, "served": 0},
+        )
+
+        # Finishing the busy connection lets the queued one through
+        busy.sendall(b"HEAD / HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertIn(b"200 OK", busy.recv(4096))
+        busy.close()
+        waiting.sendall(b"HEAD / HTTP/1.1\r\nConnection: close\r\n\r\n")
+        self.assertIn(b"200 OK", waiting.recv(4096))
+        waiting.close()
+        self.wait_for("served", 2)
+
+    def test_idle_keep_alive_yields_to_waiting_connection(self):
+        """Test a connection waiting on the pool doesn't sit out another's idle timeout"""
+        self.server.idle_timeout = 30
+        idle = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        idle.request("GET", "/")
+        idle.getresponse().read()
+
+        start = time.monotonic()
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        conn.request("GET", "/")
+        self.assertEqual(conn.getresponse().status, 200)
+        self.assertLess(time.monotonic() - start, 1)
+        conn.close()
+        self.assertEqual(idle.sock.recv(64), b"")
+        idle.close()
+
+    def test_idle_keep_alive_kept_while_workers_are_free(self):
+        """Test idle connections stay open when a worker is free for new ones"""
+        proxy = ProxyServer(None, mode="pool", host="127.0.0.1", max_in_flight=2)
+        server = proxy.make_server(0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        idle = http.client.HTTPConnection(*server.server_address, timeout=5)
+        idle.request("GET", "/")
+        idle.getresponse().read()
+        sock = idle.sock
+        conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+        conn.request("GET", "/")
+        conn.getresponse().read()
+        conn.close()
+        idle.request("GET", "/")
+        self.assertEqual(idle.getresponse().status, 200)
+        self.assertIs(idle.sock, sock)
+        idle.close()
+
+    def test_close_drops_queued_connections(self):
+        """Test server_close closes waiting connections and stops workers"""
+        busy = self.connect()
+        self.wait_for("active", 1)
+        waiting = self.connect()
+        self.wait_for("queued", 1)
+        self.server.shutdown()
+        self.server.server_close()
+        self.assertEqual(waiting.recv(64), b"")
+        busy.close()
+        waiting.close()
+        for worker in self.server._workers:
+            worker.join(5)
+            self.assertFalse(worker.is_alive())
+
+
+def make_test_cert(directory):
+    """Create a self-signed localhost certificate with the openssl CLI"""
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        raise unittest.SkipTest("openssl command not available")
+    path = os.path.join(directory, "cert.pem")
+    subprocess.run(
+        [openssl, "req", "-x509", "-newkey", "ec", "-pkeyopt",
+         "ec_paramgen_curve:prime256v1", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", path, "-out", path],
+        check=True, capture_output=True,
+    )
+    return path
+
+
+def resumed_visits(address, client_context, visits=2):
+    """Fetch the page `visits` times reusing one TLS session; returns session_reused"""
+    session = None
+    reused = []
+    for _ in range(visits):
+        sock = socket.create_connection(address, timeout=5)
+        with client_context.wrap_socket(sock, session=session) as tls:
+            tls.sendall(b"GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+            # TLS 1.3 tickets arrive after the handshake, with the response
+            while tls.recv(65536):
+                pass
+            reused.append(tls.session_reused)
+            session = tls.session
+    return reused
+
+
+class TestDeferredTLS(unittest.TestCase):
+    """Test TLS handshakes run on connection threads, not in accept()"""
+
+    mode = "thread"
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a certificate and a client context"""
+        cls.cert_dir = tempfile.TemporaryDirectory()
+        cls.cert_file = make_test_cert(cls.cert_dir.name)
+        cls.client_context = ssl.create_default_context()
+        cls.client_context.check_hostname = False
+        cls.client_context.verify_mode = ssl.CERT_NONE
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the certificate"""
+        cls.cert_dir.cleanup()
+
+    def setUp(self):
+        """Start an HTTPS server with a short handshake timeout"""
+        proxy = ProxyServer(None, mode=self.mode, host="127.0.0.1", max_in_flight=4)
+        self.server = proxy.make_server(0, new_server_context(self.cert_file))
+        self.server.handshake_timeout = 0.5
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        """Stop the server"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def https_get(self):
+        """Fetch the block page over TLS"""
+        conn = http.client.HTTPSConnection(
+            *self.server.server_address, timeout=5, context=self.client_context
+        )
+        conn.request("GET", "/")
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        return response.status
+
+    def test_stalled_client_does_not_block_others(self):
+        """Test a client that never handshakes doesn't delay other clients"""
+        stalled = socket.create_connection(self.server.server_address, timeout=5)
+        start = time.monotonic()
+        self.assertEqual(self.https_get(), 200)
+        self.assertLess(time.monotonic() - start, 0.4)
+
+        # The stalled connection is dropped once the handshake times out
+        self.assertEqual(stalled.recv(64), b"")
+        stalled.close()
+        stats = self.server.tls_stats()
+        self.assertEqual(stats["handshakes"], 1)
+        self.assertEqual(stats["handshake_failures"], 1)
+
+    def test_file_backed_page_over_tls(self):
+        """Test a page too large for memory variants is sent through TLS intact"""
+        page = "<html>" + base64.b64encode(os.urandom(100 * 1024)).decode() + "</html>"
+        BlockPageHandler.block_page_content = page
+        self.addCleanup(setattr, BlockPageHandler, "block_page_content", None)
+        conn = http.client.HTTPSConnection(
+            *self.server.server_address, timeout=5, context=self.client_context
+        )
+        conn.request("GET", "/")
+        self.assertEqual(conn.getresponse().read().decode(), page)
+        conn.close()
+
+    def test_repeat_visit_resumes_session(self):
+        """Test a client offering its previous session skips the full handshake"""
+        self.assertEqual(
+            resumed_visits(self.server.server_address, self.client_context), [False, True]
+        )
+        stats = self.server.stats()
+        self.assertEqual(stats["full_handshakes"], 1)
+        self.assertEqual(stats["resumed_handshakes"], 1)
+
+    def test_drain_closes_idle_tls_connection(self):
+        """Test drain() reaches a keep-alive connection through its TLS socket"""
+        conn = http.client.HTTPSConnection(
+            *self.server.server_address, timeout=5, context=self.client_context
+        )
+        conn.request("GET", "/")
+        conn.getresponse().read()
+        start = time.monotonic()
+        self.assertTrue(self.server.drain(3))
+        self.assertLess(time.monotonic() - start, 1)
+        conn.close()
+
+
+class TestDeferredTLSPool(TestDeferredTLS):
+    """Run the deferred TLS tests against the pool mode"""
+
+    mode = "pool"
+
+
+class TestTLSResumptionAsync(unittest.TestCase):
+    """Test session resumption and the shared context in async mode"""
+
+    def setUp(self):
+        """Create a certificate"""
+        self.cert_dir = tempfile.TemporaryDirectory()
+        self.cert_file = make_test_cert(self.cert_dir.name)
+        self.proxy = ProxyServer(None, mode="async", host="127.0.0.1")
+
+    def tearDown(self):
+        """Remove the certificate"""
+        self.cert_dir.cleanup()
+
+    def test_context_is_built_once_and_tuned(self):
+        """Test restarts reuse one tuned context, keeping its ticket keys"""
+        context = self.proxy.make_tls_context(self.cert_file)
+        self.assertIs(self.proxy.make_tls_context(self.cert_file), context)
+        self.assertEqual(context.minimum_version, ssl.TLSVersion.TLSv1_2)
+        self.assertFalse(context.options & ssl.OP_NO_TICKET)
+        tls12 = [c for c in context.get_ciphers() if c["protocol"] == "TLSv1.2"]
+        self.assertTrue(tls12)
+        self.assertTrue(all(c["kea"] == "kx-ecdhe" for c in tls12))
+
+    def test_repeat_visit_resumes_session(self):
+        """Test async mode counts full and resumed handshakes"""
+        client_context = ssl.create_default_context()
+        client_context.check_hostname = False
+        client_context.verify_mode = ssl.CERT_NONE
+        server = self.proxy.make_server(0, self.proxy.make_tls_context(self.cert_file))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        server.ready.wait(5)
+        try:
+            reused = resumed_visits(server.server_address, client_context, visits=3)
+            self.assertEqual(reused, [False, True, True])
+            stats = server.stats()
+            self.assertEqual(stats["full_handshakes"], 1)
+            self.assertEqual(stats["resumed_handshakes"], 2)
+        finally:
+            server.shutdown()
+
+
 class TestBlockPageContent(unittest.TestCase):
     """Test block page content handling"""
     
@@ -14,6 +14,7 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
 
 from website_blocker import WebsiteBlocker
+import tkinter as tk
 
 
 class TestWebsiteBlockerInit(unittest.TestCase):
@@ -43,6 +44,83 @@ class TestWebsiteBlockerInit(unittest.TestCase):
             mock_warning.assert_called_once()
 
 
+class TestBackgroundOperations(unittest.TestCase):
+    """Test GUI actions are queued on the I/O worker"""
+
+    @patch('website_blocker.IOWorker')
+    @patch('website_blocker.ProxyServer')
+    @patch('website_blocker.WebsiteBlocker.is_admin', return_value=True)
+    def setUp(self, mock_admin, mock_proxy, mock_worker):
+        """Create a blocker with a mocked worker"""
+        self.root = MagicMock()
+        self.blocker = WebsiteBlocker(self.root)
+        self.worker = self.blocker.worker
+        self.worker.reset_mock()
+
+    def tearDown(self):
+        """Stop any block timer started by a test"""
+        self.blocker.engine.cancel_timer()
+
+    def test_timer_block_is_one_hosts_change(self):
+        """Test block_with_timer queues one batched hosts edit"""
+        self.blocker.blocked_websites = [f"site{i}.com" for i in range(500)]
+        self.blocker.block_with_timer(30)
+        self.worker.submit_hosts_change.assert_called_once()
+        kwargs = self.worker.submit_hosts_change.call_args[1]
+        self.assertEqual(len(kwargs['block']), 500)
+        self.assertIsNotNone(self.blocker.engine.timer)
+        self.blocker.proxy_server.set_block_state.assert_called_once_with(
+            self.blocker.engine.timer_end
+        )
+
+    def test_timer_expiry_is_one_hosts_change(self):
+        """Test timer_expired queues one batched hosts edit"""
+        self.blocker.blocked_websites = ["a.com", "b.com"]
+        with patch('website_blocker.messagebox.showinfo'):
+            self.blocker.timer_expired()
+        self.worker.submit_hosts_change.assert_called_once()
+        self.assertEqual(
+            self.worker.submit_hosts_change.call_args[1]['unblock'], ["a.com", "b.com"]
+        )
+        self.blocker.proxy_server.set_block_state.assert_called_once_with(None)
+
+    def test_reloaded_list_applies_the_difference(self):
+        """Test an outside edit blocks added and unblocks removed sites"""
+        from domain_store import DomainStore
+
+        self.blocker.blocked_websites = ["a.com", "b.com"]
+        self.blocker.status_label = Mock()
+        websites = ["b.com", "c.com"]
+        self.blocker.on_list_reloaded((websites, DomainStore(websites)), None)
+        self.assertEqual(self.blocker.blocked_websites, ["b.com", "c.com"])
+        calls = [call[1] for call in self.worker.submit_hosts_change.call_args_list]
+        self.assertEqual(calls[0]['block'], ["c.com"])
+        self.assertEqual(calls[1]['unblock'], ["a.com"])
+
+    def test_own_save_is_not_reloaded(self):
+        """Test the watcher ignores the file as the GUI last wrote it"""
+        with patch('website_blocker.stat_key', return_value=(1, 2, 3)):
+            self.blocker.engine.saved_key = (1, 2, 3)
+            self.blocker.on_config_changed()
+        self.worker.post.assert_not_called()
+
+    def test_render_uses_worker_statuses(self):
+        """Test the listbox is drawn from statuses computed off-thread"""
+        self.blocker.listbox = Mock()
+        self.blocker.render_listbox(["a.com", "b.com"], {"a.com": True})
+        self.assertTrue(self.blocker.is_website_blocked("a.com"))
+        self.assertFalse(self.blocker.is_website_blocked("b.com"))
+        self.blocker.listbox.insert.assert_any_call(tk.END, "🔒 a.com")
+
+    def test_stale_save_skipped(self):
+        """Test a save superseded by a newer one doesn't write"""
+        with patch('builtins.open') as mock_file:
+            self.blocker.save_blocked_sites()
+            self.blocker.save_blocked_sites()
+            self.blocker.write_blocked_sites(["old.com"], 1)
+        mock_file.assert_not_called()
+
+
 class TestConfigManagement(unittest.TestCase):
     """Test configuration file management"""
 